@@ -40,6 +40,31 @@ API_URL_ROOT = os.environ.get("API_URL_ROOT", "https://api.iri.nersc.gov")
 API_PREFIX = os.environ.get("API_PREFIX", "/")
 API_URL = os.environ.get("API_URL", "api/v1")
 
+# Number of memoized link lists (e.g. an incident's event_uris) kept per link type; 0 disables memoization
+LINK_CACHE_SIZE = int(os.environ.get("LINK_CACHE_SIZE", "1024"))
+
+# Memory bound (bytes) of the pre-serialized JSON fragment cache used with FAST_JSON_RESPONSES and by streamed lists; 0 disables it
+JSON_FRAGMENT_CACHE_BYTES = int(os.environ.get("JSON_FRAGMENT_CACHE_BYTES", str(32 * 1024 * 1024)))
+
+# Stream large list responses (events, incidents, jobs, tasks) as JSON arrays while they are produced.
+# Clients can always ask for a streamed NDJSON response with "Accept: application/x-ndjson".
+STREAM_JSON_RESPONSES = os.environ.get("STREAM_JSON_RESPONSES", "false").lower() == "true"
+
+# Compress responses of at least COMPRESSION_MIN_SIZE bytes with the best encoding the client accepts (zstd, br, gzip).
+# Bodies of at least COMPRESSION_THREAD_MIN_SIZE bytes are compressed in a worker thread,
+# and up to COMPRESSION_CACHE_BYTES of compressed bodies are cached.
+COMPRESSION_ENABLED = os.environ.get("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_THREAD_MIN_SIZE = int(os.environ.get("COMPRESSION_THREAD_MIN_SIZE", str(256 * 1024)))
+COMPRESSION_CACHE_BYTES = int(os.environ.get("COMPRESSION_CACHE_BYTES", str(16 * 1024 * 1024)))
+
+# Serialize trusted adapter output straight to JSON, skipping the response model revalidation
+FAST_JSON_RESPONSES = os.environ.get("FAST_JSON_RESPONSES", "false").lower() == "true"
+
+# OpenAPI schema generated at build time by tools/build_openapi.py, served instead of building it in every worker.
+# It is only used if it was generated for the same configuration and routes, otherwise the schema is built on first use.
+OPENAPI_SCHEMA_FILE = os.environ.get("OPENAPI_SCHEMA_FILE", os.path.join(os.path.dirname(__file__), "openapi.json"))
+
 OPENTELEMETRY_ENABLED = os.environ.get("OPENTELEMETRY_ENABLED", "false").lower() == "true"
 OPENTELEMETRY_DEBUG = os.environ.get("OPENTELEMETRY_DEBUG", "false").lower() == "true"
 OTLP_ENDPOINT = os.environ.get("OTLP_ENDPOINT", "")
@@ -54,6 +79,15 @@ logger.info(f"API_URL_ROOT={API_URL_ROOT}")
 logger.info(f"API_PREFIX={API_PREFIX}")
 logger.info(f"API_URL={API_URL}")
 logger.info(f"LOG_LEVEL={LOG_LEVEL}")
+logger.info(f"FAST_JSON_RESPONSES={FAST_JSON_RESPONSES}")
+logger.info(f"LINK_CACHE_SIZE={LINK_CACHE_SIZE}")
+logger.info(f"STREAM_JSON_RESPONSES={STREAM_JSON_RESPONSES}")
+logger.info(f"JSON_FRAGMENT_CACHE_BYTES={JSON_FRAGMENT_CACHE_BYTES}")
+logger.info(f"COMPRESSION_ENABLED={COMPRESSION_ENABLED}")
+logger.info(f"COMPRESSION_MIN_SIZE={COMPRESSION_MIN_SIZE}")
+logger.info(f"COMPRESSION_THREAD_MIN_SIZE={COMPRESSION_THREAD_MIN_SIZE}")
+logger.info(f"COMPRESSION_CACHE_BYTES={COMPRESSION_CACHE_BYTES}")
+logger.info(f"OPENAPI_SCHEMA_FILE={OPENAPI_SCHEMA_FILE}")
 logger.info(f"OPENTELEMETRY_ENABLED={OPENTELEMETRY_ENABLED}")
 logger.info(f"OPENTELEMETRY_DEBUG={OPENTELEMETRY_DEBUG}")
 logger.info(f"OTLP_ENDPOINT={OTLP_ENDPOINT}")
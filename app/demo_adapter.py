@@ -2,17 +2,17 @@
 A demo adapter for the IRI Facility API that returns hardcoded data.
 This is useful for testing and development of the API without needing to connect to real resources
 """
+import asyncio
 import base64
 import datetime
-import glob
-import grp
 import os
 import pathlib
-import pwd
 import random
-import stat
+import shutil
 import subprocess
+import time
 import uuid
+from collections.abc import AsyncIterator
 
 from fastapi import HTTPException
 from fastapi.encoders import jsonable_encoder
@@ -26,11 +26,23 @@ from .routers.facility import facility_adapter
 from .routers.facility import models as facility_models
 from .routers.filesystem import facility_adapter as filesystem_adapter
 from .routers.filesystem import models as filesystem_models
+from .routers.filesystem import staging
+from .routers.filesystem.local import archive as local_archive
+from .routers.filesystem.local import checksum as local_checksum
+from .routers.filesystem.local import copy as local_copy
+from .routers.filesystem.local import content as local_content
+from .routers.filesystem.local import executor as fs_executor
+from .routers.filesystem.local import listing as local_listing
+from .routers.filesystem.local import manifest as local_manifest
+from .routers.filesystem.local import metadata_cache
+from .routers.filesystem.local import walk as local_walk
 from .routers.status import facility_adapter as status_adapter
 from .routers.status import models as status_models
 from .routers.task import facility_adapter as task_adapter
 from .routers.task import models as task_models
+from .types.changelog import ChangeLog, CREATED
 from .types.models import Capability
+from .types.records import Record, to_models, to_records
 from .types.user import User
 from .types.scalars import AllocationUnit
 from .apilogger import get_stream_logger
@@ -39,6 +51,8 @@ from .config import LOG_LEVEL
 logger = get_stream_logger(__name__, LOG_LEVEL)
 
 DEMO_QUEUE_UPDATE_SECS = int(os.environ.get("DEMO_QUEUE_UPDATE_SECS", 5))
+# records filtered at a time by the iter_* methods, between which other requests can run
+ITER_BATCH = 256
 
 
 def paginate_list(items, offset: int | None, limit: int | None):
@@ -49,6 +63,29 @@ def paginate_list(items, offset: int | None, limit: int | None):
         items = items[:limit]
     return items
 
+
+async def iter_records(records, find, offset: int | None, limit: int | None, **filters):
+    """
+    Yield the models of the records that `find` keeps, after skipping offset of them and up to limit.
+    The records are filtered ITER_BATCH at a time and converted only when yielded, so the first item is sent
+    without filtering (or converting) the whole list.
+    """
+    skip = offset or 0
+    remaining = limit if limit is not None and limit >= 0 else None
+    for start in range(0, len(records), ITER_BATCH):
+        if remaining == 0:
+            return
+        matches = find(records[start:start + ITER_BATCH], **filters)
+        if skip >= len(matches):
+            skip -= len(matches)
+        else:
+            for record in matches[skip:skip + remaining if remaining is not None else None]:
+                yield record.to_model()
+                if remaining is not None:
+                    remaining -= 1
+            skip = 0
+        await asyncio.sleep(0)
+
 class CommandError(RuntimeError):
     """Raised when an external subprocess command fails."""
 
@@ -111,6 +148,7 @@ class DemoAdapter(
         self.facility = {}
         self.locations = []
         self.sites = []
+        self.status_changes = ChangeLog()
         self._init_state()
 
     def _init_state(self):
@@ -342,6 +380,16 @@ class DemoAdapter(
 
             d += datetime.timedelta(minutes=int(random.random() * 15 + 1))
 
+        # keep the (many) events, incidents and allocations as compact records, converted back to models when returned
+        self.events = to_records(self.events, status_models.Event)
+        self.incidents = to_records(self.incidents, status_models.Incident)
+        self.project_allocations = to_records(self.project_allocations, account_models.ProjectAllocation)
+        self.user_allocations = to_records(self.user_allocations, account_models.UserAllocation)
+
+        for kind, items in ((status_models.ChangeKind.resource, self.resources), (status_models.ChangeKind.incident, self.incidents), (status_models.ChangeKind.event, self.events)):
+            for item in items:
+                self.status_changes.record(kind.value, item.id, CREATED, item)
+
     # ----------------------------
     # Facility API
     # ----------------------------
@@ -439,10 +487,15 @@ class DemoAdapter(
             time_=time_,
             modified_since=modified_since,
         )
-        return paginate_list(events, offset, limit)
+        return to_models(paginate_list(events, offset, limit))
+
+    async def iter_events(self: "DemoAdapter", offset: int, limit: int, **filters) -> AsyncIterator[status_models.Event]:
+        async for event in iter_records(self.events, status_models.Event.find, offset, limit, **filters):
+            yield event
 
     async def get_event(self: "DemoAdapter", id_: str) -> status_models.Event:
-        return status_models.Event.find_by_id(self.events, id_)
+        event = status_models.Event.find_by_id(self.events, id_)
+        return event.to_model() if event else None
 
     async def get_incidents(
         self: "DemoAdapter",
@@ -472,10 +525,26 @@ class DemoAdapter(
             resource_id=resource_id,
             resolution=resolution,
         )
-        return paginate_list(incidents, offset, limit)
+        return to_models(paginate_list(incidents, offset, limit))
+
+    async def iter_incidents(self: "DemoAdapter", offset: int, limit: int, **filters) -> AsyncIterator[status_models.Incident]:
+        async for incident in iter_records(self.incidents, status_models.Incident.find, offset, limit, **filters):
+            yield incident
 
     async def get_incident(self: "DemoAdapter", id_: str) -> status_models.Incident:
-        return status_models.Incident.find_by_id(self.incidents, id_)
+        incident = status_models.Incident.find_by_id(self.incidents, id_)
+        return incident.to_model() if incident else None
+
+    async def get_changes(self: "DemoAdapter", since: str | None, limit: int) -> status_models.ChangeFeed:
+        changes, watermark, has_more = self.status_changes.since(since, limit)
+        return status_models.ChangeFeed(
+            changes=[
+                status_models.Change(kind=kind, id=id_, change_type=operation, item=item.to_model() if isinstance(item, Record) else item)
+                for kind, id_, operation, item in changes
+            ],
+            watermark=watermark,
+            has_more=has_more,
+        )
 
     async def get_capabilities(self: "DemoAdapter", name: str | None = None, modified_since: str | None = None, offset: int = 0, limit: int = 1000) -> list[Capability]:
         return self.capabilities.values()
@@ -527,14 +596,14 @@ class DemoAdapter(
         project: account_models.Project,
         user: User,
     ) -> list[account_models.ProjectAllocation]:
-        return [pa for pa in self.project_allocations if pa.project_id == project.id]
+        return to_models(pa for pa in self.project_allocations if pa.project_id == project.id)
 
     async def get_user_allocations(
         self: "DemoAdapter",
         user: User,
         project_allocation: account_models.ProjectAllocation,
     ) -> list[account_models.UserAllocation]:
-        return [ua for ua in self.user_allocations if ua.project_allocation_id == project_allocation.id]
+        return to_models(ua for ua in self.user_allocations if ua.project_allocation_id == project_allocation.id)
 
     async def submit_job(
         self: "DemoAdapter",
@@ -600,8 +669,20 @@ class DemoAdapter(
         historical: bool = False,
         include_spec: bool = False,
     ) -> list[compute_models.Job]:
-        return [
-            compute_models.Job(
+        return [job async for job in self.iter_jobs(resource, user, offset, limit, filters, historical, include_spec)]
+
+    async def iter_jobs(
+        self: "DemoAdapter",
+        resource: status_models.Resource,
+        user: User,
+        offset: int,
+        limit: int,
+        filters: dict[str, object] | None = None,
+        historical: bool = False,
+        include_spec: bool = False,
+    ) -> AsyncIterator[compute_models.Job]:
+        for i in range(random.randint(3, 10)):
+            yield compute_models.Job(
                 id=f"job_{i}",
                 status=compute_models.JobStatus(
                     state=random.choice([s for s in compute_models.JobState]),
@@ -611,8 +692,6 @@ class DemoAdapter(
                     meta_data={"account": "account1"},
                 ),
             )
-            for i in range(random.randint(3, 10))
-        ]
 
     async def cancel_job(
         self: "DemoAdapter",
@@ -643,13 +722,15 @@ class DemoAdapter(
 # ----------------------------------------------
 # Filesystem API
 # ----------------------------------------------
-    def _run(self, args, *, shell: bool = False, timeout: int | None = 3600, text: bool = True) -> subprocess.CompletedProcess:
+    async def _run(
+        self, args, *, shell: bool = False, timeout: int | None = 3600, text: bool = True, pool: fs_executor.Pool = fs_executor.BULK
+    ) -> subprocess.CompletedProcess:
         """
-        Run a subprocess command and catch exceptions.
+        Run a subprocess command in a pool (by default, the bulk one) and catch exceptions.
         Raises CommandError on failure with captured diagnostics.
         """
         try:
-            return subprocess.run(args, shell=shell, capture_output=True, text=text, check=True, timeout=timeout)
+            return await pool.run_process(args, shell=shell, timeout=timeout, text=text)
         except subprocess.TimeoutExpired as exc:
             logger.warning(f"Command timed out: {args} (after {timeout} seconds)")
             raise CommandError(cmd=args, returncode=None, stdout=exc.stdout, stderr=exc.stderr) from exc
@@ -661,58 +742,16 @@ class DemoAdapter(
             raise CommandError(cmd=args, returncode=None, stdout=None, stderr=str(exc)) from exc
 
 
-    def _file(self, path: str) -> filesystem_models.File:
-        # Get file stats (follows symlinks by default)
+    async def _file(self, path: str) -> filesystem_models.File:
         rp = self.validate_path(path)
-        file_stat = os.stat(rp)  # Use lstat to not follow symlinks
-
-        # Get file type
-        if stat.S_ISDIR(file_stat.st_mode):
-            file_type = "directory"
-        elif stat.S_ISLNK(file_stat.st_mode):
-            file_type = "symlink"
-        elif stat.S_ISREG(file_stat.st_mode):
-            file_type = "file"
-        else:
-            file_type = "other"
-
-        # Get link target if it's a symlink
-        link_target = None
-        if stat.S_ISLNK(file_stat.st_mode):
-            link_target = os.readlink(rp)
-
-        # Get user and group names
-        user = pwd.getpwuid(file_stat.st_uid).pw_name
-        group = grp.getgrgid(file_stat.st_gid).gr_name
-
-        # Get permissions in rwxrwxrwx format
-        permissions = stat.filemode(file_stat.st_mode)
-
-        # Get last modified time
-        last_modified = datetime.datetime.fromtimestamp(file_stat.st_mtime).strftime("%Y-%m-%d %H:%M:%S")
-
-        # Get size
-        size = str(file_stat.st_size)
-        data = dict(
-            name=os.path.basename(rp),
-            type=file_type,
-            user=user,
-            group=group,
-            permissions=permissions,
-            last_modified=last_modified,
-            size=size,
-        )
-
-        if link_target is not None:
-            data["link_target"] = link_target
-
-        return filesystem_models.File(**data)
+        return local_listing.to_file(os.path.basename(rp), await fs_executor.METADATA.run(os.stat, rp))
 
 
     async def chmod(self: "DemoAdapter", resource: status_models.Resource, user: User, request_model: filesystem_models.PutFileChmodRequest) -> filesystem_models.PutFileChmodResponse:
         rp = self.validate_path(request_model.path)
-        os.chmod(rp, int(request_model.mode, 8))
-        return filesystem_models.PutFileChmodResponse(output=self._file(rp))
+        await fs_executor.METADATA.run(os.chmod, rp, int(request_model.mode, 8))
+        metadata_cache.invalidate(rp)
+        return filesystem_models.PutFileChmodResponse(output=await self._file(rp))
 
     async def chown(
         self: "DemoAdapter",
@@ -721,8 +760,9 @@ class DemoAdapter(
         request_model: filesystem_models.PutFileChownRequest,
     ) -> filesystem_models.PutFileChownResponse:
         rp = self.validate_path(request_model.path)
-        os.chown(rp, request_model.owner, request_model.group)
-        return filesystem_models.PutFileChownResponse(output=self._file(rp))
+        await fs_executor.METADATA.run(os.chown, rp, request_model.owner, request_model.group)
+        metadata_cache.invalidate(rp)
+        return filesystem_models.PutFileChownResponse(output=await self._file(rp))
 
     async def ls(
         self: "DemoAdapter",
@@ -733,43 +773,25 @@ class DemoAdapter(
         numeric_uid: bool,
         recursive: bool,
         dereference: bool,
+        offset: int = 0,
+        limit: int | None = None,
+        sort: str = "name",
     ) -> filesystem_models.GetDirectoryLsResponse:
         rp = self.validate_path(path)
-        files = glob.glob(rp, recursive=recursive)
-        return filesystem_models.GetDirectoryLsResponse(output=[self._file(f) for f in files])
+        def list_files():
+            return local_listing.ls(rp, show_hidden, numeric_uid, recursive, dereference, offset, limit, sort)
 
-    def _headtail(
-        self: "DemoAdapter",
-        cmd: str,
-        path: str,
-        file_bytes: int | None,
-        lines: int | None,
-        skip_heading: bool = False,
-        skip_trailing: bool = False,
-    ) -> str:
-        args = [cmd]
-
-        if cmd == "tail" and skip_heading:
-            if file_bytes is not None:
-                args.extend(["-c", f"+{file_bytes + 1}"])
-            elif lines is not None:
-                args.extend(["-n", f"+{lines + 1}"])
-        if cmd == "head" and skip_trailing:
-            if file_bytes is not None:
-                args.extend(["-c", f"-{file_bytes}"])
-            elif lines is not None:
-                args.extend(["-n", f"-{lines}"])
+        if recursive or dereference:
+            # these depend on other directories than rp's
+            files = await fs_executor.METADATA.run(list_files)
         else:
-            if file_bytes is not None:
-                args.extend(["-c", str(file_bytes)])
-            elif lines is not None:
-                args.extend(["-n", str(lines)])
-
-        rp = self.validate_path(path)
-        args.append(rp)
+            # the times of the subdirectories listed change with their content, which rp's events don't report
+            files = await fs_executor.METADATA.run(metadata_cache.cached, ("ls", rp, show_hidden, numeric_uid, offset, limit, sort), rp, list_files, True)
+        return filesystem_models.GetDirectoryLsResponse(output=files)
 
-        result = self._run(args)
-        return result.stdout
+    @staticmethod
+    def _decode(content: bytes) -> str:
+        return content.decode("utf-8", errors="replace")
 
     async def head(
         self: "DemoAdapter",
@@ -780,7 +802,8 @@ class DemoAdapter(
         lines: int | None,
         skip_trailing: bool = False,
     ) -> filesystem_models.GetFileHeadResponse:
-        content = self._headtail("head", path, file_bytes, lines, skip_trailing=skip_trailing)
+        rp = self.validate_path(path)
+        content = self._decode(await fs_executor.BULK.run(local_content.head, rp, file_bytes, lines, skip_trailing))
 
         fc = filesystem_models.FileContent(
             content=content,
@@ -802,7 +825,8 @@ class DemoAdapter(
         skip_heading: bool = False,
     ) -> filesystem_models.GetFileTailResponse:
 
-        content = self._headtail("tail", path, file_bytes, lines, skip_heading=skip_heading)
+        rp = self.validate_path(path)
+        content = self._decode(await fs_executor.BULK.run(local_content.tail, rp, file_bytes, lines, skip_heading))
 
         fc = filesystem_models.FileContent(
             content=content,
@@ -818,8 +842,7 @@ class DemoAdapter(
 
     async def view(self: "DemoAdapter", resource: status_models.Resource, user: User, path: str, size: int, offset: int) -> filesystem_models.GetViewFileResponse:
         rp = self.validate_path(path)
-        result = self._run(f"tail -c +{offset + 1} {rp} | head -c {size}", shell=True)
-        content = result.stdout
+        content = self._decode(await fs_executor.BULK.run(local_content.view, rp, size, offset))
         return filesystem_models.GetViewFileResponse(
             output=filesystem_models.FileContent(
                 content=content,
@@ -829,29 +852,40 @@ class DemoAdapter(
             ),
         )
 
-    async def checksum(self: "DemoAdapter", resource: status_models.Resource, user: User, path: str) -> filesystem_models.GetFileChecksumResponse:
+    async def checksum(
+        self: "DemoAdapter",
+        resource: status_models.Resource,
+        user: User,
+        path: str,
+        algorithms: list[str] | None = None,
+    ) -> filesystem_models.GetFileChecksumResponse:
         rp = self.validate_path(path)
-        result = self._run(["sha256sum", rp])
-        checksum = result.stdout.split()[0]
-        return filesystem_models.GetFileChecksumResponse(
-            output=filesystem_models.FileChecksum(
-                checksum=checksum,
-            )
-        )
+        digests = await fs_executor.BULK.run(local_checksum.checksums, rp, algorithms or ["sha256"])
+        checksums = [
+            filesystem_models.FileChecksum(algorithm=local_checksum.ALGORITHMS[algorithm][0], checksum=digest)
+            for algorithm, digest in digests.items()
+        ]
+        return filesystem_models.GetFileChecksumResponse(output=checksums[0], checksums=checksums)
 
     async def file(self: "DemoAdapter", resource: status_models.Resource, user: User, path: str) -> filesystem_models.GetFileTypeResponse:
         rp = self.validate_path(path)
-        result = self._run(["file", "-b", rp])
+
+        def file_type():
+            # already in a thread of the pool
+            return subprocess.run(["file", "-b", rp], capture_output=True, text=True, check=True).stdout.strip()
+
+        output = await fs_executor.METADATA.run(metadata_cache.cached, ("file", rp), rp, file_type)
         return filesystem_models.GetFileTypeResponse(
-            output=result.stdout.strip(),
+            output=output,
         )
 
     async def stat(self: "DemoAdapter", resource: status_models.Resource, user: User, path: str, dereference: bool) -> filesystem_models.GetFileStatResponse:
         rp = self.validate_path(path)
         if dereference:
-            stat_info = os.stat(rp)
+            # depends on the target of rp (and of the links on the way), which can be anywhere
+            stat_info = await fs_executor.METADATA.run(os.stat, rp)
         else:
-            stat_info = os.lstat(rp)
+            stat_info = await fs_executor.METADATA.run(metadata_cache.cached, ("stat", rp), rp, lambda: os.lstat(rp))
         return filesystem_models.GetFileStatResponse(
             output=filesystem_models.FileStat(
                 mode=stat_info.st_mode,
@@ -876,7 +910,8 @@ class DemoAdapter(
         rp = self.validate_path(path)
         if rp == PathSandbox.get_base_temp_dir():
             raise HTTPException(status_code=400, detail="Cannot delete sandbox")
-        self._run(["rm", "-rf", rp])
+        await self._run(["rm", "-rf", rp])
+        metadata_cache.invalidate(rp)
         return filesystem_models.RemoveResponse(output=f"Removed {rp}")
 
     async def mkdir(self: "DemoAdapter", resource: status_models.Resource, user: User, request_model: filesystem_models.PostMakeDirRequest) -> filesystem_models.PostMkdirResponse:
@@ -885,20 +920,22 @@ class DemoAdapter(
         if request_model.parent:
             args.append("-p")
         args.append(rp)
-        self._run(args)
-        return filesystem_models.PostMkdirResponse(output=self._file(rp))
+        await self._run(args, pool=fs_executor.METADATA)
+        metadata_cache.invalidate(rp)
+        return filesystem_models.PostMkdirResponse(output=await self._file(rp))
 
     async def symlink(
         self: "DemoAdapter", resource: status_models.Resource, user: User, request_model: filesystem_models.PostFileSymlinkRequest
     ) -> filesystem_models.PostFileSymlinkResponse:
         rp_src = self.validate_path(request_model.path)
         rp_dst = self.validate_path(request_model.link_path)
-        self._run(["ln", "-s", rp_src, rp_dst])
-        return filesystem_models.PostFileSymlinkResponse(output=self._file(rp_dst))
+        await self._run(["ln", "-s", rp_src, rp_dst], pool=fs_executor.METADATA)
+        metadata_cache.invalidate(rp_dst)
+        return filesystem_models.PostFileSymlinkResponse(output=await self._file(rp_dst))
 
     async def download(self: "DemoAdapter", resource: status_models.Resource, user: User, path: str) -> filesystem_models.GetFileDownloadResponse:
         rp = self.validate_path(path)
-        raw_content = pathlib.Path(rp).read_bytes()
+        raw_content = await fs_executor.BULK.run(pathlib.Path(rp).read_bytes)
 
         if len(raw_content) > filesystem_adapter.OPS_SIZE_LIMIT:
             raise Exception("File to download is too large.")
@@ -907,14 +944,59 @@ class DemoAdapter(
             output=base64.b64encode(raw_content).decode("utf-8"),
         )
 
-    async def upload(self: "DemoAdapter", resource: status_models.Resource, user: User, path: str, content: str) -> filesystem_models.PutFileUploadResponse:
+    async def download_path(self: "DemoAdapter", resource: status_models.Resource, user: User, path: str) -> str:
+        return self.validate_path(path)
+
+    async def walk(
+        self: "DemoAdapter",
+        resource: status_models.Resource,
+        user: User,
+        path: str,
+        max_depth: int | None,
+        include: list[str] | None,
+        exclude: list[str] | None,
+        show_hidden: bool,
+        numeric_uid: bool,
+        dereference: bool,
+    ) -> AsyncIterator[filesystem_models.File | filesystem_models.WalkError]:
+        rp = self.validate_path(path)
+        if not await fs_executor.METADATA.run(os.path.isdir, rp):
+            raise HTTPException(status_code=400, detail=f"Not a directory: {path}")
+        async for item in local_walk.walk(rp, max_depth, include, exclude, show_hidden, numeric_uid, dereference):
+            yield item
+
+    async def manifest(
+        self: "DemoAdapter", resource: status_models.Resource, user: User, path: str, algorithm: str
+    ) -> AsyncIterator[filesystem_models.ManifestEntry | filesystem_models.ManifestSummary]:
         rp = self.validate_path(path)
-        if isinstance(content, bytes):
-            pathlib.Path(rp).write_bytes(content)
+        try:
+            local_checksum.validate([algorithm])
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        if not await fs_executor.METADATA.run(os.path.isdir, rp):
+            raise HTTPException(status_code=400, detail=f"Not a directory: {path}")
+        async for item in local_manifest.manifest(rp, algorithm):
+            yield item
+
+    async def upload(
+        self: "DemoAdapter",
+        resource: status_models.Resource,
+        user: User,
+        path: str,
+        content: str | None = None,
+        staged: filesystem_models.StagedFile | None = None,
+    ) -> filesystem_models.PutFileUploadResponse:
+        rp = self.validate_path(path)
+        if staged is not None:
+            # a rename when the staging directory is on the same filesystem, a copy otherwise
+            await fs_executor.BULK.run(shutil.move, staging.staged_path(staged), rp)
+        elif isinstance(content, bytes):
+            await fs_executor.BULK.run(pathlib.Path(rp).write_bytes, content)
         elif isinstance(content, str):
-            pathlib.Path(rp).write_bytes(base64.b64decode(content))
+            await fs_executor.BULK.run(pathlib.Path(rp).write_bytes, base64.b64decode(content))
         else:
             raise Exception(f"Don't know how to handle variable of type: {type(content)}")
+        metadata_cache.invalidate(rp)
         return filesystem_models.PutFileUploadResponse(output=f"Uploaded to {rp}")
 
     async def compress(
@@ -923,70 +1005,66 @@ class DemoAdapter(
         src_rp = self.validate_path(request_model.path)
         dst_rp = self.validate_path(request_model.target_path)
 
-        args = ["tar"]
-        if request_model.compression == filesystem_models.CompressionType.gzip:
-            args.append("-czf")
-        elif request_model.compression == filesystem_models.CompressionType.bzip2:
-            args.append("-cjf")
-        elif request_model.compression == filesystem_models.CompressionType.xz:
-            args.append("-cJf")
-        args.append(dst_rp)
-        if request_model.dereference:
-            args.append("--dereference")
-        if request_model.match_pattern:
-            args.append(f"--include={request_model.match_pattern}")
-
-        args.append("-C")
-        args.append(PathSandbox.get_base_temp_dir())
-        p = pathlib.Path(src_rp)
-        args.append(p.relative_to(PathSandbox.get_base_temp_dir()))
-        subprocess.run(args, check=True)
-
-        return filesystem_models.PostCompressResponse(output=self._file(dst_rp))
+        await fs_executor.BULK.run_stoppable(
+            local_archive.compress,
+            src_rp,
+            dst_rp,
+            request_model.compression,
+            # names in the archive are relative to the sandbox, as with `tar -C`
+            arcname=str(pathlib.Path(src_rp).relative_to(PathSandbox.get_base_temp_dir())),
+            match_pattern=request_model.match_pattern,
+            dereference=request_model.dereference,
+            progress=task_adapter.progress_reporter.get(),
+        )
+        metadata_cache.invalidate(dst_rp)
+
+        return filesystem_models.PostCompressResponse(output=await self._file(dst_rp))
 
     async def extract(self: "DemoAdapter", resource: status_models.Resource, user: User, request_model: filesystem_models.PostExtractRequest) -> filesystem_models.PostExtractResponse:
         src_rp = self.validate_path(request_model.path)
         dst_rp = self.validate_path(request_model.target_path)
 
-        if os.path.exists(dst_rp):
-            if os.path.isdir(dst_rp):
-                raise Exception(f"Target path already exists: {request_model.target_path}")
-            else:
-                raise Exception(f"Target path already exists and is not a directory: {request_model.target_path}")
-        os.makedirs(dst_rp)
-
-        args = ["tar"]
-        if request_model.compression == filesystem_models.CompressionType.gzip:
-            args.append("-xzf")
-        elif request_model.compression == filesystem_models.CompressionType.bzip2:
-            args.append("-xjf")
-        elif request_model.compression == filesystem_models.CompressionType.xz:
-            args.append("-xJf")
-        else:
-            args.append("-xf")
-        args.append(src_rp)
-        args.append("-C")
-        args.append(dst_rp)
-        subprocess.run(args, check=True)
+        def make_target():
+            if os.path.exists(dst_rp):
+                if os.path.isdir(dst_rp):
+                    raise Exception(f"Target path already exists: {request_model.target_path}")
+                else:
+                    raise Exception(f"Target path already exists and is not a directory: {request_model.target_path}")
+            os.makedirs(dst_rp)
+
+        await fs_executor.METADATA.run(make_target)
+
+        await fs_executor.BULK.run_stoppable(
+            local_archive.extract,
+            src_rp,
+            dst_rp,
+            request_model.compression,
+            progress=task_adapter.progress_reporter.get(),
+        )
+        metadata_cache.invalidate(dst_rp)
 
-        return filesystem_models.PostExtractResponse(output=self._file(dst_rp))
+        return filesystem_models.PostExtractResponse(output=await self._file(dst_rp))
 
     async def mv(self: "DemoAdapter", resource: status_models.Resource, user: User, request_model: filesystem_models.PostMoveRequest) -> filesystem_models.PostMoveResponse:
         src_rp = self.validate_path(request_model.path)
         dst_rp = self.validate_path(request_model.target_path)
-        subprocess.run(["mv", src_rp, dst_rp], check=True)
-        return filesystem_models.PostMoveResponse(output=self._file(dst_rp))
+        moved = await fs_executor.BULK.run_stoppable(local_copy.move, src_rp, dst_rp, progress=task_adapter.progress_reporter.get())
+        metadata_cache.invalidate(src_rp, moved)
+        return filesystem_models.PostMoveResponse(output=await self._file(moved))
 
     async def cp(self: "DemoAdapter", resource: status_models.Resource, user: User, request_model: filesystem_models.PostCopyRequest) -> filesystem_models.PostCopyResponse:
         src_rp = self.validate_path(request_model.path)
         dst_rp = self.validate_path(request_model.target_path)
-        args = ["cp"]
-        if request_model.dereference:
-            args.append("-L")
-        args.append(src_rp)
-        args.append(dst_rp)
-        subprocess.run(args, check=True)
-        return filesystem_models.PostCopyResponse(output=self._file(dst_rp))
+        copied = await fs_executor.BULK.run_stoppable(
+            local_copy.copy,
+            src_rp,
+            dst_rp,
+            dereference=request_model.dereference,
+            preserve=request_model.preserve,
+            progress=task_adapter.progress_reporter.get(),
+        )
+        metadata_cache.invalidate(copied)
+        return filesystem_models.PostCopyResponse(output=await self._file(copied))
 
     async def get_task(self: "DemoAdapter", user: User, task_id: str) -> task_models.Task | None:
         await DemoTaskQueue.process_tasks(self)
@@ -996,6 +1074,12 @@ class DemoAdapter(
         await DemoTaskQueue.process_tasks(self)
         return [t for t in DemoTaskQueue.tasks if t.user.name == user.name]
 
+    async def iter_tasks(self: "DemoAdapter", user: User) -> AsyncIterator[task_models.Task]:
+        await DemoTaskQueue.process_tasks(self)
+        for t in list(DemoTaskQueue.tasks):
+            if t.user.name == user.name:
+                yield t
+
     async def put_task(self: "DemoAdapter", user: User, resource: status_models.Resource, task: str) -> task_models.TaskSubmitResponse:
         await DemoTaskQueue.process_tasks(self)
         return DemoTaskQueue.create_task(user, resource, task)
@@ -1004,10 +1088,18 @@ class DemoAdapter(
         await DemoTaskQueue.process_tasks(self)
         for t in DemoTaskQueue.tasks:
             if t.user.name == user.name and t.id == task_id:
+                DemoTaskQueue.cancel(task_id)
                 t.status = task_models.TaskStatus.canceled
                 t.result = None
                 break
 
+    async def wait_task(self: "DemoAdapter", user: User, task_id: str, timeout: float) -> task_models.Task | None:
+        await DemoTaskQueue.process_tasks(self)
+        t = next((t for t in DemoTaskQueue.tasks if t.user.name == user.name and t.id == task_id), None)
+        if t is None:
+            return None
+        return await DemoTaskQueue.run_now(t, timeout)
+
 
 class DemoTask(BaseModel):
     """A simple in-memory task queue for demonstration purposes."""
@@ -1018,11 +1110,14 @@ class DemoTask(BaseModel):
     start: float
     status: task_models.TaskStatus = task_models.TaskStatus.pending
     result: dict | None = None
+    progress: task_models.TaskProgress | None = None
 
 
 class DemoTaskQueue:
     """A simple in-memory task queue for demonstration purposes."""
     tasks = []
+    # id -> asyncio task of the tasks being executed
+    running: dict[str, asyncio.Task] = {}
 
     @staticmethod
     async def process_tasks(da: DemoAdapter):
@@ -1036,19 +1131,62 @@ class DemoTaskQueue:
             if t.status == task_models.TaskStatus.pending and now - t.start > DEMO_QUEUE_UPDATE_SECS:
                 t.status = task_models.TaskStatus.active
                 t.start = now
-            elif t.status == task_models.TaskStatus.active and now - t.start > DEMO_QUEUE_UPDATE_SECS:
-                cmd = task_models.TaskCommand.model_validate_json(t.task)
-                (result, status) = await DemoAdapter.on_task(t.resource, t.user, cmd)
-                if isinstance(result, BaseModel):
-                    t.result = result.model_dump()
-                elif isinstance(result, dict):
-                    t.result = result
-                else:
-                    t.result = {"output": result}
-                t.status = status
+            elif t.status == task_models.TaskStatus.active and now - t.start > DEMO_QUEUE_UPDATE_SECS and t.id not in DemoTaskQueue.running:
+                # run as its own asyncio task, so that delete_task can cancel it
+                running = asyncio.create_task(DemoTaskQueue.execute(t))
+                DemoTaskQueue.running[t.id] = running
+                await asyncio.wait([running])
             _tasks.append(t)
         DemoTaskQueue.tasks = _tasks
 
+    @staticmethod
+    async def execute(t: DemoTask):
+        started = time.monotonic()
+
+        def report(done: int, total: int | None):
+            elapsed = time.monotonic() - started
+            t.progress = task_models.TaskProgress(bytes_done=done, bytes_total=total, bytes_per_second=int(done / elapsed) if elapsed > 0 else None)
+
+        # this asyncio task runs in a copy of the context: the reporter is only seen by this task
+        task_adapter.progress_reporter.set(report)
+        try:
+            cmd = task_models.TaskCommand.model_validate_json(t.task)
+            (result, status) = await DemoAdapter.on_task(t.resource, t.user, cmd)
+            if isinstance(result, BaseModel):
+                t.result = result.model_dump()
+            elif isinstance(result, dict):
+                t.result = result
+            else:
+                t.result = {"output": result}
+            t.status = status
+        except asyncio.CancelledError:
+            t.status = task_models.TaskStatus.canceled
+            t.result = None
+        finally:
+            DemoTaskQueue.running.pop(t.id, None)
+
+    @staticmethod
+    async def run_now(t: DemoTask, timeout: float) -> DemoTask | None:
+        """Execute a task without waiting for its turn, and return it if it finishes within timeout seconds (it goes on running otherwise)."""
+        running = DemoTaskQueue.running.get(t.id)
+        if running is None and t.status in [task_models.TaskStatus.pending, task_models.TaskStatus.active]:
+            t.status = task_models.TaskStatus.active
+            t.start = utc_timestamp()
+            running = asyncio.create_task(DemoTaskQueue.execute(t))
+            DemoTaskQueue.running[t.id] = running
+        if running is not None:
+            await asyncio.wait([running], timeout=timeout)
+        if t.status in [task_models.TaskStatus.pending, task_models.TaskStatus.active]:
+            return None
+        return t
+
+    @staticmethod
+    def cancel(task_id: str):
+        """Cancel the execution of a task, if it's running: its queued or running filesystem calls are cancelled too."""
+        running = DemoTaskQueue.running.get(task_id)
+        if running is not None:
+            running.cancel()
+
     @staticmethod
     def create_task(user: User, resource: status_models.Resource, command: task_models.TaskCommand) -> task_models.TaskSubmitResponse:
         """Create a new task in the queue."""
@@ -1,35 +1,63 @@
 #!/usr/bin/env python3
 """Main API application"""
 
-import logging
-from fastapi import FastAPI
-from opentelemetry import trace
-from opentelemetry.sdk.resources import Resource
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import ConsoleSpanExporter, BatchSpanProcessor, SimpleSpanProcessor
-from opentelemetry.sdk.trace.sampling import TraceIdRatioBased, ParentBased
-from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
-from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
-
-from app.routers.error_handlers import install_error_handlers
-from app.routers.facility import facility
-from app.routers.status import status
-from app.routers.account import account
-from app.routers.compute import compute
-from app.routers.filesystem import filesystem
-from app.routers.task import task
-
-from . import config
+import time
+
+_started = time.perf_counter()
+
+import logging  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+from app.routers import iri_response  # noqa: E402
+from app.routers.compression import CompressionMiddleware  # noqa: E402
+from app.routers.error_handlers import install_error_handlers  # noqa: E402
+
+from . import config  # noqa: E402
+from . import openapi_artifact  # noqa: E402
+
+# milliseconds spent in each startup phase (see tools/startup_report.py)
+STARTUP_TIMINGS: dict[str, float] = {}
+_phase_started = _started
+
+
+def _phase_done(name: str):
+    global _phase_started
+    now = time.perf_counter()
+    STARTUP_TIMINGS[name] = (now - _phase_started) * 1000
+    _phase_started = now
+
+
+_phase_done("imports")
+
+# the routers load their adapters when they are imported
+from app.routers.facility import facility  # noqa: E402
+from app.routers.status import status  # noqa: E402
+from app.routers.account import account  # noqa: E402
+from app.routers.compute import compute  # noqa: E402
+from app.routers.filesystem import filesystem  # noqa: E402
+from app.routers.task import task  # noqa: E402
+
+ROUTERS = [facility.router, status.router, account.router, compute.router, filesystem.router, task.router]
+
+_phase_done("routers and adapters")
 
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s %(levelname)s %(name)s: %(message)s"
 )
 
+
 # ------------------------------------------------------------------
 # OpenTelemetry Tracing Configuration
 # ------------------------------------------------------------------
-if config.OPENTELEMETRY_ENABLED:
+def _init_tracing():
+    # the OpenTelemetry SDK and exporters are only imported when tracing is enabled
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter, BatchSpanProcessor, SimpleSpanProcessor
+    from opentelemetry.sdk.trace.sampling import TraceIdRatioBased, ParentBased
+
     resource = Resource.create({"service.name": "iri-facility-api", "service.version": config.API_VERSION, "service.endpoint": config.API_URL_ROOT})
 
     samplerate = "1.0" if config.OPENTELEMETRY_DEBUG else config.OTEL_SAMPLE_RATE
@@ -37,30 +65,59 @@ if config.OPENTELEMETRY_ENABLED:
     trace.set_tracer_provider(provider)
 
     if config.OTLP_ENDPOINT:
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
         exporter = OTLPSpanExporter(endpoint=config.OTLP_ENDPOINT, insecure=True)
         span_processor = BatchSpanProcessor(exporter)
     else:
         exporter = ConsoleSpanExporter()
         span_processor = SimpleSpanProcessor(exporter)
     provider.add_span_processor(span_processor)
-    tracer = trace.get_tracer(__name__)
+
+
+if config.OPENTELEMETRY_ENABLED:
+    _init_tracing()
+    _phase_done("tracing")
 # ------------------------------------------------------------------
 
 APP = FastAPI(servers=[{"url": config.API_URL_ROOT}], **config.API_CONFIG)
 
 if config.OPENTELEMETRY_ENABLED:
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
     FastAPIInstrumentor.instrument_app(APP)
 
 install_error_handlers(APP)
 
+if config.COMPRESSION_ENABLED:
+    APP.add_middleware(CompressionMiddleware)
+
 api_prefix = f"{config.API_PREFIX}{config.API_URL}"
 
 # Attach routers under the prefix
-APP.include_router(facility.router, prefix=api_prefix)
-APP.include_router(status.router, prefix=api_prefix)
-APP.include_router(account.router, prefix=api_prefix)
-APP.include_router(compute.router, prefix=api_prefix)
-APP.include_router(filesystem.router, prefix=api_prefix)
-APP.include_router(task.router, prefix=api_prefix)
+for _router in ROUTERS:
+    APP.include_router(_router, prefix=api_prefix)
+
+_default_openapi = APP.openapi
+
+
+def openapi():
+    """The OpenAPI schema, with the binary media types the API can respond with."""
+    if APP.openapi_schema is None:
+        APP.openapi_schema = iri_response.add_binary_media_types(_default_openapi())
+    return APP.openapi_schema
+
+
+APP.openapi = openapi
+
+_phase_done("app")
+
+# serve the schema generated at build time, if it matches this app
+SCHEMA_FINGERPRINT = openapi_artifact.fingerprint(ROUTERS, api_prefix)
+APP.openapi_schema = openapi_artifact.load(config.OPENAPI_SCHEMA_FILE, SCHEMA_FINGERPRINT)
+
+_phase_done("openapi schema")
 
 logging.getLogger().info(f"API path: {api_prefix}")
+logging.getLogger().info(
+    f"Startup took {(_phase_started - _started) * 1000:.0f} ms ({', '.join(f'{name}: {ms:.0f} ms' for name, ms in STARTUP_TIMINGS.items())}), "
+    f"OpenAPI schema {'precomputed' if APP.openapi_schema is not None else 'built on first use'}"
+)
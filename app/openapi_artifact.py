@@ -0,0 +1,85 @@
+"""
+OpenAPI schema generated at build time (see tools/build_openapi.py).
+
+Building the schema walks every route and response model, which each worker would otherwise do on the first
+`/openapi.json` or docs request. The artifact stores the schema together with a fingerprint of what it was built
+from (API configuration, the settings that appear in route descriptions and parameter limits, FastAPI and pydantic
+versions, the routes of every router and the source of the `app` package, which declares their parameters and
+models), and is only used when the running app has the same
+fingerprint, so a stale artifact falls back to building the schema instead of serving a wrong one.
+"""
+import hashlib
+import json
+import logging
+import os
+
+import fastapi
+import pydantic
+from fastapi.routing import APIRoute
+
+from . import config
+from .routers import iri_response
+from .routers.filesystem import facility_adapter as filesystem_adapter
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def source_digest(directory: str = APP_DIR) -> str:
+    """Return the hash of the python sources under directory: any change to a model, parameter or description changes it."""
+    digest = hashlib.sha256()
+    for root, dirnames, filenames in os.walk(directory):
+        dirnames[:] = sorted(d for d in dirnames if d != "__pycache__")
+        for name in sorted(filenames):
+            if name.endswith(".py"):
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, directory).encode() + b"\0")
+                with open(path, "rb") as f:
+                    digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def fingerprint(routers, api_prefix: str) -> str:
+    """Return the fingerprint of the schema the app would build from these routers."""
+    routes = []
+    for router in routers:
+        for route in router.routes:
+            if isinstance(route, APIRoute):
+                routes.append((route.path, sorted(route.methods), route.operation_id, route.description, route.include_in_schema and router.include_in_schema))
+    source = {
+        "fastapi": fastapi.__version__,
+        "pydantic": pydantic.VERSION,
+        "sources": source_digest(),
+        "binary_media_types": sorted(iri_response.BINARY_ENCODERS),
+        "api_config": config.API_CONFIG,
+        "api_url_root": config.API_URL_ROOT,
+        "api_prefix": api_prefix,
+        # environment settings baked into route descriptions and parameter limits
+        "settings": {
+            name: getattr(filesystem_adapter, name)
+            for name in ("OPS_SIZE_LIMIT", "UPLOAD_SIZE_LIMIT", "UPLOAD_SESSION_TTL", "UPLOAD_CHUNK_SIZE_LIMIT", "BATCH_SIZE_LIMIT")
+        },
+        "routes": routes,
+    }
+    return hashlib.sha256(json.dumps(source, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def load(path: str, expected_fingerprint: str) -> dict | None:
+    """Return the schema stored at path if it was built with the expected fingerprint, or None."""
+    try:
+        with open(path, "rb") as f:
+            artifact = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as exc:
+        logging.getLogger().warning(f"Ignoring the OpenAPI schema in {path}: {exc}")
+        return None
+    if artifact.get("fingerprint") != expected_fingerprint:
+        logging.getLogger().warning(f"Ignoring the OpenAPI schema in {path}: it was built for a different configuration, source or version, run tools/build_openapi.py")
+        return None
+    return artifact["schema"]
+
+
+def write(path: str, schema: dict, schema_fingerprint: str):
+    """Store a schema with its fingerprint."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": schema_fingerprint, "schema": schema}, f, separators=(",", ":"))
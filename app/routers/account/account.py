@@ -4,7 +4,7 @@ from ...types.http import forbidExtraQueryParams
 from ...types.models import Capability
 from ...types.scalars import StrictDateTime
 from ...types.user import User
-from .. import iri_router
+from .. import iri_response, iri_router
 from ..error_handlers import DEFAULT_RESPONSES
 from ..iri_meta import iri_meta_dict
 from . import facility_adapter, models
@@ -31,9 +31,12 @@ async def get_capabilities(
     modified_since: StrictDateTime = Query(default=None),
     offset: int = Query(default=0, ge=0, le=1000),
     limit: int = Query(default=100, ge=0, le=1000),
-    _forbid=Depends(forbidExtraQueryParams("name", "modified_since", "offset", "limit")),
+    fields: list[str] | None = Query(default=None, description=iri_response.FIELDS_DESCRIPTION),
+    _forbid=Depends(forbidExtraQueryParams("name", "modified_since", "offset", "limit", "fields", multiParams={"fields"})),
 ) -> list[Capability]:
-    return await router.adapter.get_capabilities(name=name, modified_since=modified_since, offset=offset, limit=limit)
+    include = iri_response.parse_fields(fields, Capability)
+    capabilities = await router.adapter.get_capabilities(name=name, modified_since=modified_since, offset=offset, limit=limit)
+    return iri_response.with_fields(capabilities, include)
 
 
 @router.get(
@@ -2,7 +2,7 @@
 import datetime
 from pydantic import Field, computed_field, field_validator
 
-from ... import config
+from ...types import links
 from ...types.base import IRIBaseModel
 from ...types.scalars import AllocationUnit
 
@@ -26,7 +26,7 @@ class Project(IRIBaseModel):
     @property
     def self_uri(self) -> str:
         """Return the URI for this project resource."""
-        return f"{config.API_URL_ROOT}{config.API_PREFIX}{config.API_URL}/account/projects/{self.id}"
+        return links.ACCOUNT_PROJECT(self.id)
 
 
 class AllocationEntry(IRIBaseModel):
@@ -54,13 +54,13 @@ class ProjectAllocation(IRIBaseModel):
     @property
     def project_uri(self) -> str:
         """Return the URI for the associated project resource."""
-        return f"{config.API_URL_ROOT}{config.API_PREFIX}{config.API_URL}/account/projects/{self.project_id}"
+        return links.ACCOUNT_PROJECT(self.project_id)
 
     @computed_field(description="URI of the associated capability resource")
     @property
     def capability_uri(self) -> str:
         """Return the URI for the associated capability."""
-        return f"{config.API_URL_ROOT}{config.API_PREFIX}{config.API_URL}/account/capabilities/{self.capability_id}"
+        return links.ACCOUNT_CAPABILITY(self.capability_id)
 
 
 class UserAllocation(IRIBaseModel):
@@ -79,4 +79,4 @@ class UserAllocation(IRIBaseModel):
     @property
     def project_allocation_uri(self) -> str:
         """Return the URI for the associated project allocation."""
-        return f"{config.API_URL_ROOT}{config.API_PREFIX}{config.API_URL}/account/projects/{self.project_id}/project_allocations/{self.project_allocation_id}"
+        return f"{links.ACCOUNT_PROJECT(self.project_id)}/project_allocations/{self.project_allocation_id}"
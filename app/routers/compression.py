@@ -0,0 +1,215 @@
+"""
+Response compression negotiated with Accept-Encoding (zstd, br, gzip).
+Brotli and zstd are used when the optional `brotli` and `zstandard` packages are installed.
+Complete bodies are cached compressed, keyed by their digest, so hot responses are compressed once.
+Bodies and chunks above COMPRESSION_THREAD_MIN_SIZE are compressed in a worker thread, off the event loop.
+"""
+import asyncio
+import hashlib
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .. import config
+from ..types.fragments import FragmentCache
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/problem+json", "application/x-ndjson", "application/msgpack", "application/cbor", "application/xml", "application/yaml", "application/javascript")
+
+
+class _GzipStream:
+    def __init__(self):
+        self._obj = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        # a sync flush after every chunk lets streamed items reach the client as they are produced
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _BrotliStream:
+    def __init__(self):
+        self._obj = brotli.Compressor(quality=5)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        return self._obj.process(data) + (self._obj.finish() if final else self._obj.flush())
+
+
+class _ZstdStream:
+    def __init__(self):
+        self._obj = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        return self._obj.compress(data) + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+
+def _gzip(data: bytes) -> bytes:
+    return _GzipStream().compress(data, final=True)
+
+
+# encoding: (one-shot compressor, streaming compressor), in server preference order
+CODECS = {}
+if zstandard is not None:
+    CODECS["zstd"] = (zstandard.ZstdCompressor(level=3).compress, _ZstdStream)
+if brotli is not None:
+    CODECS["br"] = (lambda data: brotli.compress(data, quality=5), _BrotliStream)
+CODECS["gzip"] = (_gzip, _GzipStream)
+
+
+def negotiate(accept_encoding: str) -> str | None:
+    """Return the preferred encoding the client accepts (by q-value, then server preference), or None."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            accepted[name] = q
+    wildcard = accepted.get("*", 0.0)
+    candidates = [(accepted.get(name, wildcard), -i, name) for i, name in enumerate(CODECS)]
+    q, _, name = max(candidates)
+    return name if q > 0 else None
+
+
+def _compressible(headers: Headers) -> bool:
+    # files served with range support keep their identity encoding, so they can be sent zero-copy
+    # and the byte ranges of later requests refer to the same representation
+    if "accept-ranges" in headers:
+        return False
+    return "content-encoding" not in headers and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+
+
+def _add_vary(headers: MutableHeaders):
+    vary = headers.get("vary")
+    if not vary:
+        headers["Vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding"
+
+
+async def _run(func, *args, size: int):
+    if size >= config.COMPRESSION_THREAD_MIN_SIZE:
+        return await asyncio.to_thread(func, *args)
+    return func(*args)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with the best encoding accepted by the client."""
+
+    def __init__(self, app: ASGIApp, min_size: int = config.COMPRESSION_MIN_SIZE, cache_bytes: int = config.COMPRESSION_CACHE_BYTES):
+        self.app = app
+        self.min_size = min_size
+        self.cache = FragmentCache(cache_bytes) if cache_bytes > 0 else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        await _CompressedResponse(self, encoding, scope.get("method") == "GET")(scope, receive, send)
+
+    async def compress_body(self, encoding: str, body: bytes, cacheable: bool) -> bytes:
+        """Compress a complete body, from the cache when the same body was compressed before."""
+        key = None
+        if cacheable and self.cache is not None:
+            key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+            compressed = self.cache.lookup(key, None)
+            if compressed is not None:
+                return compressed
+        compressed = await _run(CODECS[encoding][0], body, size=len(body))
+        if key is not None:
+            self.cache.store(key, None, compressed)
+        return compressed
+
+
+class _CompressedResponse:
+    """Compresses a single response, either as a whole or chunk by chunk when it is streamed."""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str | None, cacheable: bool):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.cacheable = cacheable
+        self.start: Message | None = None
+        self.started = False
+        self.stream = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.middleware.app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = MutableHeaders(scope=message)
+            compressible = _compressible(headers)
+            if compressible:
+                _add_vary(headers)
+            # partial content and bodyless responses are never encoded
+            self.passthrough = not compressible or self.encoding is None or message["status"] in (204, 206, 304)
+            if not self.passthrough and int(headers.get("content-length", self.middleware.min_size)) < self.middleware.min_size:
+                self.passthrough = True
+            self.cacheable = self.cacheable and message["status"] == 200
+            if self.passthrough:
+                await self._send_start()
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            # e.g. a file sent with the pathsend extension
+            await self._send_start()
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        headers = MutableHeaders(scope=self.start)
+
+        if self.stream is None and not more_body:
+            # complete body
+            if len(body) < self.middleware.min_size:
+                await self._send_start()
+                await self.send(message)
+                return
+            compressed = await self.middleware.compress_body(self.encoding, body, self.cacheable)
+            self._set_encoding(headers)
+            headers["Content-Length"] = str(len(compressed))
+            await self._send_start()
+            await self.send({"type": "http.response.body", "body": compressed})
+            return
+
+        if self.stream is None:
+            # streamed body: compress each chunk as it comes, without a content-length
+            self.stream = CODECS[self.encoding][1]()
+            self._set_encoding(headers)
+            del headers["Content-Length"]
+            await self._send_start()
+        chunk = await _run(self.stream.compress, body, not more_body, size=len(body))
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    async def _send_start(self):
+        if not self.started:
+            self.started = True
+            await self.send(self.start)
+
+    def _set_encoding(self, headers: MutableHeaders):
+        headers["Content-Encoding"] = self.encoding
+        # the encoded representation has different bytes, so a strong validator becomes weak
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
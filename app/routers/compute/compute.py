@@ -5,7 +5,7 @@ from fastapi import Depends, HTTPException, Query, Request, status
 from ...types.http import forbidExtraQueryParams
 from ...types.scalars import StrictHTTPBool
 from ...types.user import User
-from .. import iri_router
+from .. import iri_response, iri_router
 from ..error_handlers import DEFAULT_RESPONSES
 from ..iri_meta import iri_meta_dict
 from ..status.status import router as status_router
@@ -112,7 +112,7 @@ async def get_job_status(
     "/status/{resource_id:str}",
     response_model=list[models.Job],
     response_model_exclude_unset=True,
-    responses=DEFAULT_RESPONSES,
+    responses={**DEFAULT_RESPONSES, **iri_response.NDJSON_RESPONSES},
     operation_id="getJobs",
     openapi_extra=iri_meta_dict("production", "required")
 )
@@ -125,16 +125,22 @@ async def get_job_statuses(
     filters: dict[str, object] | None = None,
     historical: StrictHTTPBool | None = Query(default=False, description="Whether to include historical jobs. Defaults to false"),
     include_spec: StrictHTTPBool | None = Query(default=False, description="Whether to include the job specification. Defaults to false"),
-    _forbid=Depends(forbidExtraQueryParams("offset", "limit", "filters", "historical", "include_spec")),
+    fields: list[str] | None = Query(default=None, description=iri_response.FIELDS_DESCRIPTION),
+    _forbid=Depends(forbidExtraQueryParams("offset", "limit", "filters", "historical", "include_spec", "fields", multiParams={"fields"})),
 ):
-    """Get multiple jobs' statuses"""
+    """Get multiple jobs' statuses. Send `Accept: application/x-ndjson` to stream the jobs, one per line."""
+    include = iri_response.parse_fields(fields, models.Job)
     # look up the resource (todo: maybe ensure it's available)
     # This could be done via slurm (in the adapter) or via psij's "attach" (https://exaworks.org/psij-python/docs/v/0.9.11/user_guide.html#detaching-and-attaching-jobs)
     resource = await status_router.adapter.get_resource(resource_id)
 
-    jobs = await router.adapter.get_jobs(resource=resource, user=user, offset=offset, limit=limit, filters=filters, historical=historical, include_spec=include_spec)
+    job_filters = dict(resource=resource, user=user, offset=offset, limit=limit, filters=filters, historical=historical, include_spec=include_spec)
+    if iri_response.wants_stream(request):
+        return await iri_response.stream(request, router.adapter.iter_jobs(**job_filters), allow_empty=True, include=include)
+
+    jobs = await router.adapter.get_jobs(**job_filters)
 
-    return jobs
+    return iri_response.with_fields(jobs, include)
 
 
 @router.delete(
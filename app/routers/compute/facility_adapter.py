@@ -1,4 +1,5 @@
 from abc import abstractmethod
+from collections.abc import AsyncIterator
 from ...types.user import User
 from ..status import models as status_models
 from . import models as compute_models
@@ -44,6 +45,14 @@ class FacilityAdapter(AuthenticatedAdapter):
     ) -> list[compute_models.Job]:
         pass
 
+    async def iter_jobs(self: "FacilityAdapter", **kwargs) -> AsyncIterator[compute_models.Job]:
+        """
+        Yield the jobs that `get_jobs` would return (it takes the same arguments), for streamed responses.
+        Override it to produce jobs incrementally (e.g. while paging through the scheduler) instead of building the whole list.
+        """
+        for job in await self.get_jobs(**kwargs):
+            yield job
+
     @abstractmethod
     async def cancel_job(self: "FacilityAdapter", resource: status_models.Resource, user: User, job_id: str) -> bool:
         pass
@@ -13,6 +13,8 @@ from fastapi.responses import JSONResponse, Response
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
+from . import iri_response
+
 
 class Problem(BaseModel):
     model_config = ConfigDict(extra="allow", json_schema_extra={"description": 'Error structure for REST interface based on RFC 9457, "Problem Details for HTTP APIs."'})
@@ -44,7 +46,7 @@ def safe_instance_url(request: Request) -> str:
 
 
 def problem_response(*, request: Request, status: int, title, detail, problem_type: str, invalid_params=None, extra_headers=None):
-    """Return a JSON problem response with the given status, title, and detail."""
+    """Return a problem response with the given status, title, and detail: JSON, or MessagePack/CBOR if the client prefers it."""
     instance = safe_instance_url(request)
     url_base = get_url_base(request)
 
@@ -77,6 +79,10 @@ def problem_response(*, request: Request, status: int, title, detail, problem_ty
         body["invalid_params"] = invalid_params
 
     headers = extra_headers or {}
+    binary_media_type = iri_response.negotiate_binary(request.headers.get("accept", ""))
+    if binary_media_type:
+        headers = {**headers, "Vary": "Accept"}
+        return Response(status_code=status, content=iri_response.encode_binary(Problem(**body).model_dump(), binary_media_type), headers=headers, media_type=binary_media_type)
     return JSONResponse(status_code=status, content=Problem(**body).model_dump(), headers=headers, media_type="application/problem+json")
 
 
@@ -161,6 +167,25 @@ def install_error_handlers(app: FastAPI):
                 problem_type="conflict",
             )
 
+        if exc.status_code == 410:
+            return problem_response(
+                request=request,
+                status=410,
+                title="Gone",
+                detail=err_msg or "The requested resource is no longer available.",
+                problem_type="gone",
+            )
+
+        if exc.status_code == 429:
+            return problem_response(
+                request=request,
+                status=429,
+                title="Too Many Requests",
+                detail=err_msg or "Too many requests.",
+                problem_type="too-many-requests",
+                extra_headers=exc.headers,
+            )
+
         # Generic fallback
         return problem_response(
             request=request,
@@ -2,7 +2,7 @@ from fastapi import Depends, Query, Request, HTTPException
 
 from ...types.http import forbidExtraQueryParams
 from ...types.scalars import StrictDateTime
-from .. import iri_router
+from .. import iri_response, iri_router
 from ..error_handlers import DEFAULT_RESPONSES
 from ..iri_meta import iri_meta_dict
 from . import facility_adapter, models
@@ -40,13 +40,15 @@ async def list_sites(
     offset: int = Query(default=0, ge=0),
     limit: int = Query(default=100, ge=0, le=1000),
     short_name: str | None = Query(default=None, min_length=1),
-    _forbid=Depends(forbidExtraQueryParams("modified_since", "name", "offset", "limit", "short_name")),
+    fields: list[str] | None = Query(default=None, description=iri_response.FIELDS_DESCRIPTION),
+    _forbid=Depends(forbidExtraQueryParams("modified_since", "name", "offset", "limit", "short_name", "fields", multiParams={"fields"})),
 ) -> list[models.Site]:
     """List sites"""
+    include = iri_response.parse_fields(fields, models.Site)
     sites = await router.adapter.list_sites(modified_since=modified_since, name=name, offset=offset, limit=limit, short_name=short_name)
     if not sites:
         raise HTTPException(status_code=404, detail="No sites found")
-    return sites
+    return iri_response.with_fields(sites, include)
 
 
 @router.get("/sites/{site_id}", responses=DEFAULT_RESPONSES, operation_id="getSite", response_model_exclude_none=True, openapi_extra=iri_meta_dict("production", "required"))
@@ -1,14 +1,13 @@
 """Facility-related models."""
 from pydantic import Field, HttpUrl, computed_field
 
-from ... import config
+from ...types import links
 from ...types.base import NamedObject
 
 
 class Site(NamedObject):
     """A physical site that hosts resources and is part of a facility."""
-    def _self_path(self) -> str:
-        return f"/facility/sites/{self.id}"
+    _self_link = links.FACILITY_SITE
 
     short_name: str|None = Field(default=None, description="Common or short name of the Site.", example="NERSC")
     operating_organization: str|None = Field(..., description="Organization operating the Site.", example="Lawrence Berkeley National Laboratory")
@@ -26,7 +25,7 @@ class Site(NamedObject):
     @property
     def resource_uris(self) -> list[str]:
         """Return the list of resource URIs for this site."""
-        return [f"{config.API_URL_ROOT}{config.API_PREFIX}{config.API_URL}/status/resources/{resource_id}" for resource_id in self.resource_ids]
+        return links.STATUS_RESOURCE.many(self.resource_ids)
 
     @classmethod
     def find(cls, items, name=None, description=None, modified_since=None, short_name=None, country_name=None):
@@ -53,4 +52,4 @@ class Facility(NamedObject):
     @property
     def site_uris(self) -> list[str]:
         """Return the list of site URIs for this facility."""
-        return [f"{config.API_URL_ROOT}{config.API_PREFIX}{config.API_URL}/facility/sites/{site_id}" for site_id in self.site_ids]
+        return links.FACILITY_SITE.many(self.site_ids)
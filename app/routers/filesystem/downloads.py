@@ -0,0 +1,63 @@
+"""
+Direct file downloads.
+
+Files are sent with starlette's FileResponse: in fixed-size chunks read in a worker thread (or with the
+`http.response.pathsend` extension, i.e. zero-copy, on servers that support it), so memory use per transfer
+doesn't depend on the file size. `Range` and `If-Range` requests are answered with partial content.
+The ETag is derived from the file's inode, modification time and size, and the number of concurrent
+downloads per user is bounded by DOWNLOAD_CONCURRENCY_PER_USER (per worker process).
+"""
+import os
+from collections import defaultdict
+
+from fastapi import HTTPException, status
+from fastapi.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+from . import facility_adapter
+
+_active: defaultdict[str, int] = defaultdict(int)
+
+
+def etag(stat_result: os.stat_result) -> str:
+    """Return the strong ETag of a file: it changes when the file is replaced (inode), modified or resized."""
+    return f'"{stat_result.st_ino:x}-{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def etag_matches(if_none_match: str, tag: str) -> bool:
+    """Return whether an If-None-Match header matches the ETag (weak comparison, as for GET)."""
+    if if_none_match.strip() == "*":
+        return True
+    tag = tag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == tag for candidate in if_none_match.split(","))
+
+
+def acquire(user_id: str):
+    """Take a download slot of the user, or raise 429 if the user has no slot left."""
+    if _active[user_id] >= facility_adapter.DOWNLOAD_CONCURRENCY_PER_USER:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Too many concurrent downloads (max {facility_adapter.DOWNLOAD_CONCURRENCY_PER_USER}).",
+            headers={"Retry-After": "1"},
+        )
+    _active[user_id] += 1
+
+
+def release(user_id: str):
+    _active[user_id] -= 1
+    if _active[user_id] <= 0:
+        del _active[user_id]
+
+
+class DownloadResponse(FileResponse):
+    """A FileResponse holding one of the user's download slots until the transfer ends (or the client goes away)."""
+
+    def __init__(self, *args, user_id: str, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user_id = user_id
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            release(self.user_id)
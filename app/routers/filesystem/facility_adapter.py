@@ -1,5 +1,7 @@
 import os
+import tempfile
 from abc import abstractmethod
+from typing import AsyncIterator
 from ...types.user import User
 from ..status import models as status_models
 from . import models as filesystem_models
@@ -14,6 +16,39 @@ def to_int(name, default_value):
 
 
 OPS_SIZE_LIMIT = to_int("OPS_SIZE_LIMIT", 5 * 1024 * 1024)
+# uploads are streamed to the staging directory, so their limit doesn't depend on memory
+UPLOAD_SIZE_LIMIT = to_int("UPLOAD_SIZE_LIMIT", 5 * 1024 * 1024 * 1024)
+# files sent by the /filesystem/stream route at the same time by each user (per worker process)
+DOWNLOAD_CONCURRENCY_PER_USER = to_int("DOWNLOAD_CONCURRENCY_PER_USER", 4)
+# resumable upload sessions expire after this many seconds without receiving a chunk
+UPLOAD_SESSION_TTL = to_int("UPLOAD_SESSION_TTL", 24 * 3600)
+UPLOAD_CHUNK_SIZE_LIMIT = to_int("UPLOAD_CHUNK_SIZE_LIMIT", 256 * 1024 * 1024)
+UPLOAD_STAGING_DIR = os.environ.get("UPLOAD_STAGING_DIR") or os.path.join(tempfile.gettempdir(), "iri-upload-staging")
+# checksums of unchanged files are served from this sqlite database (empty: no cache)
+CHECKSUM_CACHE_PATH = os.environ.get("CHECKSUM_CACHE_PATH", os.path.join(tempfile.gettempdir(), "iri-checksum-cache.sqlite"))
+CHECKSUM_CACHE_ENTRIES = to_int("CHECKSUM_CACHE_ENTRIES", 1_000_000)
+# user and group names of file owners are looked up again after this many seconds
+OWNER_NAME_CACHE_TTL = to_int("OWNER_NAME_CACHE_TTL", 300)
+# threads (or subprocesses) running quick metadata calls and data-moving calls, see local/executor.py
+METADATA_WORKERS = to_int("METADATA_WORKERS", 16)
+BULK_WORKERS = to_int("BULK_WORKERS", 4)
+# threads compressing each gzip or zstd archive, see local/archive.py
+ARCHIVE_THREADS = to_int("ARCHIVE_THREADS", min(8, os.cpu_count() or 1))
+# files copied at the same time by each cp (or mv across filesystems), see local/copy.py
+COPY_WORKERS = to_int("COPY_WORKERS", 8)
+# stat results, file types and listings cached by the local filesystem layer (0: no cache), see local/metadata_cache.py
+METADATA_CACHE_ENTRIES = to_int("METADATA_CACHE_ENTRIES", 10000)
+# lifetime of the cached metadata of directories that can't be watched with inotify
+METADATA_CACHE_TTL = to_int("METADATA_CACHE_TTL", 5)
+# files hashed at the same time (in the bulk pool) by each /filesystem/manifest request of the demo adapter
+MANIFEST_WORKERS = to_int("MANIFEST_WORKERS", 8)
+# directories scanned at the same time (in the metadata pool) by each /filesystem/walk request of the demo adapter
+WALK_WORKERS = to_int("WALK_WORKERS", 8)
+# with `wait`, task routes return the result of tasks finishing within this many milliseconds (0: never wait)
+TASK_WAIT_BUDGET_MS = to_int("TASK_WAIT_BUDGET_MS", 500)
+# operations of a /filesystem/batch request, and how many of them run at the same time
+BATCH_SIZE_LIMIT = to_int("BATCH_SIZE_LIMIT", 1000)
+BATCH_CONCURRENCY = to_int("BATCH_CONCURRENCY", 8)
 
 
 class FacilityAdapter(AuthenticatedAdapter):
@@ -37,8 +72,19 @@ class FacilityAdapter(AuthenticatedAdapter):
 
     @abstractmethod
     async def ls(
-        self: "FacilityAdapter", resource: status_models.Resource, user: User, path: str, show_hidden: bool, numeric_uid: bool, recursive: bool, dereference: bool
+        self: "FacilityAdapter",
+        resource: status_models.Resource,
+        user: User,
+        path: str,
+        show_hidden: bool,
+        numeric_uid: bool,
+        recursive: bool,
+        dereference: bool,
+        offset: int = 0,
+        limit: int | None = None,
+        sort: str = "name",
     ) -> filesystem_models.GetDirectoryLsResponse:
+        """List a directory: the entries from `offset` (at most `limit` of them) in `sort` order (see `filesystem_models.LsSort`)."""
         pass
 
     @abstractmethod
@@ -54,7 +100,14 @@ class FacilityAdapter(AuthenticatedAdapter):
         pass
 
     @abstractmethod
-    async def checksum(self: "FacilityAdapter", resource: status_models.Resource, user: User, path: str) -> filesystem_models.GetFileChecksumResponse:
+    async def checksum(
+        self: "FacilityAdapter",
+        resource: status_models.Resource,
+        user: User,
+        path: str,
+        algorithms: list[str] | None = None,
+    ) -> filesystem_models.GetFileChecksumResponse:
+        """Return the checksums of a file, for the given algorithms (see `filesystem_models.ChecksumAlgorithm`; default: SHA-256)."""
         pass
 
     @abstractmethod
@@ -86,8 +139,61 @@ class FacilityAdapter(AuthenticatedAdapter):
     async def download(self: "FacilityAdapter", resource: status_models.Resource, user: User, path: str) -> filesystem_models.GetFileDownloadResponse:
         pass
 
-    @abstractmethod
-    async def upload(self: "FacilityAdapter", resource: status_models.Resource, user: User, path: str, content: str) -> filesystem_models.PutFileUploadResponse:
+    async def download_path(self: "FacilityAdapter", resource: status_models.Resource, user: User, path: str) -> str:
+        """
+        Return the local path, readable by the API server, of the file (or directory) at path on the resource, for
+        direct streaming downloads. Raise an HTTPException (e.g. 403, 404) if the user may not read it.
+        This method is optional; adapters whose files are not reachable from the API server can leave it unimplemented.
+        """
+        raise NotImplementedError
+
+    async def walk(
+        self: "FacilityAdapter",
+        resource: status_models.Resource,
+        user: User,
+        path: str,
+        max_depth: int | None,
+        include: list[str] | None,
+        exclude: list[str] | None,
+        show_hidden: bool,
+        numeric_uid: bool,
+        dereference: bool,
+    ) -> AsyncIterator[filesystem_models.File | filesystem_models.WalkError]:
+        """
+        Yield the entries under the directory at path, named by their path relative to it, in any order, and a WalkError
+        for each directory that can't be read (see local/walk.py for the meaning of the arguments).
+        Raise an HTTPException (e.g. 400 for a path that isn't a directory) before the first item.
+        This method is optional; the route answers 501 while it raises NotImplementedError.
+        """
+        raise NotImplementedError
+        yield
+
+    async def manifest(
+        self: "FacilityAdapter", resource: status_models.Resource, user: User, path: str, algorithm: str
+    ) -> AsyncIterator[filesystem_models.ManifestEntry | filesystem_models.ManifestSummary]:
+        """
+        Yield the manifest entries of the regular files under the directory at path, in lexicographic order of their
+        relative paths, then the summary with the Merkle tree hash of the entries (see local/manifest.py).
+        Raise an HTTPException (e.g. 400 for a path that isn't a directory) before the first item.
+        This method is optional; the route answers 501 while it raises NotImplementedError.
+        """
+        raise NotImplementedError
+        yield
+
+    @abstractmethod
+    async def upload(
+        self: "FacilityAdapter",
+        resource: status_models.Resource,
+        user: User,
+        path: str,
+        content: str | None = None,
+        staged: filesystem_models.StagedFile | None = None,
+    ) -> filesystem_models.PutFileUploadResponse:
+        """
+        Store an uploaded file at path. Uploads from the API arrive as `staged`: a handle to the file spooled
+        in the staging area (see `staging.staged_path`), which is removed once the task is done.
+        `content` (base64) is only used by callers that pass the file inline.
+        """
         pass
 
     @abstractmethod
@@ -4,16 +4,20 @@
 #
 # Please, refer to the LICENSE file in the root directory.
 # SPDX-License-Identifier: BSD-3-Clause
-import base64
+import asyncio
+import os
+import stat
 from typing import Annotated
-from fastapi import Depends, HTTPException, status, Query, Request, File, UploadFile
+from fastapi import Depends, HTTPException, status, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from ...types.user import User
-from .. import iri_router
-from ..error_handlers import DEFAULT_RESPONSES
+from .. import iri_response, iri_router
+from ..error_handlers import DEFAULT_RESPONSES, Problem
 from ..iri_meta import iri_meta_dict
 from ..status.status import router as status_router, models as status_models
 from ..task import facility_adapter as task_facility_adapter, models as task_models
-from . import models, facility_adapter
+from . import models, facility_adapter, downloads, staging, upload_sessions
+from .local import checksum as local_checksum, executor as local_executor, metadata_cache as local_metadata_cache
 
 
 router = iri_router.IriRouter(
@@ -24,6 +28,30 @@ router = iri_router.IriRouter(
 )
 
 
+# query parameter of the task routes
+_Wait = Annotated[
+    bool,
+    Query(description="Run the task at once and, if it finishes within the server's wait budget, also return its status and result"),
+]
+# response of the task routes: the task's status and result are only there when it finished within the wait budget
+_TaskResponse = task_models.TaskFinishedResponse | task_models.TaskSubmitResponse
+
+
+async def _put_task(
+    user: User,
+    resource: status_models.Resource,
+    task: task_models.TaskCommand,
+    wait: bool = False,
+) -> task_models.TaskSubmitResponse:
+    """Submit a task; with `wait`, include its result if it finishes within TASK_WAIT_BUDGET_MS."""
+    submitted = await router.task_adapter.put_task(user=user, resource=resource, task=task)
+    if wait and facility_adapter.TASK_WAIT_BUDGET_MS > 0:
+        finished = await router.task_adapter.wait_task(user=user, task_id=submitted.task_id, timeout=facility_adapter.TASK_WAIT_BUDGET_MS / 1000)
+        if finished is not None:
+            return task_models.TaskFinishedResponse(task_id=submitted.task_id, status=finished.status, result=finished.result)
+    return submitted
+
+
 async def _user_resource(
     resource_id: str,
     user: User,
@@ -39,7 +67,7 @@ async def _user_resource(
     "/chmod/{resource_id:str}",
     description="Change the permission mode of a file(`chmod`)",
     status_code=status.HTTP_200_OK,
-    response_model=task_models.TaskSubmitResponse,
+    response_model=_TaskResponse,
     response_description="File permissions changed successfully",
     responses=DEFAULT_RESPONSES,
     operation_id="chmod",
@@ -49,10 +77,12 @@ async def put_chmod(
     resource_id: str,
     request_model: models.PutFileChmodRequest,
     request: Request,
+    wait: _Wait = False,
     user: User = Depends(router.current_user),
 ) -> task_models.TaskSubmitResponse:
     resource = await _user_resource(resource_id, user)
-    return await router.task_adapter.put_task(
+    return await _put_task(
+        wait=wait,
         user=user,
         resource=resource,
         task=task_models.TaskCommand(
@@ -69,7 +99,7 @@ async def put_chmod(
     "/chown/{resource_id:str}",
     description="Change the ownership of a given file (`chown`)",
     status_code=status.HTTP_200_OK,
-    response_model=task_models.TaskSubmitResponse,
+    response_model=_TaskResponse,
     response_description="File ownership changed successfully",
     responses=DEFAULT_RESPONSES,
     operation_id="chown",
@@ -79,10 +109,12 @@ async def put_chown(
     resource_id: str,
     request_model: models.PutFileChownRequest,
     request: Request,
+    wait: _Wait = False,
     user: User = Depends(router.current_user),
 ) -> task_models.TaskSubmitResponse:
     resource = await _user_resource(resource_id, user)
-    return await router.task_adapter.put_task(
+    return await _put_task(
+        wait=wait,
         user=user,
         resource=resource,
         task=task_models.TaskCommand(
@@ -99,7 +131,7 @@ async def put_chown(
     "/file/{resource_id:str}",
     description="Output the type of a file or directory",
     status_code=status.HTTP_200_OK,
-    response_model=task_models.TaskSubmitResponse,
+    response_model=_TaskResponse,
     response_description="Type returned successfully",
     responses=DEFAULT_RESPONSES,
     operation_id="file",
@@ -109,10 +141,12 @@ async def get_file(
     resource_id: str,
     request: Request,
     path: Annotated[str, Query(description="A file or folder path")],
+    wait: _Wait = False,
     user: User = Depends(router.current_user),
 ) -> task_models.TaskSubmitResponse:
     resource = await _user_resource(resource_id, user)
-    return await router.task_adapter.put_task(
+    return await _put_task(
+        wait=wait,
         user=user,
         resource=resource,
         task=task_models.TaskCommand(
@@ -129,7 +163,7 @@ async def get_file(
     "/stat/{resource_id:str}",
     description="Output the `stat` of a file",
     status_code=status.HTTP_200_OK,
-    response_model=task_models.TaskSubmitResponse,
+    response_model=_TaskResponse,
     response_description="Stat returned successfully",
     responses=DEFAULT_RESPONSES,
     operation_id="stat",
@@ -140,10 +174,12 @@ async def get_stat(
     request: Request,
     path: Annotated[str, Query(description="A file or folder path")],
     dereference: Annotated[bool, Query(description="Follow symbolic links")] = False,
+    wait: _Wait = False,
     user: User = Depends(router.current_user),
 ) -> task_models.TaskSubmitResponse:
     resource = await _user_resource(resource_id, user)
-    return await router.task_adapter.put_task(
+    return await _put_task(
+        wait=wait,
         user=user,
         resource=resource,
         task=task_models.TaskCommand(
@@ -161,7 +197,7 @@ async def get_stat(
     "/mkdir/{resource_id:str}",
     description="Create directory operation (`mkdir`)",
     status_code=status.HTTP_201_CREATED,
-    response_model=task_models.TaskSubmitResponse,
+    response_model=_TaskResponse,
     response_description="Directory created successfully",
     responses=DEFAULT_RESPONSES,
     operation_id="mkdir",
@@ -171,10 +207,12 @@ async def post_mkdir(
     resource_id: str,
     request: Request,
     request_model: models.PostMakeDirRequest,
+    wait: _Wait = False,
     user: User = Depends(router.current_user),
 ) -> task_models.TaskSubmitResponse:
     resource = await _user_resource(resource_id, user)
-    return await router.task_adapter.put_task(
+    return await _put_task(
+        wait=wait,
         user=user,
         resource=resource,
         task=task_models.TaskCommand(
@@ -191,7 +229,7 @@ async def post_mkdir(
     "/symlink/{resource_id:str}",
     description="Create symlink operation (`ln`)",
     status_code=status.HTTP_201_CREATED,
-    response_model=task_models.TaskSubmitResponse,
+    response_model=_TaskResponse,
     response_description="Symlink created successfully",
     responses=DEFAULT_RESPONSES,
     operation_id="symlink",
@@ -201,10 +239,12 @@ async def post_symlink(
     resource_id: str,
     request: Request,
     request_model: models.PostFileSymlinkRequest,
+    wait: _Wait = False,
     user: User = Depends(router.current_user),
 ) -> task_models.TaskSubmitResponse:
     resource = await _user_resource(resource_id, user)
-    return await router.task_adapter.put_task(
+    return await _put_task(
+        wait=wait,
         user=user,
         resource=resource,
         task=task_models.TaskCommand(
@@ -221,7 +261,7 @@ async def post_symlink(
     "/ls/{resource_id:str}",
     description="List the contents of the given directory (`ls`) asynchronously",
     status_code=status.HTTP_200_OK,
-    response_model=task_models.TaskSubmitResponse,
+    response_model=_TaskResponse,
     response_description="Directory listed successfully",
     include_in_schema=router.task_adapter is not None,
     responses=DEFAULT_RESPONSES,
@@ -242,17 +282,25 @@ async def get_ls_async(
             description="Show information for the file the link references.",
         ),
     ] = False,
+    offset: Annotated[int, Query(description="Number of entries to skip", ge=0)] = 0,
+    limit: Annotated[int | None, Query(description="Maximum number of entries to return", ge=1)] = None,
+    sort: Annotated[models.LsSort, Query(description="Order of the entries: by name, size (largest first), time (newest first), or none (directory order, the fastest)")] = models.LsSort.name,
+    wait: _Wait = False,
     user: User = Depends(router.current_user),
 
 ) -> task_models.TaskSubmitResponse:
     resource = await _user_resource(resource_id, user)
-    return await router.task_adapter.put_task(
+    args = {"path": path, "show_hidden": show_hidden, "numeric_uid": numeric_uid, "recursive": recursive, "dereference": dereference}
+    if offset or limit is not None or sort != models.LsSort.name:
+        args.update(offset=offset, limit=limit, sort=sort.value)
+    return await _put_task(
+        wait=wait,
         user=user,
         resource=resource,
         task=task_models.TaskCommand(
             router=router.get_router_name(), 
             command="ls",
-            args={"path": path, "show_hidden": show_hidden, "numeric_uid": numeric_uid, "recursive": recursive, "dereference": dereference}
+            args=args
         ),
     )
 
@@ -261,7 +309,7 @@ async def get_ls_async(
     "/head/{resource_id:str}",
     description="Output the first part of file/s (`head`)",
     status_code=status.HTTP_200_OK,
-    response_model=task_models.TaskSubmitResponse,
+    response_model=_TaskResponse,
     response_description="Head operation finished successfully",
     responses=DEFAULT_RESPONSES,
     operation_id="head",
@@ -296,13 +344,15 @@ async def get_head(
             description=("The output will be the whole file, without the last NUM bytes/lines of each file. NUM should be specified in the respective argument through `bytes` or `lines`."),
         ),
     ] = False,
+    wait: _Wait = False,
     user: User = Depends(router.current_user),
 ) -> task_models.TaskSubmitResponse:
     resource = await _user_resource(resource_id, user)
     # Enforce that exactly one of `bytes` or `lines` is specified
     if (file_bytes is None and lines is None) or (file_bytes is not None and lines is not None):
         raise HTTPException(status_code=400, detail="Exactly one of `bytes` or `lines` must be specified.")
-    return await router.task_adapter.put_task(
+    return await _put_task(
+        wait=wait,
         user=user,
         resource=resource,
         task=task_models.TaskCommand(
@@ -322,7 +372,7 @@ async def get_head(
     "/view/{resource_id:str}",
     description=f"View file content (up to max {facility_adapter.OPS_SIZE_LIMIT} bytes)",
     status_code=status.HTTP_200_OK,
-    response_model=task_models.TaskSubmitResponse,
+    response_model=_TaskResponse,
     response_description="View operation finished successfully",
     responses=DEFAULT_RESPONSES,
     operation_id="view",
@@ -334,11 +384,13 @@ async def get_view(
     path: Annotated[str, Query(description="File path")],
     size: Annotated[int, Query(description="Value, in bytes, of the size of data to be retrieved from the file.", ge=1, le=facility_adapter.OPS_SIZE_LIMIT)] = facility_adapter.OPS_SIZE_LIMIT,
     offset: Annotated[int, Query(description="Value in bytes of the offset.", ge=0)] = 0,
+    wait: _Wait = False,
     user: User = Depends(router.current_user),
 ) -> task_models.TaskSubmitResponse:
     resource = await _user_resource(resource_id, user)
 
-    return await router.task_adapter.put_task(
+    return await _put_task(
+        wait=wait,
         user=user,
         resource=resource,
         task=task_models.TaskCommand(
@@ -357,7 +409,7 @@ async def get_view(
     "/tail/{resource_id:str}",
     description="Output the last part of a file (`tail`)",
     status_code=status.HTTP_200_OK,
-    response_model=task_models.TaskSubmitResponse,
+    response_model=_TaskResponse,
     response_description="`tail` operation finished successfully",
     responses=DEFAULT_RESPONSES,
     operation_id="tail",
@@ -385,6 +437,7 @@ async def get_tail(
             description=("The output will be the whole file, without the first NUM bytes/lines of each file. NUM should be specified in the respective argument through `bytes` or `lines`."),
         ),
     ] = False,
+    wait: _Wait = False,
     user: User = Depends(router.current_user),
 
 ) -> task_models.TaskSubmitResponse:
@@ -392,7 +445,8 @@ async def get_tail(
     # Enforce that exactly one of `bytes` or `lines` is specified
     if (file_bytes is None and lines is None) or (file_bytes is not None and lines is not None):
         raise HTTPException(status_code=400, detail="Exactly one of `bytes` or `lines` must be specified.")
-    return await router.task_adapter.put_task(
+    return await _put_task(
+        wait=wait,
         user=user,
         resource=resource,
         task=task_models.TaskCommand(
@@ -410,9 +464,12 @@ async def get_tail(
 
 @router.get(
     "/checksum/{resource_id:str}",
-    description="Output the checksum of a file (using SHA-256 algotithm)",
+    description=(
+        "Output the checksum of a file (using SHA-256 algorithm by default). Several algorithms can be requested at once: "
+        "the file is read only once. Checksums of unchanged files may be served from a cache."
+    ),
     status_code=status.HTTP_200_OK,
-    response_model=task_models.TaskSubmitResponse,
+    response_model=_TaskResponse,
     response_description="Checksum returned successfully",
     responses=DEFAULT_RESPONSES,
     operation_id="checksum",
@@ -422,18 +479,22 @@ async def get_checksum(
     resource_id: str,
     request: Request,
     path: Annotated[str, Query(description="Target system")],
+    algorithms: Annotated[list[models.ChecksumAlgorithm] | None, Query(description="Checksum algorithms (default: sha256)")] = None,
+    wait: _Wait = False,
     user: User = Depends(router.current_user),
 ) -> task_models.TaskSubmitResponse:
     resource = await _user_resource(resource_id, user)
-    return await router.task_adapter.put_task(
+    args = {"path": path}
+    if algorithms:
+        args["algorithms"] = [algorithm.value for algorithm in algorithms]
+    return await _put_task(
+        wait=wait,
         user=user,
         resource=resource,
         task=task_models.TaskCommand(
             router=router.get_router_name(),
             command="checksum",
-            args={
-                "path": path,
-            },
+            args=args,
         ),
     )
 
@@ -441,6 +502,7 @@ async def get_checksum(
 @router.delete(
     "/rm/{resource_id:str}",
     description="Delete file or directory operation (`rm`)",
+    response_model=_TaskResponse,
     response_description="File or directory deleted successfully",
     responses=DEFAULT_RESPONSES,
     operation_id="rm",
@@ -450,10 +512,12 @@ async def delete_rm(
     resource_id: str,
     request: Request,
     path: Annotated[str, Query(description="The path to delete")],
+    wait: _Wait = False,
     user: User = Depends(router.current_user),
 ) -> task_models.TaskSubmitResponse:
     resource = await _user_resource(resource_id, user)
-    return await router.task_adapter.put_task(
+    return await _put_task(
+        wait=wait,
         user=user,
         resource=resource,
         task=task_models.TaskCommand(
@@ -468,9 +532,9 @@ async def delete_rm(
 
 @router.post(
     "/compress/{resource_id:str}",
-    description="Compress files and directories using `tar` command",
+    description="Compress files and directories into a `tar` archive",
     status_code=status.HTTP_201_CREATED,
-    response_model=task_models.TaskSubmitResponse,
+    response_model=_TaskResponse,
     response_description="File and/or directories compressed successfully",
     responses=DEFAULT_RESPONSES,
     operation_id="compress",
@@ -480,10 +544,12 @@ async def post_compress(
     resource_id: str,
     request: Request,
     request_model: models.PostCompressRequest,
+    wait: _Wait = False,
     user: str = Depends(router.current_user),
 ) -> task_models.TaskSubmitResponse:
     resource = await _user_resource(resource_id, user)
-    return await router.task_adapter.put_task(
+    return await _put_task(
+        wait=wait,
         user=user,
         resource=resource,
         task=task_models.TaskCommand(
@@ -498,9 +564,9 @@ async def post_compress(
 
 @router.post(
     "/extract/{resource_id:str}",
-    description="Extract `tar` `gzip` archives",
+    description="Extract `tar` archives (uncompressed, gzip, bzip2, xz or zstd)",
     status_code=status.HTTP_201_CREATED,
-    response_model=task_models.TaskSubmitResponse,
+    response_model=_TaskResponse,
     response_description="File extracted successfully",
     responses=DEFAULT_RESPONSES,
     operation_id="extract",
@@ -510,10 +576,12 @@ async def post_extract(
     resource_id: str,
     request: Request,
     request_model: models.PostExtractRequest,
+    wait: _Wait = False,
     user: User = Depends(router.current_user),
 ) -> task_models.TaskSubmitResponse:
     resource = await _user_resource(resource_id, user)
-    return await router.task_adapter.put_task(
+    return await _put_task(
+        wait=wait,
         user=user,
         resource=resource,
         task=task_models.TaskCommand(
@@ -530,7 +598,7 @@ async def post_extract(
     "/mv/{resource_id:str}",
     description="Create move file or directory operation (`mv`)",
     status_code=status.HTTP_201_CREATED,
-    response_model=task_models.TaskSubmitResponse,
+    response_model=_TaskResponse,
     response_description="Move file or directory operation created successfully",
     responses=DEFAULT_RESPONSES,
     operation_id="mv",
@@ -540,10 +608,12 @@ async def move_mv(
     resource_id: str,
     request: Request,
     request_model: models.PostMoveRequest,
+    wait: _Wait = False,
     user: User = Depends(router.current_user),
 ) -> task_models.TaskSubmitResponse:
     resource = await _user_resource(resource_id, user)
-    return await router.task_adapter.put_task(
+    return await _put_task(
+        wait=wait,
         user=user,
         resource=resource,
         task=task_models.TaskCommand(
@@ -560,7 +630,7 @@ async def move_mv(
     "/cp/{resource_id:str}",
     description="Create copy file or directory operation (`cp`)",
     status_code=status.HTTP_201_CREATED,
-    response_model=task_models.TaskSubmitResponse,
+    response_model=_TaskResponse,
     response_description="Copy file or directory operation created successfully",
     responses=DEFAULT_RESPONSES,
     operation_id="cp",
@@ -570,10 +640,12 @@ async def post_cp(
     resource_id: str,
     request: Request,
     request_model: models.PostCopyRequest,
+    wait: _Wait = False,
     user: User = Depends(router.current_user),
 ) -> task_models.TaskSubmitResponse:
     resource = await _user_resource(resource_id, user)
-    return await router.task_adapter.put_task(
+    return await _put_task(
+        wait=wait,
         user=user,
         resource=resource,
         task=task_models.TaskCommand(
@@ -586,11 +658,49 @@ async def post_cp(
     )
 
 
+@router.post(
+    "/batch/{resource_id:str}",
+    description=(
+        "Run several filesystem operations (e.g. the `stat` or `chmod` of many files) as a single task. "
+        f"At most {facility_adapter.BATCH_SIZE_LIMIT} operations per batch. The operations run concurrently and "
+        "independently: the task result has the status and result of each one, in order."
+    ),
+    status_code=status.HTTP_201_CREATED,
+    response_model=_TaskResponse,
+    response_description="Batch operation created successfully",
+    responses=DEFAULT_RESPONSES,
+    operation_id="batch",
+    openapi_extra=iri_meta_dict("development", "optional")
+)
+async def post_batch(
+    resource_id: str,
+    request: Request,
+    request_model: models.PostBatchRequest,
+    wait: _Wait = False,
+    user: User = Depends(router.current_user),
+) -> task_models.TaskSubmitResponse:
+    if len(request_model.operations) > facility_adapter.BATCH_SIZE_LIMIT:
+        raise HTTPException(status_code=400, detail=f"A batch can have at most {facility_adapter.BATCH_SIZE_LIMIT} operations.")
+    resource = await _user_resource(resource_id, user)
+    return await _put_task(
+        wait=wait,
+        user=user,
+        resource=resource,
+        task=task_models.TaskCommand(
+            router=router.get_router_name(),
+            command="batch",
+            args={
+                "request_model": request_model,
+            },
+        ),
+    )
+
+
 @router.get(
     "/download/{resource_id:str}",
     description=f"Download a small file (max {facility_adapter.OPS_SIZE_LIMIT} Bytes)",
     status_code=status.HTTP_200_OK,
-    response_model=task_models.TaskSubmitResponse,
+    response_model=_TaskResponse,
     response_description="File downloaded successfully",
     responses=DEFAULT_RESPONSES,
     operation_id="download",
@@ -600,10 +710,12 @@ async def get_download(
     resource_id: str,
     request: Request,
     path: Annotated[str, Query(description="A file to download")],
+    wait: _Wait = False,
     user: User = Depends(router.current_user),
 ) -> task_models.TaskSubmitResponse:
     resource = await _user_resource(resource_id, user)
-    return await router.task_adapter.put_task(
+    return await _put_task(
+        wait=wait,
         user=user,
         resource=resource,
         task=task_models.TaskCommand(
@@ -616,33 +728,218 @@ async def get_download(
     )
 
 
+@router.get(
+    "/stream/{resource_id:str}",
+    description=(
+        "Download a file directly, without a task or a size limit. "
+        "`Range` (and `If-Range`) requests are answered with partial content, so interrupted downloads can be resumed; "
+        "send the `ETag` of a previous response in `If-None-Match` to skip unchanged files."
+    ),
+    status_code=status.HTTP_200_OK,
+    response_class=FileResponse,
+    response_description="The file content",
+    responses={
+        **DEFAULT_RESPONSES,
+        200: {"content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}}, "description": "The file content"},
+        206: {"content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}}, "description": "The requested range(s) of the file"},
+        304: {"description": "The file matches the `If-None-Match` ETag"},
+        429: {"description": "Too many concurrent downloads", "model": Problem},
+        501: {"description": "Direct downloads are not supported by this facility", "model": Problem},
+    },
+    operation_id="streamDownload",
+    openapi_extra=iri_meta_dict("development", "optional")
+)
+async def get_stream(
+    resource_id: str,
+    request: Request,
+    path: Annotated[str, Query(description="A file to download")],
+    user: User = Depends(router.current_user),
+) -> Response:
+    resource = await _user_resource(resource_id, user)
+    try:
+        local_path = await router.adapter.download_path(resource, user, path)
+    except NotImplementedError as exc:
+        raise HTTPException(status_code=501, detail="Direct downloads are not supported by this facility") from exc
+    try:
+        stat_result = await asyncio.to_thread(os.stat, local_path)
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=f"File not found: {path}") from exc
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise HTTPException(status_code=400, detail=f"Not a regular file: {path}")
+
+    tag = downloads.etag(stat_result)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and downloads.etag_matches(if_none_match, tag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": tag})
+
+    downloads.acquire(user.id)
+    return downloads.DownloadResponse(
+        local_path,
+        stat_result=stat_result,
+        filename=os.path.basename(path),
+        headers={"ETag": tag},
+        user_id=user.id,
+    )
+
+
+def _cache_metrics(cache, **extra) -> models.CacheMetrics | None:
+    if cache is None:
+        return None
+    lookups = cache.hits + cache.misses
+    return models.CacheMetrics(hits=cache.hits, misses=cache.misses, hit_rate=cache.hits / lookups if lookups else 0.0, **extra)
+
+
+@router.get(
+    "/metrics",
+    description=(
+        "Metrics of the filesystem layer of the API server (per worker process): the hit rates of its metadata and checksum caches, "
+        "and the queue depths of the pools running blocking filesystem calls."
+    ),
+    status_code=status.HTTP_200_OK,
+    response_model=models.FilesystemMetrics,
+    response_description="The metrics",
+    responses=DEFAULT_RESPONSES,
+    operation_id="getFilesystemMetrics",
+    openapi_extra=iri_meta_dict("development", "optional")
+)
+async def get_metrics(
+    request: Request,
+    user: User = Depends(router.current_user),
+) -> models.FilesystemMetrics:
+    metadata = local_metadata_cache.metadata_cache()
+    return models.FilesystemMetrics(
+        metadata_cache=_cache_metrics(metadata, entries=len(metadata), watches=metadata.watches, inotify=metadata.inotify) if metadata is not None else None,
+        checksum_cache=_cache_metrics(local_checksum.digest_cache()),
+        pools=[pool.metrics() for pool in local_executor.POOLS],
+    )
+
+
+@router.get(
+    "/walk/{resource_id:str}",
+    description=(
+        "Stream the entries under a directory as NDJSON, as soon as they are found: subdirectories are read concurrently, "
+        "so the entries come in no particular order and are named by their path relative to the directory. "
+        "Patterns (`include`, `exclude`, shell-style) containing a `/` are matched against that path, the others against the entry name: "
+        "excluded directories are skipped entirely, while `include` only selects the entries returned. "
+        "Directories that can't be read are reported as `{\"path\", \"error\"}` lines."
+    ),
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    response_description="The entries",
+    responses={
+        **DEFAULT_RESPONSES,
+        200: {
+            "content": {iri_response.NDJSON_MEDIA_TYPE: {"schema": {"anyOf": [models.File.model_json_schema(), models.WalkError.model_json_schema()]}}},
+            "description": "The entries",
+        },
+        501: {"description": "Walks are not supported by this facility", "model": Problem},
+    },
+    operation_id="walk",
+    openapi_extra=iri_meta_dict("development", "optional")
+)
+async def get_walk(
+    resource_id: str,
+    request: Request,
+    path: Annotated[str, Query(description="A directory")],
+    max_depth: Annotated[int | None, Query(alias="maxDepth", description="Number of levels to descend (1: only the entries of the directory)", ge=1)] = None,
+    include: Annotated[list[str] | None, Query(description="Only return the entries matching one of these patterns")] = None,
+    exclude: Annotated[list[str] | None, Query(description="Skip the entries (and directories) matching one of these patterns")] = None,
+    show_hidden: Annotated[bool, Query(alias="showHidden", description="Show hidden files")] = False,
+    numeric_uid: Annotated[bool, Query(alias="numericUid", description="List numeric user and group IDs")] = False,
+    dereference: Annotated[bool, Query(alias="dereference", description="Follow symbolic links (each directory is visited once)")] = False,
+    user: User = Depends(router.current_user),
+) -> StreamingResponse:
+    resource = await _user_resource(resource_id, user)
+    items = router.adapter.walk(resource, user, path, max_depth, include, exclude, show_hidden, numeric_uid, dereference)
+    try:
+        first = await iri_response.first_item(items)
+    except NotImplementedError as exc:
+        raise HTTPException(status_code=501, detail="Walks are not supported by this facility") from exc
+    return iri_response.stream_response(iri_response.ItemStream(items, ndjson=True, first=first), models.File | models.WalkError, exclude_none=True)
+
+
+@router.get(
+    "/manifest/{resource_id:str}",
+    description=(
+        "Stream the checksum manifest of a directory as NDJSON: one line per regular file (in lexicographic order of the paths "
+        "relative to the directory, symlinks not followed), then a summary line with the Merkle tree hash of the whole manifest. "
+        "Files are hashed concurrently, and the checksums of unchanged files may be served from a cache."
+    ),
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    response_description="The manifest",
+    responses={
+        **DEFAULT_RESPONSES,
+        200: {
+            "content": {iri_response.NDJSON_MEDIA_TYPE: {"schema": {"anyOf": [models.ManifestEntry.model_json_schema(), models.ManifestSummary.model_json_schema()]}}},
+            "description": "The manifest entries, then the summary",
+        },
+        501: {"description": "Manifests are not supported by this facility", "model": Problem},
+    },
+    operation_id="manifest",
+    openapi_extra=iri_meta_dict("development", "optional")
+)
+async def get_manifest(
+    resource_id: str,
+    request: Request,
+    path: Annotated[str, Query(description="A directory")],
+    algorithm: Annotated[models.ChecksumAlgorithm, Query(description="Checksum algorithm of the files and of the Merkle tree")] = models.ChecksumAlgorithm.sha256,
+    user: User = Depends(router.current_user),
+) -> StreamingResponse:
+    resource = await _user_resource(resource_id, user)
+    items = router.adapter.manifest(resource, user, path, algorithm.value)
+    try:
+        first = await iri_response.first_item(items)
+    except NotImplementedError as exc:
+        raise HTTPException(status_code=501, detail="Manifests are not supported by this facility") from exc
+    return iri_response.stream_response(iri_response.ItemStream(items, ndjson=True, first=first), models.ManifestEntry | models.ManifestSummary, exclude_none=True)
+
+
 @router.post(
     "/upload/{resource_id:str}",
-    description=f"Upload a small file (max {facility_adapter.OPS_SIZE_LIMIT} Bytes)",
+    description=f"Upload a file (max {facility_adapter.UPLOAD_SIZE_LIMIT} Bytes)",
     status_code=status.HTTP_200_OK,
-    response_model=task_models.TaskSubmitResponse,
+    response_model=_TaskResponse,
     response_description="File uploaded successfully",
     responses=DEFAULT_RESPONSES,
     operation_id="upload",
-    openapi_extra=iri_meta_dict("production", "required")
+    openapi_extra={
+        # the body is streamed to the staging area by the endpoint, so it's documented here rather than as a parameter
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["file"],
+                        "properties": {"file": {"type": "string", "format": "binary", "description": "File to be uploaded as `multipart/form-data`"}},
+                    }
+                }
+            },
+        },
+        **iri_meta_dict("production", "required"),
+    },
 )
 async def post_upload(
     resource_id: str,
     request: Request,
     path: Annotated[str, Query(description="Specify path where file should be uploaded.")],
-    file: UploadFile = File(description="File to be uploaded as `multipart/form-data`"),
+    checksum: Annotated[str | None, Query(description="Expected SHA-256 checksum of the file. The upload is rejected if it doesn't match.", pattern="^[0-9a-fA-F]{64}$")] = None,
+    wait: _Wait = False,
     user: User = Depends(router.current_user),
 ) -> task_models.TaskSubmitResponse:
     resource = await _user_resource(resource_id, user)
-    raw_content = file.file.read()
+    staged = await staging.stage_upload(request)
 
-    if len(raw_content) > facility_adapter.OPS_SIZE_LIMIT:
+    if checksum is not None and checksum.lower() != staged.checksum:
+        staging.discard(staged)
         raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail="File to upload is too large.",
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Checksum mismatch: the uploaded file has SHA-256 {staged.checksum}.",
         )
 
-    return await router.task_adapter.put_task(
+    return await _put_task(
+        wait=wait,
         user=user,
         resource=resource,
         task=task_models.TaskCommand(
@@ -650,7 +947,134 @@ async def post_upload(
             command="upload",
             args={
                 "path": path,
-                "content": base64.b64encode(raw_content).decode("utf-8"),
+                "staged": staged,
+            },
+        ),
+    )
+
+
+@router.post(
+    "/uploads/{resource_id:str}",
+    description=(
+        "Start a resumable upload. Send the file in chunks with `PUT /filesystem/uploads/{resource_id}/{session_id}?offset=...`, "
+        "in any order and concurrently, check which ranges were received with `GET`, and finalize the upload to move the file into place. "
+        f"Sessions expire after {facility_adapter.UPLOAD_SESSION_TTL} seconds without receiving a chunk."
+    ),
+    status_code=status.HTTP_201_CREATED,
+    response_model=models.UploadSession,
+    response_description="Upload session created successfully",
+    responses=DEFAULT_RESPONSES,
+    operation_id="createUploadSession",
+    openapi_extra=iri_meta_dict("development", "optional")
+)
+async def post_upload_session(
+    resource_id: str,
+    request: Request,
+    request_model: models.PostUploadSessionRequest,
+    user: User = Depends(router.current_user),
+) -> models.UploadSession:
+    await _user_resource(resource_id, user)
+    return await upload_sessions.create(user, resource_id, request_model)
+
+
+@router.get(
+    "/uploads/{resource_id:str}/{session_id:str}",
+    description="Get a resumable upload, with the ranges of the file received so far",
+    status_code=status.HTTP_200_OK,
+    response_model=models.UploadSession,
+    response_description="Upload session returned successfully",
+    responses=DEFAULT_RESPONSES,
+    operation_id="getUploadSession",
+    openapi_extra=iri_meta_dict("development", "optional")
+)
+async def get_upload_session(
+    resource_id: str,
+    session_id: str,
+    request: Request,
+    user: User = Depends(router.current_user),
+) -> models.UploadSession:
+    return await upload_sessions.get(user, resource_id, session_id)
+
+
+@router.put(
+    "/uploads/{resource_id:str}/{session_id:str}",
+    description=(
+        f"Send a chunk (the raw request body, up to {facility_adapter.UPLOAD_CHUNK_SIZE_LIMIT} bytes) of a resumable upload, written at `offset`. "
+        "The chunk counts as received once it's written completely and, if `checksum` is given, verified; otherwise send it again."
+    ),
+    status_code=status.HTTP_200_OK,
+    response_model=models.UploadSession,
+    response_description="Chunk received successfully",
+    responses={**DEFAULT_RESPONSES, 416: {"description": "The offset is past the end of the file", "model": Problem}},
+    operation_id="uploadChunk",
+    openapi_extra={
+        "requestBody": {"required": True, "content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}}},
+        **iri_meta_dict("development", "optional"),
+    },
+)
+async def put_upload_chunk(
+    resource_id: str,
+    session_id: str,
+    request: Request,
+    offset: Annotated[int, Query(description="Offset in the file of the first byte of the chunk", ge=0)],
+    checksum: Annotated[str | None, Query(description="SHA-256 checksum of the chunk", pattern="^[0-9a-fA-F]{64}$")] = None,
+    user: User = Depends(router.current_user),
+) -> models.UploadSession:
+    return await upload_sessions.write_chunk(user, resource_id, session_id, offset, request, checksum=checksum)
+
+
+@router.post(
+    "/uploads/{resource_id:str}/{session_id:str}/finalize",
+    description=(
+        "Finalize a resumable upload once the whole file was received: its SHA-256 is verified against the checksum given when the upload "
+        "was started (or here: one of them is required), and a task moves it to its path. "
+        "The upload can't be changed while it's being finalized, and a concurrent finalize request gets a 409."
+    ),
+    status_code=status.HTTP_200_OK,
+    response_model=_TaskResponse,
+    response_description="Upload finalized successfully",
+    responses=DEFAULT_RESPONSES,
+    operation_id="finalizeUploadSession",
+    openapi_extra=iri_meta_dict("development", "optional")
+)
+async def post_upload_session_finalize(
+    resource_id: str,
+    session_id: str,
+    request: Request,
+    request_model: models.PostUploadSessionFinalizeRequest | None = None,
+    wait: _Wait = False,
+    user: User = Depends(router.current_user),
+) -> task_models.TaskSubmitResponse:
+    resource = await _user_resource(resource_id, user)
+    meta, staged = await upload_sessions.finalize(user, resource_id, session_id, checksum=request_model.checksum if request_model else None)
+    return await _put_task(
+        wait=wait,
+        user=user,
+        resource=resource,
+        task=task_models.TaskCommand(
+            router=router.get_router_name(),
+            command="upload",
+            args={
+                "path": meta["path"],
+                "staged": staged,
             },
         ),
     )
+
+
+@router.delete(
+    "/uploads/{resource_id:str}/{session_id:str}",
+    description="Abort a resumable upload and discard the data received",
+    status_code=status.HTTP_204_NO_CONTENT,
+    response_description="Upload session deleted successfully",
+    responses=DEFAULT_RESPONSES,
+    operation_id="deleteUploadSession",
+    openapi_extra=iri_meta_dict("development", "optional")
+)
+async def delete_upload_session(
+    resource_id: str,
+    session_id: str,
+    request: Request,
+    user: User = Depends(router.current_user),
+) -> None:
+    await upload_sessions.delete(user, resource_id, session_id)
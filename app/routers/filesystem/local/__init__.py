@@ -0,0 +1,5 @@
+"""
+Native implementations of filesystem operations on locally mounted paths, for adapters whose resources are
+reachable from the API server (as in the demo adapter). They replace the coreutils subprocesses with in-process
+code; paths are expected to be validated (resolved and sandboxed) by the adapter.
+"""
@@ -0,0 +1,278 @@
+"""
+tar archives created and extracted in-process, compressed with several threads.
+
+gzip archives are compressed like pigz: the tar stream is cut in BLOCK_SIZE blocks, which are deflated in parallel
+(each primed with the last 32 KiB of the previous block, so the ratio stays close to gzip's) and joined into a single
+standard gzip member that any gzip reads. zstd archives, available when the optional `zstandard` package is
+installed, use the zstd library's worker threads. bzip2 and xz compress in a single thread, and decompression is
+sequential for every codec.
+`progress(done, total)` is called as the bytes of the archived files are read (or the bytes of the archive, when
+extracting), every PROGRESS_BYTES and once at the end. Setting `stop` makes the call raise Stopped at the next block; a
+partially written archive is removed.
+These functions block, so adapters run them in a worker thread.
+"""
+import bz2
+import collections
+import io
+import lzma
+import os
+import re
+import struct
+import tarfile
+import threading
+import zlib
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from .. import facility_adapter
+from .executor import Stopped
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+BLOCK_SIZE = 1024 * 1024
+PROGRESS_BYTES = 16 * 1024 * 1024
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+_WINDOW = 32 * 1024
+# header of a gzip member without name or timestamp (so archives of the same files are identical)
+_GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+
+
+def _deflate(block: bytes, dictionary: bytes, level: int, final: bool) -> bytes:
+    if dictionary:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=dictionary)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    # a sync flush ends the block on a byte boundary, where the deflate stream of the next block can start
+    return compressor.compress(block) + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class ParallelGzipWriter(io.RawIOBase):
+    """A writable gzip stream whose blocks are compressed by `threads` threads. Closing it doesn't close fileobj."""
+
+    def __init__(self, fileobj, threads: int, level: int = GZIP_LEVEL, block_size: int = BLOCK_SIZE):
+        self._fileobj = fileobj
+        self._threads = threads
+        self._level = level
+        self._block_size = block_size
+        self._executor = ThreadPoolExecutor(threads, thread_name_prefix="gzip") if threads > 1 else None
+        # compressed blocks not written yet, in order
+        self._pending = collections.deque()
+        self._buffer = bytearray()
+        self._dictionary = b""
+        self._crc = 0
+        self._size = 0
+        fileobj.write(_GZIP_HEADER)
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        self._buffer += data
+        while len(self._buffer) >= self._block_size:
+            block = bytes(self._buffer[:self._block_size])
+            del self._buffer[:self._block_size]
+            self._submit(block, final=False)
+        return len(data)
+
+    def _submit(self, block: bytes, final: bool):
+        dictionary = self._dictionary
+        self._dictionary = block[-_WINDOW:]
+        if self._executor is None:
+            self._fileobj.write(_deflate(block, dictionary, self._level, final))
+            return
+        self._pending.append(self._executor.submit(_deflate, block, dictionary, self._level, final))
+        while len(self._pending) > self._threads * 2:
+            self._fileobj.write(self._pending.popleft().result())
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self._submit(bytes(self._buffer), final=True)
+            while self._pending:
+                self._fileobj.write(self._pending.popleft().result())
+            self._fileobj.write(struct.pack("<II", self._crc & 0xFFFFFFFF, self._size & 0xFFFFFFFF))
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+            super().close()
+
+
+def _writer(fileobj, compression: str, threads: int):
+    if compression == "gzip":
+        return ParallelGzipWriter(fileobj, threads)
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression requires the `zstandard` package")
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=threads if threads > 1 else 0).stream_writer(fileobj, closefd=False)
+    if compression == "bzip2":
+        return bz2.BZ2File(fileobj, "wb")
+    if compression == "xz":
+        return lzma.LZMAFile(fileobj, "wb")
+    if compression == "none":
+        return None
+    raise ValueError(f"Unsupported compression: {compression}")
+
+
+def _reader(fileobj, compression: str):
+    if compression == "gzip":
+        return tarfile.open(fileobj=fileobj, mode="r|gz")
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression requires the `zstandard` package")
+        return tarfile.open(fileobj=zstandard.ZstdDecompressor().stream_reader(fileobj, read_across_frames=True), mode="r|")
+    if compression == "bzip2":
+        return tarfile.open(fileobj=fileobj, mode="r|bz2")
+    if compression == "xz":
+        return tarfile.open(fileobj=fileobj, mode="r|xz")
+    if compression == "none":
+        # like tar, also reads the archives compressed with gzip, bzip2 or xz
+        return tarfile.open(fileobj=fileobj, mode="r|*")
+    raise ValueError(f"Unsupported compression: {compression}")
+
+
+class _Progress:
+    def __init__(self, total: int | None, callback: Callable[[int, int | None], None] | None, stop: threading.Event | None):
+        self.total = total
+        self.done = 0
+        self._callback = callback
+        self._stop = stop
+        self._reported = 0
+
+    def add(self, count: int):
+        if self._stop is not None and self._stop.is_set():
+            raise Stopped()
+        self.done += count
+        if self._callback is not None and self.done - self._reported >= PROGRESS_BYTES:
+            self._reported = self.done
+            self._callback(self.done, self.total)
+
+    def finish(self):
+        if self._callback is not None:
+            self._callback(self.done, self.total)
+
+
+class _CountingReader(io.RawIOBase):
+    """A file read through, counting the bytes read as progress."""
+
+    def __init__(self, fileobj, progress: _Progress):
+        self._fileobj = fileobj
+        self._progress = progress
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        count = self._fileobj.readinto(buffer)
+        self._progress.add(count or 0)
+        return count
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._fileobj.read(size)
+        self._progress.add(len(data))
+        return data
+
+
+def _members(source: str, arcname: str, match_pattern: str | None, dereference: bool) -> list[tuple[str, str]]:
+    """Return the (path, name in the archive) to archive, a directory before its content."""
+    pattern = re.compile(match_pattern) if match_pattern else None
+    if not os.path.isdir(source) or (os.path.islink(source) and not dereference):
+        return [(source, arcname)]
+    members = [] if pattern else [(source, arcname)]
+    visited = set()
+    for directory, dirnames, filenames in os.walk(source, followlinks=dereference):
+        if dereference:
+            st = os.stat(directory)
+            if (st.st_dev, st.st_ino) in visited:
+                dirnames.clear()
+                continue
+            visited.add((st.st_dev, st.st_ino))
+        dirnames.sort()
+        filenames.sort()
+        relative = os.path.relpath(directory, source)
+        prefix = f"{arcname}/" if relative == "." else f"{arcname}/{relative}/"
+        for name in dirnames:
+            path = os.path.join(directory, name)
+            # symlinks to directories are archived as links (os.walk only descends into them with followlinks)
+            if pattern is None or (os.path.islink(path) and not dereference and pattern.search(prefix + name)):
+                members.append((path, prefix + name))
+        for name in filenames:
+            if pattern is None or pattern.search(prefix + name):
+                members.append((os.path.join(directory, name), prefix + name))
+    return members
+
+
+def compress(
+    source: str,
+    target: str,
+    compression: str = "gzip",
+    arcname: str | None = None,
+    match_pattern: str | None = None,
+    dereference: bool = False,
+    threads: int | None = None,
+    progress: Callable[[int, int | None], None] | None = None,
+    stop: threading.Event | None = None,
+):
+    """
+    Archive a file or directory into target, named arcname (default: its name) in the archive. With match_pattern
+    (a regex searched in the names in the archive), only the matching files are archived. With dereference, symlinks
+    are archived as the files they point to.
+    """
+    threads = threads or facility_adapter.ARCHIVE_THREADS
+    arcname = arcname or os.path.basename(os.path.normpath(source))
+    members = _members(source, arcname, match_pattern, dereference)
+    try:
+        with open(target, "wb") as raw:
+            writer = _writer(raw, compression, threads)
+            try:
+                with tarfile.open(fileobj=writer or raw, mode="w|", dereference=dereference, copybufsize=BLOCK_SIZE) as tar:
+                    infos = []
+                    for path, name in members:
+                        try:
+                            infos.append((path, tar.gettarinfo(path, name)))
+                        except FileNotFoundError:
+                            # removed since the directory was read
+                            pass
+                    counter = _Progress(sum(info.size for _, info in infos if info.isreg()), progress, stop)
+                    for path, info in infos:
+                        if info.isreg():
+                            with open(path, "rb") as f:
+                                tar.addfile(info, _CountingReader(f, counter))
+                        else:
+                            counter.add(0)
+                            tar.addfile(info)
+            finally:
+                if writer is not None:
+                    writer.close()
+        counter.finish()
+    except BaseException:
+        try:
+            os.unlink(target)
+        except OSError:
+            pass
+        raise
+
+
+def extract(
+    source: str,
+    target: str,
+    compression: str = "none",
+    progress: Callable[[int, int | None], None] | None = None,
+    stop: threading.Event | None = None,
+):
+    """
+    Extract an archive into the directory target. Like GNU tar, leading slashes are removed from member names and
+    members that would end up outside of it (also through symlinks) are refused, with tarfile's `tar` filter.
+    """
+    with open(source, "rb", buffering=0) as raw:
+        counter = _Progress(os.fstat(raw.fileno()).st_size, progress, stop)
+        reader = io.BufferedReader(_CountingReader(raw, counter), BLOCK_SIZE)
+        with _reader(reader, compression) as tar:
+            tar.extractall(target, filter="tar")
+        counter.finish()
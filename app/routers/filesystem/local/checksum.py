@@ -0,0 +1,182 @@
+"""
+Streaming checksums of local files, with a persistent digest cache.
+
+A file is read once, in BLOCK_SIZE blocks, and every requested digest is updated from the same block (in parallel,
+in threads shared by all the calls, when there are several and the file has more than one block: hashlib releases
+the GIL on large updates). Digests are cached in a sqlite database keyed by (device, inode, size, mtime_ns,
+algorithm), so an unchanged file is only hashed once; a file that changes gets a new mtime (or size, or inode when
+it's replaced) and misses the cache. Files modified less than RACY_SECONDS before they were hashed aren't cached,
+since a change within the same mtime tick would go unnoticed.
+
+The xxHash algorithms are available when the optional `xxhash` package is installed.
+These functions block, so adapters run them in a worker thread.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .. import facility_adapter
+
+try:
+    import xxhash
+except ImportError:  # pragma: no cover - optional dependency
+    xxhash = None
+
+BLOCK_SIZE = 4 * 1024 * 1024
+RACY_SECONDS = 2.0
+
+# algorithm: (label, digest factory)
+ALGORITHMS = {
+    "sha256": ("SHA-256", hashlib.sha256),
+    "sha512": ("SHA-512", hashlib.sha512),
+    "sha1": ("SHA-1", hashlib.sha1),
+    "blake2b": ("BLAKE2b", hashlib.blake2b),
+    "blake2s": ("BLAKE2s", hashlib.blake2s),
+    "md5": ("MD5", hashlib.md5),
+}
+if xxhash is not None:
+    ALGORITHMS["xxh64"] = ("XXH64", xxhash.xxh64)
+    ALGORITHMS["xxh3_64"] = ("XXH3-64", xxhash.xxh3_64)
+    ALGORITHMS["xxh3_128"] = ("XXH3-128", xxhash.xxh3_128)
+
+
+class DigestCache:
+    """Persistent (device, inode, size, mtime_ns, algorithm) -> digest cache, shared by threads and processes."""
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._inserts = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS digests (dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER, algorithm TEXT, digest TEXT, used REAL, "
+                "PRIMARY KEY (dev, ino, size, mtime_ns, algorithm)) WITHOUT ROWID"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS digests_used ON digests (used)")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _key(stat_result: os.stat_result) -> tuple:
+        return (stat_result.st_dev, stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+
+    def get(self, stat_result: os.stat_result, algorithms) -> dict[str, str]:
+        """Return the cached digests of the file for the given algorithms (only those found)."""
+        algorithms = list(algorithms)
+        key = self._key(stat_result)
+        placeholders = ",".join("?" * len(algorithms))
+        connection = self._connection()
+        rows = connection.execute(
+            f"SELECT algorithm, digest FROM digests WHERE dev=? AND ino=? AND size=? AND mtime_ns=? AND algorithm IN ({placeholders})",
+            (*key, *algorithms),
+        ).fetchall()
+        if rows:
+            connection.execute(
+                f"UPDATE digests SET used=? WHERE dev=? AND ino=? AND size=? AND mtime_ns=? AND algorithm IN ({placeholders})",
+                (time.time(), *key, *algorithms),
+            )
+        found = dict(rows)
+        self.hits += len(found)
+        self.misses += len(algorithms) - len(found)
+        return found
+
+    def put(self, stat_result: os.stat_result, digests: dict[str, str]):
+        key = self._key(stat_result)
+        now = time.time()
+        connection = self._connection()
+        connection.executemany("INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?, ?)", [(*key, algorithm, digest, now) for algorithm, digest in digests.items()])
+        self._inserts += len(digests)
+        if self._inserts >= 1000:
+            self._inserts = 0
+            # keep the most recently used entries
+            connection.execute("DELETE FROM digests WHERE used < (SELECT used FROM digests ORDER BY used DESC LIMIT 1 OFFSET ?)", (self.max_entries,))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+# the `cache` default of checksums(): the configured digest cache
+CONFIGURED = object()
+
+
+def digest_cache() -> DigestCache | None:
+    """Return the digest cache, or None if CHECKSUM_CACHE_PATH is empty."""
+    global _cache
+    if not facility_adapter.CHECKSUM_CACHE_PATH:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = DigestCache(facility_adapter.CHECKSUM_CACHE_PATH, facility_adapter.CHECKSUM_CACHE_ENTRIES)
+        return _cache
+
+
+def validate(algorithms) -> list[str]:
+    """Return the algorithms without duplicates, or raise ValueError for an unknown or unavailable one."""
+    algorithms = list(dict.fromkeys(algorithms))
+    for algorithm in algorithms:
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Checksum algorithm not available: {algorithm}")
+    return algorithms
+
+
+_digest_executor = None
+_digest_executor_lock = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    """Return the threads updating the digests of multi-algorithm checksums, created on first use."""
+    global _digest_executor
+    with _digest_executor_lock:
+        if _digest_executor is None:
+            _digest_executor = ThreadPoolExecutor(os.cpu_count() or 1, thread_name_prefix="fs-digest")
+        return _digest_executor
+
+
+def _hash(f, algorithms: list[str], size: int) -> dict[str, str]:
+    digests = {algorithm: ALGORITHMS[algorithm][1]() for algorithm in algorithms}
+    # a file of a single block (most files of a manifest) is hashed inline: handing it to threads costs more than it saves
+    executor = _executor() if len(digests) > 1 and size > BLOCK_SIZE else None
+    # small files are read with a buffer of their size (plus the byte that shows they ended)
+    buffer = bytearray(min(BLOCK_SIZE, max(size + 1, 64 * 1024)))
+    view = memoryview(buffer)
+    while n := f.readinto(buffer):
+        block = view[:n]
+        if executor is None:
+            for digest in digests.values():
+                digest.update(block)
+        else:
+            for future in [executor.submit(digest.update, block) for digest in digests.values()]:
+                future.result()
+    return {algorithm: digest.hexdigest() for algorithm, digest in digests.items()}
+
+
+def checksums(path: str, algorithms=("sha256",), cache=CONFIGURED) -> dict[str, str]:
+    """Return {algorithm: hex digest} of a file, from the digest cache when possible (cache=None: always compute it)."""
+    algorithms = validate(algorithms)
+    if cache is CONFIGURED:
+        cache = digest_cache()
+    with open(path, "rb", buffering=0) as f:
+        before = os.fstat(f.fileno())
+        found = cache.get(before, algorithms) if cache is not None else {}
+        missing = [algorithm for algorithm in algorithms if algorithm not in found]
+        if missing:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            computed = _hash(f, missing, before.st_size)
+            after = os.fstat(f.fileno())
+            unchanged = DigestCache._key(before) == DigestCache._key(after)
+            if cache is not None and unchanged and time.time() - after.st_mtime > RACY_SECONDS:
+                cache.put(after, computed)
+            found.update(computed)
+    return {algorithm: found[algorithm] for algorithm in algorithms}
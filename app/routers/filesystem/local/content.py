@@ -0,0 +1,121 @@
+"""
+head, tail and view without subprocesses.
+
+Byte ranges are served with seek and a single read. Line-based operations scan the file in blocks: forward
+(counting newlines per block) for `head -n` and `tail -n +K`, backward from the end for `tail -n` and `head -n -K`,
+so the last lines of a multi-GB file cost a few blocks. Files of at least MMAP_MIN_SIZE are scanned through an
+mmap instead of being read. The results match GNU coreutils, where the last line counts even without a trailing
+newline. Counting the lines of a whole large file (`tail -n +K` with K near the end) runs at the speed of
+bytes.count, slower than coreutils' memchr (see tools/bench_headtail.py).
+These functions block, so adapters run them in a worker thread.
+"""
+import mmap
+import os
+from contextlib import contextmanager
+
+# blocks grow from FIRST_BLOCK_SIZE to BLOCK_SIZE, so the few lines at either end of a file stay cheap
+FIRST_BLOCK_SIZE = 64 * 1024
+BLOCK_SIZE = 1024 * 1024
+MMAP_MIN_SIZE = 4 * 1024 * 1024
+
+
+@contextmanager
+def _buffer(path: str):
+    """Yield the file's content as bytes (small files) or as a read-only mmap."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_MIN_SIZE:
+            yield f.read()
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+def _read_range(path: str, start: int, length: int | None = None) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read() if length is None else f.read(length)
+
+
+def _file_size(path: str) -> int:
+    return os.stat(path).st_size
+
+
+def _after_lines(buf, count: int) -> int:
+    """Return the offset after the first `count` lines."""
+    if count <= 0:
+        return 0
+    pos = 0
+    end = len(buf)
+    block_size = FIRST_BLOCK_SIZE
+    while pos < end:
+        # mmaps have no count(), so each block is scanned as bytes
+        block = buf[pos:pos + block_size]
+        newlines = block.count(b"\n")
+        if newlines < count:
+            count -= newlines
+            pos += len(block)
+            block_size = min(block_size * 2, BLOCK_SIZE)
+            continue
+        i = -1
+        for _ in range(count):
+            i = block.find(b"\n", i + 1)
+        return pos + i + 1
+    return end
+
+
+def _last_lines_start(buf, count: int) -> int:
+    """Return the offset of the first of the last `count` lines."""
+    end = len(buf)
+    if count <= 0:
+        return end
+    # a trailing newline ends the last line rather than starting an empty one
+    hi = end - 1 if end and buf[end - 1:end] == b"\n" else end
+    block_size = FIRST_BLOCK_SIZE
+    while hi > 0:
+        lo = max(hi - block_size, 0)
+        block = buf[lo:hi]
+        newlines = block.count(b"\n")
+        if newlines < count:
+            count -= newlines
+            hi = lo
+            block_size = min(block_size * 2, BLOCK_SIZE)
+            continue
+        i = len(block)
+        for _ in range(count):
+            i = block.rfind(b"\n", 0, i)
+        return lo + i + 1
+    return 0
+
+
+def head(path: str, file_bytes: int | None = None, lines: int | None = None, skip_trailing: bool = False) -> bytes:
+    """
+    The first `file_bytes` bytes or `lines` lines of a file (`head -c N` / `head -n N`),
+    or, with skip_trailing, all but the last ones (`head -c -N` / `head -n -N`).
+    """
+    if file_bytes is not None:
+        if skip_trailing:
+            return _read_range(path, 0, max(_file_size(path) - file_bytes, 0))
+        return _read_range(path, 0, file_bytes)
+    with _buffer(path) as buf:
+        end = _last_lines_start(buf, lines) if skip_trailing else _after_lines(buf, lines)
+        return buf[:end]
+
+
+def tail(path: str, file_bytes: int | None = None, lines: int | None = None, skip_heading: bool = False) -> bytes:
+    """
+    The last `file_bytes` bytes or `lines` lines of a file (`tail -c N` / `tail -n N`),
+    or, with skip_heading, all but the first ones (`tail -c +N+1` / `tail -n +N+1`).
+    """
+    if file_bytes is not None:
+        if skip_heading:
+            return _read_range(path, file_bytes)
+        return _read_range(path, max(_file_size(path) - file_bytes, 0))
+    with _buffer(path) as buf:
+        start = _after_lines(buf, lines) if skip_heading else _last_lines_start(buf, lines)
+        return buf[start:]
+
+
+def view(path: str, size: int, offset: int) -> bytes:
+    """`size` bytes of a file from `offset`."""
+    return _read_range(path, offset, size)
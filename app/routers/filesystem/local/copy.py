@@ -0,0 +1,338 @@
+"""
+Server-side copies of files and directory trees, and moves across filesystems.
+
+Each file is copied with the cheapest method its filesystems support: a reflink (FICLONE, on Btrfs, XFS, ...: the
+copy shares the blocks of the source until either is modified), then copy_file_range (the data stays in the kernel,
+and NFS 4.2 and some other filesystems copy it on the server), then sendfile, and finally reads and writes of
+BUFFER_SIZE. The directories of a tree are created first, then its files are copied by `workers` threads.
+With `preserve`, the mode, owner (when permitted) and access and modification times are kept, like `cp -p`;
+otherwise new files get the mode of the source, less the umask, like `cp`.
+`progress(done, total)` is called with the bytes of file data copied, at least every CHUNK_SIZE. Setting `stop`
+makes the call raise Stopped at the next chunk; the files being copied are removed, the ones already copied are kept.
+These functions block, so adapters run them in a worker thread.
+"""
+import errno
+import fcntl
+import os
+import shutil
+import stat
+import threading
+from collections.abc import Callable
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+from .. import facility_adapter
+from .executor import Stopped
+
+# ioctl cloning a whole file (linux/fs.h)
+FICLONE = 0x40049409
+# bytes per copy_file_range or sendfile call, between progress reports and stop checks
+CHUNK_SIZE = 64 * 1024 * 1024
+BUFFER_SIZE = 8 * 1024 * 1024
+# errors meaning that a method isn't supported for these files, when nothing was copied yet
+_UNSUPPORTED = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTTY, errno.EBADF}
+
+
+class _Progress:
+    """Bytes copied, shared by the copying threads."""
+
+    def __init__(self, total: int, callback: Callable[[int, int | None], None] | None, stop: threading.Event | None):
+        self.total = total
+        self.done = 0
+        self.failed = threading.Event()
+        self._callback = callback
+        self._stop = stop
+        self._lock = threading.Lock()
+
+    def add(self, count: int):
+        if self.failed.is_set() or (self._stop is not None and self._stop.is_set()):
+            raise Stopped()
+        if count:
+            with self._lock:
+                self.done += count
+                if self._callback is not None:
+                    self._callback(self.done, self.total)
+
+
+def _kernel_copy(call, src_fd: int, dst_fd: int, size: int, progress: _Progress) -> bool:
+    """Copy with call(src_fd, dst_fd, offset, count) until the end of the file; False if it can't copy these files."""
+    offset = 0
+    while True:
+        try:
+            copied = call(src_fd, dst_fd, offset, CHUNK_SIZE)
+        except OSError as exc:
+            if offset == 0 and exc.errno in _UNSUPPORTED:
+                return False
+            raise
+        if copied == 0:
+            # some filesystems (procfs, ...) report no data at all
+            return offset > 0 or size == 0
+        offset += copied
+        progress.add(copied)
+
+
+def _copy_file_range(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    return os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+
+
+def _sendfile(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    # writes at the (advancing) position of dst_fd, which starts at 0
+    return os.sendfile(dst_fd, src_fd, offset, count)
+
+
+def _copy_data(src_fd: int, dst_fd: int, size: int, progress: _Progress) -> str:
+    """Copy the content of src_fd to the empty dst_fd and return the method used."""
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        progress.add(size)
+        return "reflink"
+    except OSError as exc:
+        if exc.errno not in _UNSUPPORTED:
+            raise
+    if hasattr(os, "copy_file_range") and _kernel_copy(_copy_file_range, src_fd, dst_fd, size, progress):
+        return "copy_file_range"
+    if _kernel_copy(_sendfile, src_fd, dst_fd, size, progress):
+        return "sendfile"
+    buffer = bytearray(BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(src_fd, "rb", buffering=0, closefd=False) as src:
+        while count := src.readinto(buffer):
+            written = 0
+            while written < count:
+                written += os.write(dst_fd, view[written:count])
+            progress.add(count)
+    return "userspace"
+
+
+def _preserve(target: int | str, st: os.stat_result, is_link: bool = False):
+    """Give target (a path or file descriptor) the owner, mode and times of st."""
+    try:
+        if is_link:
+            os.chown(target, st.st_uid, st.st_gid, follow_symlinks=False)
+        else:
+            os.chown(target, st.st_uid, st.st_gid)
+    except PermissionError:
+        # like cp -p, the owner is only kept when permitted
+        pass
+    if is_link:
+        # the mode of a symlink can't be changed on Linux
+        os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns), follow_symlinks=False)
+    else:
+        # after chown, which clears the setuid and setgid bits
+        os.chmod(target, stat.S_IMODE(st.st_mode))
+        os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+def _copy_file(source: str, target: str, st: os.stat_result, preserve: bool, progress: _Progress) -> str:
+    progress.add(0)
+    src_fd = os.open(source, os.O_RDONLY | os.O_CLOEXEC)
+    try:
+        dst_fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC, stat.S_IMODE(st.st_mode))
+        try:
+            method = _copy_data(src_fd, dst_fd, st.st_size, progress)
+            if preserve:
+                _preserve(dst_fd, st)
+        except BaseException:
+            os.close(dst_fd)
+            dst_fd = None
+            try:
+                os.unlink(target)
+            except OSError:
+                pass
+            raise
+        finally:
+            if dst_fd is not None:
+                os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+    return method
+
+
+def _plan(source: str, target: str, dereference: bool):
+    """Return the (source, target, stat) of the directories (parents first), files, symlinks and other files to copy."""
+    st = os.stat(source) if dereference else os.lstat(source)
+    if stat.S_ISLNK(st.st_mode):
+        # copied as a symlink, even if it dangles
+        return [], [], [(source, target, st)], []
+    if not stat.S_ISDIR(st.st_mode):
+        return [], [(source, target, st)], [], []
+    directories, files, links, others = [(source, target, st)], [], [], []
+    # (directory, its copy, the (dev, ino) of the directory and its ancestors)
+    pending = [(source, target, frozenset({(st.st_dev, st.st_ino)}))]
+    while pending:
+        src_dir, dst_dir, ancestors = pending.pop()
+        with os.scandir(src_dir) as it:
+            for entry in it:
+                dst = os.path.join(dst_dir, entry.name)
+                try:
+                    st = entry.stat(follow_symlinks=dereference)
+                except FileNotFoundError:
+                    if not dereference or not entry.is_symlink():
+                        # removed since the directory was read
+                        continue
+                    # a dangling symlink is copied as a symlink
+                    st = entry.stat(follow_symlinks=False)
+                if stat.S_ISDIR(st.st_mode):
+                    # a symlink (with dereference) to an ancestor would be a loop
+                    if (st.st_dev, st.st_ino) in ancestors:
+                        continue
+                    directories.append((entry.path, dst, st))
+                    pending.append((entry.path, dst, ancestors | {(st.st_dev, st.st_ino)}))
+                elif stat.S_ISREG(st.st_mode):
+                    files.append((entry.path, dst, st))
+                elif stat.S_ISLNK(st.st_mode):
+                    links.append((entry.path, dst, st))
+                elif not stat.S_ISSOCK(st.st_mode):
+                    others.append((entry.path, dst, st))
+    return directories, files, links, others
+
+
+def _resolve_target(source: str, target: str, dereference: bool = False) -> str:
+    """
+    Like cp and mv, a source copied or moved to an existing directory goes into it. A symlink source is only
+    followed with dereference.
+    """
+    if os.path.isdir(target):
+        target = os.path.join(target, os.path.basename(os.path.normpath(source)))
+    source_stat = os.stat(source) if dereference else os.lstat(source)
+    if (os.path.lexists(target) and os.path.samestat(source_stat, os.lstat(target))) or (os.path.exists(target) and os.path.samestat(source_stat, os.stat(target))):
+        raise OSError(errno.EINVAL, "Source and target are the same file", target)
+    if stat.S_ISDIR(source_stat.st_mode) and os.path.realpath(target).startswith(os.path.realpath(source) + os.sep):
+        raise OSError(errno.EINVAL, "Cannot copy or move a directory into itself", target)
+    return target
+
+
+def _copy_tree(source: str, target: str, dereference: bool, preserve: bool, workers: int, progress_callback, stop) -> list:
+    directories, files, links, others = _plan(source, target, dereference)
+    progress = _Progress(sum(st.st_size for _, _, st in files), progress_callback, stop)
+    for _, dst, st in directories:
+        try:
+            # writable until its content is copied
+            os.mkdir(dst, stat.S_IMODE(st.st_mode) | stat.S_IRWXU)
+        except FileExistsError:
+            if not os.path.isdir(dst):
+                raise
+    for src, dst, st in links:
+        progress.add(0)
+        os.symlink(os.readlink(src), dst)
+        if preserve:
+            _preserve(dst, st, is_link=True)
+    for src, dst, st in others:
+        progress.add(0)
+        os.mknod(dst, st.st_mode, st.st_rdev)
+        if preserve:
+            _preserve(dst, st)
+
+    if len(files) == 1:
+        _copy_file(*files[0], preserve, progress)
+    elif files:
+        executor = ThreadPoolExecutor(min(workers, len(files)), thread_name_prefix="copy")
+        try:
+            # the largest files first, so that a large file copied last doesn't run alone
+            futures = [executor.submit(_copy_file, src, dst, st, preserve, progress) for src, dst, st in sorted(files, key=lambda file: -file[2].st_size)]
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in done:
+                if future.exception() is not None:
+                    # the other threads stop at their next chunk
+                    progress.failed.set()
+                    raise future.exception()
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    # the content of a directory changes its times: the deepest first
+    for _, dst, st in reversed(directories):
+        if preserve:
+            _preserve(dst, st)
+        elif stat.S_IMODE(st.st_mode) & stat.S_IRWXU != stat.S_IRWXU:
+            os.chmod(dst, stat.S_IMODE(st.st_mode))
+    return files
+
+
+def copy(
+    source: str,
+    target: str,
+    dereference: bool = False,
+    preserve: bool = False,
+    workers: int | None = None,
+    progress: Callable[[int, int | None], None] | None = None,
+    stop: threading.Event | None = None,
+) -> str:
+    """
+    Copy a file or a directory tree (like `cp -r`) to target, or into it if it's an existing directory, and return
+    the path of the copy. Symlinks (source included) are copied as symlinks, or with dereference as the files they
+    point to.
+    """
+    target = _resolve_target(source, target, dereference)
+    _copy_tree(source, target, dereference, preserve, workers or facility_adapter.COPY_WORKERS, progress, stop)
+    return target
+
+
+def _same_content(source: str, target: str) -> bool:
+    with open(source, "rb") as src, open(target, "rb") as dst:
+        while True:
+            block = src.read(BUFFER_SIZE)
+            if block != dst.read(BUFFER_SIZE):
+                return False
+            if not block:
+                return True
+
+
+def _verify(source: str, target: str, files: list, workers: int, stop: threading.Event | None):
+    """Check that the files of source were copied to target, with the same content, before source is removed."""
+    directories, _, links, _ = _plan(source, target, dereference=False)
+    for _, dst, _ in directories:
+        if not os.path.isdir(dst):
+            raise OSError(errno.EIO, "Directory missing from the copy", dst)
+    for src, dst, _ in links:
+        if os.readlink(src) != os.readlink(dst):
+            raise OSError(errno.EIO, "Symlink differs in the copy", dst)
+
+    def check(src: str, dst: str, st: os.stat_result):
+        if stop is not None and stop.is_set():
+            raise Stopped()
+        if os.stat(src).st_mtime_ns != st.st_mtime_ns or not _same_content(src, dst):
+            raise OSError(errno.EIO, "File changed while it was moved", src)
+
+    with ThreadPoolExecutor(workers, thread_name_prefix="verify") as executor:
+        for future in [executor.submit(check, *file) for file in files]:
+            future.result()
+
+
+def move(
+    source: str,
+    target: str,
+    workers: int | None = None,
+    progress: Callable[[int, int | None], None] | None = None,
+    stop: threading.Event | None = None,
+) -> str:
+    """
+    Move a file or a directory tree to target, or into it if it's an existing directory, and return its new path.
+    Within a filesystem it's a rename. Across filesystems, the tree is copied (keeping its metadata), the copy is
+    compared with the source, and only then the source is removed: if anything fails, the copy is removed instead.
+    """
+    target = _resolve_target(source, target)
+    try:
+        os.rename(source, target)
+        return target
+    except OSError as exc:
+        if exc.errno != errno.EXDEV:
+            raise
+    workers = workers or facility_adapter.COPY_WORKERS
+    existed = os.path.lexists(target)
+    try:
+        files = _copy_tree(source, target, False, True, workers, progress, stop)
+        _verify(source, target, files, workers, stop)
+    except BaseException:
+        if not existed:
+            if os.path.isdir(target) and not os.path.islink(target):
+                shutil.rmtree(target, ignore_errors=True)
+            else:
+                try:
+                    os.unlink(target)
+                except OSError:
+                    pass
+        raise
+    if os.path.isdir(source) and not os.path.islink(source):
+        shutil.rmtree(source)
+    else:
+        os.unlink(source)
+    return target
@@ -0,0 +1,147 @@
+"""
+Execution of blocking filesystem work off the event loop.
+
+Work runs in bounded pools: `METADATA` for quick calls (stat, chmod, listings, ...) and `BULK` for calls that move
+data (copies, archives, checksums, file contents), so a few large copies can't delay every stat. A pool runs at most
+`workers` calls at a time, in its threads or as asyncio subprocesses; the others wait in its queue.
+Cancelling the awaiting task removes a queued call, terminates a running subprocess (then kills it after
+KILL_GRACE_SECONDS), and abandons a running thread call, whose slot is freed only once it returns (`run_stoppable`
+also asks the call to stop).
+"""
+import asyncio
+import functools
+import subprocess
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from .. import facility_adapter, models
+
+KILL_GRACE_SECONDS = 5
+
+
+class Stopped(Exception):
+    """Raised by calls run with `run_stoppable` when they stop early."""
+
+
+class Pool:
+    """A bounded pool of threads (and subprocesses), with queue metrics."""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.cancelled = 0
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix=f"fs-{name}")
+        # one semaphore per event loop (a single one per worker process in production)
+        self._semaphores: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = weakref.WeakKeyDictionary()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.workers)
+        return semaphore
+
+    async def _acquire(self) -> asyncio.Semaphore:
+        semaphore = self._semaphore()
+        self.queued += 1
+        try:
+            await semaphore.acquire()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.queued -= 1
+        self.running += 1
+        return semaphore
+
+    def _release(self, semaphore: asyncio.Semaphore):
+        self.running -= 1
+        self.completed += 1
+        semaphore.release()
+
+    async def run(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) in a thread of the pool and return its result."""
+        semaphore = await self._acquire()
+        loop = asyncio.get_running_loop()
+        future = self._executor.submit(functools.partial(func, *args, **kwargs))
+
+        def done(_):
+            try:
+                loop.call_soon_threadsafe(self._release, semaphore)
+            except RuntimeError:
+                # the loop is closed
+                pass
+
+        future.add_done_callback(done)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+    async def run_stoppable(self, func, *args, **kwargs):
+        """
+        Like run, passing func a `stop` threading.Event that is set if the awaiting task is cancelled, so that
+        long calls can return early instead of holding their slot.
+        """
+        stop = threading.Event()
+        try:
+            return await self.run(func, *args, stop=stop, **kwargs)
+        except asyncio.CancelledError:
+            stop.set()
+            raise
+
+    async def run_process(self, args, *, shell: bool = False, timeout: float | None = None, text: bool = True, check: bool = True) -> subprocess.CompletedProcess:
+        """Run a command as an asyncio subprocess, like subprocess.run with capture_output (raising CalledProcessError or TimeoutExpired)."""
+        semaphore = await self._acquire()
+        try:
+            if shell:
+                process = await asyncio.create_subprocess_shell(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            else:
+                process = await asyncio.create_subprocess_exec(*args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+            except asyncio.TimeoutError:
+                await _stop(process)
+                raise subprocess.TimeoutExpired(args, timeout) from None
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                await _stop(process)
+                raise
+        finally:
+            self._release(semaphore)
+        if text:
+            stdout, stderr = stdout.decode(errors="replace"), stderr.decode(errors="replace")
+        if check and process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, args, stdout, stderr)
+        return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
+
+    def metrics(self) -> models.PoolMetrics:
+        return models.PoolMetrics(
+            name=self.name,
+            workers=self.workers,
+            queued=self.queued,
+            running=self.running,
+            completed=self.completed,
+            cancelled=self.cancelled,
+        )
+
+
+async def _stop(process: asyncio.subprocess.Process):
+    if process.returncode is not None:
+        return
+    process.terminate()
+    try:
+        await asyncio.wait_for(process.wait(), KILL_GRACE_SECONDS)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+
+
+METADATA = Pool("metadata", facility_adapter.METADATA_WORKERS)
+BULK = Pool("bulk", facility_adapter.BULK_WORKERS)
+POOLS = (METADATA, BULK)
@@ -0,0 +1,165 @@
+"""
+Directory listings with os.scandir.
+
+Entries are filtered (hidden files) and sorted by name using only the directory entries themselves; only the
+entries of the requested page are stat'ed, with the lstat scandir already did when possible. Sorting by size or
+time stats every entry, but still once. User and group names are looked up once per id for OWNER_NAME_CACHE_TTL
+seconds instead of once per file, since each lookup may go to NSS/LDAP.
+Recursive listings name entries by their path relative to the listed directory, and only descend into symlinked
+directories with `dereference`, each directory at most once.
+These functions block, so adapters run them in a worker thread.
+"""
+import datetime
+import grp
+import os
+import pwd
+import stat
+import threading
+import time
+
+from .. import facility_adapter, models
+
+
+class NameCache:
+    """uid -> user name and gid -> group name, each kept for `ttl` seconds. Unknown ids are named by their number."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._names: dict[tuple[str, int], tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _name(self, kind: str, number: int) -> str:
+        now = time.monotonic()
+        cached = self._names.get((kind, number))
+        if cached is not None and now - cached[1] < self.ttl:
+            return cached[0]
+        try:
+            name = pwd.getpwuid(number).pw_name if kind == "user" else grp.getgrgid(number).gr_name
+        except KeyError:
+            name = str(number)
+        with self._lock:
+            self._names[(kind, number)] = (name, now)
+        return name
+
+    def user(self, uid: int) -> str:
+        return self._name("user", uid)
+
+    def group(self, gid: int) -> str:
+        return self._name("group", gid)
+
+
+names = NameCache(facility_adapter.OWNER_NAME_CACHE_TTL)
+
+
+def file_type(mode: int) -> str:
+    if stat.S_ISDIR(mode):
+        return "directory"
+    if stat.S_ISLNK(mode):
+        return "symlink"
+    if stat.S_ISREG(mode):
+        return "file"
+    return "other"
+
+
+def to_file(name: str, st: os.stat_result, link_target: str | None = None, numeric_uid: bool = False) -> models.File:
+    """Return the File of an entry from its stat (an lstat for symlinks to report)."""
+    return models.File(
+        name=name,
+        type=file_type(st.st_mode),
+        link_target=link_target,
+        user=str(st.st_uid) if numeric_uid else names.user(st.st_uid),
+        group=str(st.st_gid) if numeric_uid else names.group(st.st_gid),
+        permissions=stat.filemode(st.st_mode),
+        last_modified=datetime.datetime.fromtimestamp(st.st_mtime).strftime("%Y-%m-%d %H:%M:%S"),
+        size=str(st.st_size),
+    )
+
+
+def entry_stat(entry: os.DirEntry, dereference: bool) -> tuple[os.stat_result, str | None]:
+    """Return the stat to report of an entry and its link target, if it's a symlink reported as such."""
+    st = entry.stat(follow_symlinks=False)
+    if stat.S_ISLNK(st.st_mode):
+        if dereference:
+            try:
+                return entry.stat(), None
+            except OSError:
+                # a dangling link is reported as a link
+                pass
+        return st, os.readlink(entry.path)
+    return st, None
+
+
+def _stats(entries: list[tuple[str, os.DirEntry]], dereference: bool) -> list[tuple[str, os.stat_result, str | None]]:
+    result = []
+    for name, entry in entries:
+        try:
+            result.append((name, *entry_stat(entry, dereference)))
+        except FileNotFoundError:
+            # removed since the directory was read
+            pass
+    return result
+
+
+def _entries(path: str, show_hidden: bool, recursive: bool, dereference: bool, count: int | None = None) -> list[tuple[str, os.DirEntry]]:
+    """Return (relative name, entry) of the directory's entries (the first `count` ones), in directory order (a directory before its content)."""
+    result = []
+    visited = set()
+    pending = [("", path)]
+    while pending:
+        prefix, directory = pending.pop()
+        if recursive:
+            st = os.stat(directory)
+            if (st.st_dev, st.st_ino) in visited:
+                continue
+            visited.add((st.st_dev, st.st_ino))
+        subdirectories = []
+        with os.scandir(directory) as it:
+            for entry in it:
+                if not show_hidden and entry.name.startswith("."):
+                    continue
+                result.append((prefix + entry.name, entry))
+                if count is not None and len(result) >= count:
+                    return result
+                if recursive:
+                    try:
+                        if entry.is_dir(follow_symlinks=dereference):
+                            subdirectories.append((prefix + entry.name + "/", entry.path))
+                    except OSError:
+                        pass
+        pending.extend(reversed(subdirectories))
+    return result
+
+
+def ls(
+    path: str,
+    show_hidden: bool = False,
+    numeric_uid: bool = False,
+    recursive: bool = False,
+    dereference: bool = False,
+    offset: int = 0,
+    limit: int | None = None,
+    sort: str = "name",
+) -> list[models.File]:
+    """
+    List a directory (or describe a single file), like `ls -l` with `-a` (show_hidden), `-n` (numeric_uid),
+    `-R` (recursive) and `-L` (dereference). sort is `name`, `size` (largest first), `time` (newest first)
+    or `none` (directory order, the cheapest with a limit).
+    """
+    st = os.stat(path)
+    if not stat.S_ISDIR(st.st_mode):
+        return [to_file(os.path.basename(path), st, numeric_uid=numeric_uid)][offset:offset + limit if limit is not None else None]
+
+    end = offset + limit if limit is not None else None
+    entries = _entries(path, show_hidden, recursive, dereference, count=end if sort == "none" else None)
+    if sort in ("name", "none"):
+        if sort == "name":
+            entries.sort(key=lambda item: item[0])
+        page = _stats(entries[offset:end], dereference)
+    else:
+        stats = _stats(entries, dereference)
+        if sort == "size":
+            stats.sort(key=lambda item: (-item[1].st_size, item[0]))
+        else:
+            stats.sort(key=lambda item: (-item[1].st_mtime_ns, item[0]))
+        page = stats[offset:end]
+    return [to_file(name, st, link_target, numeric_uid) for name, st, link_target in page]
@@ -0,0 +1,132 @@
+"""
+Checksum manifests of directory trees.
+
+The tree is walked one directory at a time in the shared metadata pool, in lexicographic order of the paths, and
+the regular files are hashed in the shared bulk pool (see `executor`) through `checksum.checksums`, so the digests
+of unchanged files come from the digest cache. Each manifest hashes at most `workers` files at a time, and entries
+are produced in walk order as soon as their digest is known, with at most `workers * 4` files in flight.
+Symlinks are not followed and other special files are skipped.
+
+The root of the manifest is the RFC 6962 Merkle tree hash of the entries (leaf: the relative path, a NUL byte and
+the raw digest), computed incrementally with the manifest's algorithm.
+"""
+import asyncio
+import os
+import stat
+from collections import deque
+from typing import AsyncIterator
+
+from .. import facility_adapter, models
+from . import checksum, executor
+
+
+class MerkleTree:
+    """Incremental RFC 6962 Merkle tree hash: O(log n) memory, leaves added in order."""
+
+    def __init__(self, algorithm: str = "sha256"):
+        self._new = checksum.ALGORITHMS[algorithm][1]
+        # (number of leaves, hash) of the complete subtrees, largest first
+        self._stack: list[tuple[int, bytes]] = []
+
+    def _hash(self, *parts: bytes) -> bytes:
+        digest = self._new()
+        for part in parts:
+            digest.update(part)
+        return digest.digest()
+
+    def add(self, data: bytes):
+        size, node = 1, self._hash(b"\x00", data)
+        while self._stack and self._stack[-1][0] == size:
+            left_size, left = self._stack.pop()
+            size, node = left_size + size, self._hash(b"\x01", left, node)
+        self._stack.append((size, node))
+
+    def root(self) -> str:
+        if not self._stack:
+            return self._hash().hex()
+        node = self._stack[-1][1]
+        for _, left in reversed(self._stack[:-1]):
+            node = self._hash(b"\x01", left, node)
+        return node.hex()
+
+
+def _scan(path: str) -> list[tuple[str, os.stat_result | None, bool]]:
+    """Return (name, stat, is_dir) of the entries of a directory, sorted by name, without following symlinks."""
+    result = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            result.append((entry.name, st, stat.S_ISDIR(st.st_mode)))
+    result.sort(key=lambda item: os.fsencode(item[0]))
+    return result
+
+
+async def _files(root: str) -> AsyncIterator[tuple[str, str, os.stat_result | None, str | None]]:
+    """Yield (relative path, local path, stat, error) of the regular files under root, and of the unreadable directories."""
+    stack = [("", iter(await executor.METADATA.run(_scan, root)))]
+    while stack:
+        prefix, entries = stack[-1]
+        item = next(entries, None)
+        if item is None:
+            stack.pop()
+            continue
+        name, st, is_dir = item
+        relative = prefix + name
+        local = os.path.join(root, relative)
+        if is_dir:
+            try:
+                stack.append((relative + "/", iter(await executor.METADATA.run(_scan, local))))
+            except OSError as exc:
+                yield relative + "/", local, None, exc.strerror or str(exc)
+        elif stat.S_ISREG(st.st_mode):
+            yield relative, local, st, None
+
+
+def _digest(local: str, algorithm: str, cache) -> str:
+    return checksum.checksums(local, [algorithm], cache=cache)[algorithm]
+
+
+async def manifest(root: str, algorithm: str = "sha256", workers: int | None = None, cache=checksum.CONFIGURED) -> AsyncIterator[models.ManifestEntry | models.ManifestSummary]:
+    """Yield the manifest entries of the files under the directory root, then its summary."""
+    checksum.validate([algorithm])
+    workers = workers or facility_adapter.MANIFEST_WORKERS
+    tree = MerkleTree(algorithm)
+    pending = deque()
+    files = size = errors = 0
+
+    async def finish():
+        nonlocal files, size, errors
+        relative, st, error, future = pending.popleft()
+        digest = None
+        if future is not None:
+            try:
+                digest = await future
+            except OSError as exc:
+                error = exc.strerror or str(exc)
+        if digest is None:
+            errors += 1
+            return models.ManifestEntry(path=relative, error=error)
+        tree.add(os.fsencode(relative) + b"\x00" + bytes.fromhex(digest))
+        files += 1
+        size += st.st_size
+        return models.ManifestEntry(path=relative, size=st.st_size, checksum=digest)
+
+    def hashing() -> int:
+        return sum(1 for _, _, _, future in pending if future is not None and not future.done())
+
+    try:
+        async for relative, local, st, error in _files(root):
+            future = None if error else asyncio.ensure_future(executor.BULK.run(_digest, local, algorithm, cache))
+            pending.append((relative, st, error, future))
+            while pending and (len(pending) >= workers * 4 or hashing() >= workers or pending[0][3] is None or pending[0][3].done()):
+                yield await finish()
+        while pending:
+            yield await finish()
+        yield models.ManifestSummary(algorithm=checksum.ALGORITHMS[algorithm][0], root=tree.root(), files=files, size=size, errors=errors)
+    finally:
+        for _, _, _, future in pending:
+            if future is not None:
+                future.cancel()
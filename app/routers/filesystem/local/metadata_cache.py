@@ -0,0 +1,298 @@
+"""
+Cache of file metadata (stat results, file types, directory listings), keyed by resolved path.
+
+Each entry depends on the directory containing its path and, for a directory, on the directory itself. These
+directories are watched with inotify, and any event in them invalidates their entries. The pending events are read
+(without blocking) before every lookup and before storing a result, so a change that completed before a lookup
+is never hidden by the cache. A result computed while its directories changed isn't stored.
+A result can also depend on things these events don't cover (e.g. a listing reports the times of its
+subdirectories, which change with their own content): it is then cached with `expire`, and expires after
+METADATA_CACHE_TTL seconds even when its directories are watched.
+Where inotify isn't available (other platforms, watch limit reached, network filesystems, whose remote changes
+inotify doesn't see), entries expire after METADATA_CACHE_TTL seconds instead, and adapters also invalidate
+the paths they change themselves.
+"""
+import ctypes
+import ctypes.util
+import errno
+import itertools
+import os
+import re
+import struct
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+
+from .. import facility_adapter
+
+# filesystems whose changes made by other hosts aren't reported by inotify
+NETWORK_FILESYSTEMS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "lustre", "gpfs", "ceph", "beegfs", "glusterfs", "9p", "afs", "panfs", "wekafs"}
+MOUNTS_REFRESH_SECONDS = 60
+
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x1000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+_EVENT = struct.Struct("iIII")
+
+
+class Inotify:
+    """Minimal non-blocking inotify binding (Linux only: raises OSError elsewhere)."""
+
+    def __init__(self):
+        path = ctypes.util.find_library("c")
+        if path is None:
+            raise OSError(errno.ENOSYS, "libc not found")
+        self._libc = ctypes.CDLL(path, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path: str) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code), path)
+        return wd
+
+    def rm_watch(self, wd: int):
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self) -> list[tuple[int, int]]:
+        """Return the (watch descriptor, mask) of the pending events."""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            pos = 0
+            while pos < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, pos)
+                events.append((wd, mask))
+                pos += _EVENT.size + length
+
+
+def _mounts() -> list[tuple[str, str]]:
+    """Return the (mount point, filesystem type) of the mounts, longest mount point first."""
+    mounts = []
+    try:
+        with open("/proc/self/mountinfo", encoding="utf-8") as f:
+            for line in f:
+                fields = line.split()
+                separator = fields.index("-")
+                mount_point = re.sub(r"\\([0-7]{3})", lambda match: chr(int(match[1], 8)), fields[4])
+                mounts.append((mount_point, fields[separator + 1]))
+    except (OSError, ValueError, IndexError):
+        pass
+    mounts.sort(key=lambda mount: len(mount[0]), reverse=True)
+    return mounts
+
+
+class _Entry:
+    __slots__ = ("value", "directories", "expires")
+
+    def __init__(self, value, directories: tuple[str, ...], expires: float | None):
+        self.value = value
+        self.directories = directories
+        self.expires = expires
+
+
+class MetadataCache:
+    """An LRU cache of metadata invalidated by inotify events (or expiring after `ttl` seconds where inotify can't be used)."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        # directory -> watch descriptor, and back
+        self._watches: dict[str, int] = {}
+        self._watched: dict[int, str] = {}
+        # directory -> keys of the entries depending on it
+        self._keys: dict[str, set] = {}
+        # directory -> generation: a new number from _counter whenever it starts being watched or changes
+        self._generations: dict[str, int] = {}
+        self._counter = itertools.count(1)
+        self._mounts: list[tuple[str, str]] = []
+        self._mounts_time = 0.0
+        try:
+            self._inotify = Inotify()
+        except OSError:
+            self._inotify = None
+
+    @property
+    def inotify(self) -> bool:
+        return self._inotify is not None
+
+    @property
+    def watches(self) -> int:
+        return len(self._watches)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _on_network_filesystem(self, directory: str) -> bool:
+        now = time.monotonic()
+        if now - self._mounts_time > MOUNTS_REFRESH_SECONDS:
+            self._mounts = _mounts()
+            self._mounts_time = now
+        for mount_point, fs_type in self._mounts:
+            if directory == mount_point or directory.startswith(mount_point.rstrip("/") + "/"):
+                return fs_type in NETWORK_FILESYSTEMS or fs_type.startswith("fuse")
+        return False
+
+    def _watch(self, directory: str) -> bool | None:
+        """Watch a directory: return whether it's watched, or None if it isn't a directory (nothing to watch)."""
+        if directory in self._watches:
+            return True
+        if self._inotify is None or self._on_network_filesystem(directory):
+            return False
+        try:
+            wd = self._inotify.add_watch(directory)
+        except OSError as exc:
+            return None if exc.errno in (errno.ENOTDIR, errno.ENOENT) else False
+        self._watches[directory] = wd
+        self._watched[wd] = directory
+        self._generations[directory] = next(self._counter)
+        return True
+
+    def _unwatch(self, directory: str):
+        wd = self._watches.pop(directory, None)
+        if wd is not None:
+            self._watched.pop(wd, None)
+            self._inotify.rm_watch(wd)
+        self._generations.pop(directory, None)
+        self._keys.pop(directory, None)
+
+    def _invalidate_directory(self, directory: str):
+        for key in list(self._keys.get(directory, ())):
+            self._drop(key)
+        # also changes the generation of computations in progress
+        self._unwatch(directory)
+
+    def _drop(self, key: Hashable):
+        """Remove an entry, and the watches no other entry needs."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for directory in entry.directories:
+            keys = self._keys.get(directory)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    self._unwatch(directory)
+
+    def _drain(self):
+        """Apply the pending inotify events."""
+        if self._inotify is None:
+            return
+        for wd, mask in self._inotify.read():
+            if mask & IN_Q_OVERFLOW:
+                # events were lost: forget everything
+                for directory in list(self._watches):
+                    self._invalidate_directory(directory)
+                self._entries.clear()
+                self._keys.clear()
+                continue
+            directory = self._watched.get(wd)
+            if directory is not None:
+                # the directory is watched again (with a new generation) when it's used again
+                self._invalidate_directory(directory)
+
+    def get(self, key: Hashable, directories: tuple[str, ...], compute: Callable[[], object], expire: bool = False):
+        """
+        Return the value cached under key, or compute it and cache it as depending on the directories (and,
+        with expire, for at most `ttl` seconds).
+        """
+        with self._lock:
+            self._drain()
+            entry = self._entries.get(key)
+            if entry is not None and (entry.expires is None or entry.expires > time.monotonic()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+            self.misses += 1
+            if entry is not None:
+                # expired: dropped before watching, since dropping it later could unwatch its directories
+                self._drop(key)
+            watched = {directory: self._watch(directory) for directory in directories}
+            generations = {directory: self._generations.get(directory) for directory in directories}
+
+        try:
+            value = compute()
+        except BaseException:
+            with self._lock:
+                for directory in directories:
+                    if not self._keys.get(directory):
+                        self._unwatch(directory)
+            raise
+
+        with self._lock:
+            self._drain()
+            self._drop(key)
+            if any(self._generations.get(directory) != generation for directory, generation in generations.items()):
+                # changed (or stopped being watched) while computing
+                return value
+            depends = tuple(directory for directory, state in watched.items() if state is not None)
+            self._entries[key] = _Entry(value, depends, None if not expire and all(watched[d] for d in depends) else time.monotonic() + self.ttl)
+            for directory in depends:
+                self._keys.setdefault(directory, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+        return value
+
+    def invalidate(self, path: str):
+        """Forget the entries of a path changed by the caller (and of its directory)."""
+        with self._lock:
+            self._drain()
+            self._invalidate_directory(path)
+            self._invalidate_directory(os.path.dirname(path))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def metadata_cache() -> MetadataCache | None:
+    """Return the metadata cache, or None if METADATA_CACHE_ENTRIES is 0."""
+    global _cache
+    if facility_adapter.METADATA_CACHE_ENTRIES <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = MetadataCache(facility_adapter.METADATA_CACHE_ENTRIES, facility_adapter.METADATA_CACHE_TTL)
+        return _cache
+
+
+def cached(key: tuple, path: str, compute: Callable[[], object], expire: bool = False):
+    """
+    Return the metadata `key` of a resolved path (e.g. ("stat", path)), from the cache when possible. `expire`
+    is for metadata that can change without an event in the path or its directory (see MetadataCache.get).
+    """
+    cache = metadata_cache()
+    if cache is None:
+        return compute()
+    return cache.get(key, (os.path.dirname(path), path), compute, expire)
+
+
+def invalidate(*paths: str):
+    """Forget the cached metadata of resolved paths changed by the caller."""
+    cache = metadata_cache()
+    if cache is not None:
+        for path in paths:
+            cache.invalidate(path)
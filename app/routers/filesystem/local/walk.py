@@ -0,0 +1,108 @@
+"""
+Recursive directory walks.
+
+Directories are scanned concurrently in the shared metadata pool (see `executor`), at most `workers` at a time for
+each walk, depth first, and the entries of each directory are produced as soon as it has been scanned, so memory
+is bounded by the directories waiting to be scanned (the frontier), not by the size of the tree. Entries come in
+discovery order.
+Symlinked directories are only followed with `dereference`, and then each directory is visited at most once.
+Patterns (fnmatch) containing a `/` are matched against the path relative to the walked directory, the others
+against the entry name: excluded directories are not descended into, and `include` only filters the entries reported.
+"""
+import asyncio
+import fnmatch
+import os
+import stat
+from typing import AsyncIterator
+
+from .. import facility_adapter, models
+from . import executor, listing
+
+
+def _matches(patterns: list[str], name: str, relative: str) -> bool:
+    return any(fnmatch.fnmatchcase(relative if "/" in pattern else name, pattern) for pattern in patterns)
+
+
+def _scan(
+    directory: str,
+    prefix: str,
+    show_hidden: bool,
+    numeric_uid: bool,
+    dereference: bool,
+    descend: bool,
+    include: list[str],
+    exclude: list[str],
+) -> tuple[list[models.File], list[tuple[str, str, tuple[int, int]]], str | None]:
+    """Return the entries of a directory to report, its subdirectories to walk (prefix, path, (dev, ino)), and the error reading it, if any."""
+    files = []
+    subdirectories = []
+    try:
+        it = os.scandir(directory)
+    except OSError as exc:
+        return files, subdirectories, exc.strerror or str(exc)
+    with it:
+        for entry in it:
+            if not show_hidden and entry.name.startswith("."):
+                continue
+            relative = prefix + entry.name
+            if _matches(exclude, entry.name, relative):
+                continue
+            try:
+                st, link_target = listing.entry_stat(entry, dereference)
+            except FileNotFoundError:
+                continue
+            if not include or _matches(include, entry.name, relative):
+                files.append(listing.to_file(relative, st, link_target, numeric_uid))
+            if descend and stat.S_ISDIR(st.st_mode):
+                subdirectories.append((relative + "/", entry.path, (st.st_dev, st.st_ino)))
+    # depth first: the last subdirectory is walked first
+    subdirectories.reverse()
+    return files, subdirectories, None
+
+
+async def walk(
+    root: str,
+    max_depth: int | None = None,
+    include: list[str] | None = None,
+    exclude: list[str] | None = None,
+    show_hidden: bool = False,
+    numeric_uid: bool = False,
+    dereference: bool = False,
+    workers: int | None = None,
+) -> AsyncIterator[models.File | models.WalkError]:
+    """
+    Yield the entries under the directory root, named by their path relative to it, down to max_depth levels
+    (1: only the entries of root). The directories that can't be read are reported as WalkErrors.
+    """
+    workers = workers or facility_adapter.WALK_WORKERS
+    include = include or []
+    exclude = exclude or []
+    root_stat = await executor.METADATA.run(os.stat, root)
+    visited = {(root_stat.st_dev, root_stat.st_ino)}
+    frontier = [("", root, 1)]
+    running = {}
+    try:
+        while frontier or running:
+            while frontier and len(running) < workers:
+                prefix, directory, depth = frontier.pop()
+                descend = max_depth is None or depth < max_depth
+                future = asyncio.ensure_future(executor.METADATA.run(_scan, directory, prefix, show_hidden, numeric_uid, dereference, descend, include, exclude))
+                running[future] = (prefix, depth)
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                prefix, depth = running.pop(future)
+                files, subdirectories, error = future.result()
+                if error is not None:
+                    yield models.WalkError(path=prefix or ".", error=error)
+                for file in files:
+                    yield file
+                for sub_prefix, path, key in subdirectories:
+                    # only symlinks (with dereference) can lead to a directory twice
+                    if key in visited:
+                        continue
+                    if dereference:
+                        visited.add(key)
+                    frontier.append((sub_prefix, path, depth + 1))
+    finally:
+        for future in running:
+            future.cancel()
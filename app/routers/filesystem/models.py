@@ -6,8 +6,12 @@
 # Please, refer to the LICENSE file in the root directory.
 # SPDX-License-Identifier: BSD-3-Clause
 
+import datetime
+import re
 from enum import Enum
-from pydantic import Field, AliasChoices, BaseModel
+from typing import Annotated, Literal
+from pydantic import Field, AliasChoices, BaseModel, field_validator, model_validator
+from ..task.models import TaskStatus
 
 
 class CompressionType(str, Enum):
@@ -16,6 +20,7 @@ class CompressionType(str, Enum):
     bzip2 = "bzip2"
     gzip = "gzip"
     xz = "xz"
+    zstd = "zstd"
 
 
 class ContentUnit(str, Enum):
@@ -44,6 +49,27 @@ class FileContent(BaseModel):
     end_position: int = Field(..., description="End position of the returned content", example=10)
 
 
+class LsSort(str, Enum):
+    """Defines the order of a directory listing."""
+    name = "name"
+    size = "size"
+    time = "time"
+    none = "none"
+
+
+class ChecksumAlgorithm(str, Enum):
+    """Defines the checksum algorithms. The xxHash ones may not be available at every facility."""
+    sha256 = "sha256"
+    sha512 = "sha512"
+    sha1 = "sha1"
+    blake2b = "blake2b"
+    blake2s = "blake2s"
+    md5 = "md5"
+    xxh64 = "xxh64"
+    xxh3_64 = "xxh3_64"
+    xxh3_128 = "xxh3_128"
+
+
 class FileChecksum(BaseModel):
     """Represents the checksum information of a file."""
     algorithm: str = Field(default="SHA-256", description="Checksum algorithm", example="SHA-256")
@@ -98,7 +124,58 @@ class GetFileTailResponse(BaseModel):
 
 class GetFileChecksumResponse(BaseModel):
     """Represents the response for getting file checksum information."""
-    output: FileChecksum|None = Field(default=None, description="File checksum information")
+    output: FileChecksum|None = Field(default=None, description="File checksum information (of the first requested algorithm)")
+    checksums: list[FileChecksum]|None = Field(default=None, description="The checksums of all the requested algorithms, in the requested order")
+
+
+class WalkError(BaseModel):
+    """Represents a directory that couldn't be read during a recursive listing."""
+    path: str = Field(..., description="Path of the directory relative to the listed one", example="run1/private/")
+    error: str = Field(..., description="Why the directory couldn't be read", example="Permission denied")
+
+
+class ManifestEntry(BaseModel):
+    """Represents a file of a directory manifest, or a file or directory that couldn't be read."""
+    path: str = Field(..., description="Path relative to the directory (directories end with `/`)", example="run1/output.dat")
+    size: int|None = Field(default=None, description="File size in bytes", example=1048576)
+    checksum: str|None = Field(default=None, description="Checksum of the file", example="3a7bd3e2360a3d...")
+    error: str|None = Field(default=None, description="Why the file or directory couldn't be read", example="Permission denied")
+
+
+class ManifestSummary(BaseModel):
+    """Represents the last line of a directory manifest."""
+    algorithm: str = Field(..., description="Checksum algorithm of the files and of the Merkle tree", example="SHA-256")
+    root: str = Field(..., description="Merkle tree hash (RFC 6962) of the manifest entries, in order", example="9f86d081884c7d65...")
+    files: int = Field(..., description="Number of files in the manifest", example=1200)
+    size: int = Field(..., description="Total size of the files in bytes", example=1073741824)
+    errors: int = Field(..., description="Number of entries that couldn't be read (not part of the Merkle tree)", example=0)
+
+
+class CacheMetrics(BaseModel):
+    """Represents the counters of a cache of the filesystem layer, since the worker process started."""
+    hits: int = Field(..., description="Lookups answered from the cache", example=950)
+    misses: int = Field(..., description="Lookups that had to be computed", example=50)
+    hit_rate: float = Field(..., description="hits / (hits + misses), 0 without lookups", example=0.95)
+    entries: int|None = Field(default=None, description="Number of cached entries", example=1200)
+    watches: int|None = Field(default=None, description="Number of directories watched for changes", example=40)
+    inotify: bool|None = Field(default=None, description="Whether changes are detected with inotify (otherwise entries expire)", example=True)
+
+
+class PoolMetrics(BaseModel):
+    """Represents the state of a pool running blocking filesystem calls."""
+    name: str = Field(..., description="Pool name", example="bulk")
+    workers: int = Field(..., description="Maximum number of calls running at the same time", example=4)
+    queued: int = Field(..., description="Calls waiting for a worker", example=2)
+    running: int = Field(..., description="Calls running", example=4)
+    completed: int = Field(..., description="Calls finished (including failed and cancelled ones)", example=1250)
+    cancelled: int = Field(..., description="Calls cancelled, queued or running", example=3)
+
+
+class FilesystemMetrics(BaseModel):
+    """Represents the metrics of the local filesystem layer of one worker process."""
+    metadata_cache: CacheMetrics|None = Field(default=None, description="Cache of stat results, file types and listings (null if disabled)")
+    checksum_cache: CacheMetrics|None = Field(default=None, description="Cache of file checksums (null if disabled)")
+    pools: list[PoolMetrics] = Field(default_factory=list, description="Pools running the blocking filesystem calls")
 
 
 class GetFileTypeResponse(BaseModel):
@@ -160,6 +237,46 @@ class PutFileChownResponse(BaseModel):
     output: File|None = Field(default=None, description="Updated file metadata")
 
 
+class StagedFile(BaseModel):
+    """Represents an uploaded file spooled to the staging area, handed to the upload task instead of its content."""
+    id: str = Field(..., description="Staging handle of the uploaded file", example="3f2c9a7e1b5d4c8f9e0a6b2d7c1e4f5a")
+    filename: str|None = Field(default=None, description="File name sent by the client", example="input.dat")
+    size: int = Field(..., description="Size of the uploaded file in bytes", example=1048576)
+    checksum: str = Field(..., description="SHA-256 checksum of the uploaded file", example="e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855")
+
+
+class ByteRange(BaseModel):
+    """Represents a range of bytes of a file, from `start` (inclusive) to `end` (exclusive)."""
+    start: int = Field(..., ge=0, description="Offset of the first byte", example=0)
+    end: int = Field(..., ge=0, description="Offset after the last byte", example=8388608)
+
+
+class PostUploadSessionRequest(BaseModel):
+    """Represents a request to start a resumable upload."""
+    path: str = Field(..., description="Path where the file should be uploaded", example="/home/user/dir/input.dat")
+    size: int = Field(..., ge=0, description="Size of the file in bytes", example=4294967296)
+    checksum: str|None = Field(default=None, pattern="^[0-9a-fA-F]{64}$", description="SHA-256 checksum of the whole file, verified when the upload is finalized (if not given here, it's required then)",
+                               example="e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855")
+
+
+class PostUploadSessionFinalizeRequest(BaseModel):
+    """Represents a request to finalize a resumable upload."""
+    checksum: str|None = Field(default=None, pattern="^[0-9a-fA-F]{64}$", description="SHA-256 checksum of the whole file, required if it wasn't given when the upload was started",
+                               example="e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855")
+
+
+class UploadSession(BaseModel):
+    """Represents a resumable upload: chunks can be sent at any offset, in any order, until the upload is finalized."""
+    id: str = Field(..., description="Identifier of the upload session", example="3f2c9a7e1b5d4c8f9e0a6b2d7c1e4f5a")
+    resource_id: str = Field(..., description="Resource the file is uploaded to", example="7ed20f98-d330-5ab9-ba50-0635cd8ad0bf")
+    path: str = Field(..., description="Path where the file will be uploaded", example="/home/user/dir/input.dat")
+    size: int = Field(..., description="Size of the file in bytes", example=4294967296)
+    checksum: str|None = Field(default=None, description="Expected SHA-256 checksum of the whole file")
+    received: list[ByteRange] = Field(default_factory=list, description="The ranges of the file received so far, merged and sorted")
+    complete: bool = Field(default=False, description="Whether the whole file was received, so the upload can be finalized")
+    expires_at: datetime.datetime = Field(..., description="When the session expires if no more chunks are received")
+
+
 class PutFileUploadResponse(BaseModel):
     """Represents the response for uploading a file."""
     output: str|None = Field(default=None, description="Upload result or identifier")
@@ -202,14 +319,14 @@ class PostCompressRequest(FilesystemRequestBase):
     target_path: str = Field(..., description="Path to the compressed file", example="/home/user/file.tar.gz")
     match_pattern: str|None = Field(default=None, description="Regex pattern to filter files to compress", example=".*\\.txt$")
     dereference: bool = Field(default=False, description="If set to `true`, it follows symbolic links and archive the files they point to instead of the links themselves.", example=True)
-    compression: CompressionType = Field(default="gzip", description="Defines the type of compression to be used. By default gzip is used.", example="gzip")
+    compression: CompressionType = Field(default="gzip", description="Defines the type of compression to be used. By default gzip is used. `zstd` compresses large directories much faster.", example="gzip")
     model_config = {
         "json_schema_extra": {
             "examples": [
                 {
                     "source_path": "/home/user/dir",
                     "target_path": "/home/user/file.tar.gz",
-                    "match_pattern": "*./[ab].*\\.txt",
+                    "match_pattern": "/[ab][^/]*\\.txt$",
                     "dereference": "true",
                     "compression": "none",
                 }
@@ -217,6 +334,16 @@ class PostCompressRequest(FilesystemRequestBase):
         }
     }
 
+    @field_validator("match_pattern")
+    @classmethod
+    def check_match_pattern(cls, match_pattern: str|None) -> str|None:
+        if match_pattern is not None:
+            try:
+                re.compile(match_pattern)
+            except re.error as exc:
+                raise ValueError(f"Invalid regex: {exc}") from exc
+        return match_pattern
+
 
 class PostExtractResponse(BaseModel):
     """Represents the response for extracting a compressed file."""
@@ -244,6 +371,7 @@ class PostCopyRequest(FilesystemRequestBase):
     """Represents a request to copy a file."""
     target_path: str = Field(..., description="Target path of the copy operation", example="/home/user/dir/file.new")
     dereference: bool = Field(default=False, description=("If set to `true`, it follows symbolic links and copies the files they point to instead of the links themselves."), example=True)
+    preserve: bool = Field(default=False, description="If set to `true`, the copies keep the mode, owner (when permitted) and timestamps of the files, like `cp -p`.", example=False)
     model_config = {
         "json_schema_extra": {
             "examples": [
@@ -285,3 +413,269 @@ class PostMoveResponse(BaseModel):
 class RemoveResponse(BaseModel):
     """Represents the response for removing a file or directory."""
     output: str|None = Field(default=None, description="Removal result message")
+
+
+class BatchCommand(str, Enum):
+    """Defines the filesystem commands that can be run in a batch."""
+    chmod = "chmod"
+    chown = "chown"
+    file = "file"
+    stat = "stat"
+    mkdir = "mkdir"
+    symlink = "symlink"
+    ls = "ls"
+    head = "head"
+    view = "view"
+    tail = "tail"
+    checksum = "checksum"
+    rm = "rm"
+    compress = "compress"
+    extract = "extract"
+    mv = "mv"
+    cp = "cp"
+    download = "download"
+
+
+class BatchPathArgs(BaseModel):
+    """Represents the arguments of the batch commands that only take a path (`file`, `rm`, `download`)."""
+    path: str = Field(..., description="A file or folder path", example="/home/user/file")
+    model_config = {"extra": "forbid"}
+
+
+class BatchStatArgs(BatchPathArgs):
+    """Represents the arguments of a `stat` in a batch."""
+    dereference: bool = Field(default=False, description="Follow symbolic links")
+
+
+class BatchLsArgs(BatchPathArgs):
+    """Represents the arguments of an `ls` in a batch."""
+    show_hidden: bool = Field(default=False, description="Show hidden files")
+    numeric_uid: bool = Field(default=False, description="List numeric user and group IDs")
+    recursive: bool = Field(default=False, description="Recursively list files and folders")
+    dereference: bool = Field(default=False, description="Show information for the file the link references.")
+    offset: int = Field(default=0, ge=0, description="Number of entries to skip")
+    limit: int|None = Field(default=None, ge=1, description="Maximum number of entries to return")
+    sort: LsSort = Field(default=LsSort.name, description="Order of the entries")
+
+
+class BatchHeadArgs(BatchPathArgs):
+    """Represents the arguments of a `head` in a batch: exactly one of `file_bytes` or `lines`."""
+    file_bytes: int|None = Field(default=None, ge=1, description="The output will be the first NUM bytes of the file.")
+    lines: int|None = Field(default=None, ge=1, description="The output will be the first NUM lines of the file.")
+    skip_trailing: bool = Field(default=False, description="The output will be the whole file, without the last NUM bytes/lines.")
+
+    @model_validator(mode="after")
+    def check_bytes_or_lines(self):
+        if (self.file_bytes is None) == (self.lines is None):
+            raise ValueError("Exactly one of `file_bytes` or `lines` must be specified.")
+        return self
+
+
+class BatchTailArgs(BatchPathArgs):
+    """Represents the arguments of a `tail` in a batch: exactly one of `file_bytes` or `lines`."""
+    path: str = Field(..., min_length=1, description="File path", example="/home/user/file")
+    file_bytes: int|None = Field(default=None, ge=1, description="The output will be the last NUM bytes of the file.")
+    lines: int|None = Field(default=None, ge=1, description="The output will be the last NUM lines of the file.")
+    skip_heading: bool = Field(default=False, description="The output will be the whole file, without the first NUM bytes/lines.")
+
+    @model_validator(mode="after")
+    def check_bytes_or_lines(self):
+        if (self.file_bytes is None) == (self.lines is None):
+            raise ValueError("Exactly one of `file_bytes` or `lines` must be specified.")
+        return self
+
+
+class BatchViewArgs(BatchPathArgs):
+    """Represents the arguments of a `view` in a batch."""
+    size: int|None = Field(default=None, ge=1, validate_default=True, description="Value, in bytes, of the size of data to be retrieved from the file (default and maximum: OPS_SIZE_LIMIT).")
+    offset: int = Field(default=0, ge=0, description="Value in bytes of the offset.")
+
+    @field_validator("size")
+    @classmethod
+    def check_size(cls, size: int|None) -> int:
+        # the limit is configured with the adapters, whose module imports this one
+        from .facility_adapter import OPS_SIZE_LIMIT
+        if size is None:
+            return OPS_SIZE_LIMIT
+        if size > OPS_SIZE_LIMIT:
+            raise ValueError(f"Input should be less than or equal to {OPS_SIZE_LIMIT}")
+        return size
+
+
+class BatchChecksumArgs(BatchPathArgs):
+    """Represents the arguments of a `checksum` in a batch."""
+    algorithms: list[ChecksumAlgorithm]|None = Field(default=None, description="Checksum algorithms (default: sha256)")
+
+
+class BatchChmodArgs(PutFileChmodRequest):
+    model_config = {"extra": "forbid"}
+
+
+class BatchChownArgs(PutFileChownRequest):
+    model_config = {"extra": "forbid"}
+
+
+class BatchMakeDirArgs(PostMakeDirRequest):
+    model_config = {"extra": "forbid"}
+
+
+class BatchSymlinkArgs(PostFileSymlinkRequest):
+    model_config = {"extra": "forbid"}
+
+
+class BatchCompressArgs(PostCompressRequest):
+    model_config = {"extra": "forbid"}
+
+
+class BatchExtractArgs(PostExtractRequest):
+    model_config = {"extra": "forbid"}
+
+
+class BatchMoveArgs(PostMoveRequest):
+    model_config = {"extra": "forbid"}
+
+
+class BatchCopyArgs(PostCopyRequest):
+    model_config = {"extra": "forbid"}
+
+
+class BatchChmodOperation(BaseModel):
+    """Represents a `chmod` in a batch: its arguments are the request body of the route."""
+    command: Literal[BatchCommand.chmod]
+    args: BatchChmodArgs
+
+
+class BatchChownOperation(BaseModel):
+    """Represents a `chown` in a batch: its arguments are the request body of the route."""
+    command: Literal[BatchCommand.chown]
+    args: BatchChownArgs
+
+
+class BatchFileOperation(BaseModel):
+    """Represents a `file` in a batch."""
+    command: Literal[BatchCommand.file]
+    args: BatchPathArgs
+
+
+class BatchStatOperation(BaseModel):
+    """Represents a `stat` in a batch."""
+    command: Literal[BatchCommand.stat]
+    args: BatchStatArgs
+
+
+class BatchMakeDirOperation(BaseModel):
+    """Represents a `mkdir` in a batch: its arguments are the request body of the route."""
+    command: Literal[BatchCommand.mkdir]
+    args: BatchMakeDirArgs
+
+
+class BatchSymlinkOperation(BaseModel):
+    """Represents a `symlink` in a batch: its arguments are the request body of the route."""
+    command: Literal[BatchCommand.symlink]
+    args: BatchSymlinkArgs
+
+
+class BatchLsOperation(BaseModel):
+    """Represents an `ls` in a batch."""
+    command: Literal[BatchCommand.ls]
+    args: BatchLsArgs
+
+
+class BatchHeadOperation(BaseModel):
+    """Represents a `head` in a batch."""
+    command: Literal[BatchCommand.head]
+    args: BatchHeadArgs
+
+
+class BatchViewOperation(BaseModel):
+    """Represents a `view` in a batch."""
+    command: Literal[BatchCommand.view]
+    args: BatchViewArgs
+
+
+class BatchTailOperation(BaseModel):
+    """Represents a `tail` in a batch."""
+    command: Literal[BatchCommand.tail]
+    args: BatchTailArgs
+
+
+class BatchChecksumOperation(BaseModel):
+    """Represents a `checksum` in a batch."""
+    command: Literal[BatchCommand.checksum]
+    args: BatchChecksumArgs
+
+
+class BatchRemoveOperation(BaseModel):
+    """Represents an `rm` in a batch."""
+    command: Literal[BatchCommand.rm]
+    args: BatchPathArgs
+
+
+class BatchCompressOperation(BaseModel):
+    """Represents a `compress` in a batch: its arguments are the request body of the route."""
+    command: Literal[BatchCommand.compress]
+    args: BatchCompressArgs
+
+
+class BatchExtractOperation(BaseModel):
+    """Represents an `extract` in a batch: its arguments are the request body of the route."""
+    command: Literal[BatchCommand.extract]
+    args: BatchExtractArgs
+
+
+class BatchMoveOperation(BaseModel):
+    """Represents an `mv` in a batch: its arguments are the request body of the route."""
+    command: Literal[BatchCommand.mv]
+    args: BatchMoveArgs
+
+
+class BatchCopyOperation(BaseModel):
+    """Represents a `cp` in a batch: its arguments are the request body of the route."""
+    command: Literal[BatchCommand.cp]
+    args: BatchCopyArgs
+
+
+class BatchDownloadOperation(BaseModel):
+    """Represents a `download` in a batch."""
+    command: Literal[BatchCommand.download]
+    args: BatchPathArgs
+
+
+# one operation of a batch: the arguments of the commands that have a request body are that body, the others
+# take the query parameters of their route in snake case (e.g. `show_hidden`, and `file_bytes` for `bytes`),
+# with the same constraints and defaults; unknown arguments are rejected
+BatchOperation = Annotated[
+    BatchChmodOperation | BatchChownOperation | BatchFileOperation | BatchStatOperation | BatchMakeDirOperation | BatchSymlinkOperation
+    | BatchLsOperation | BatchHeadOperation | BatchViewOperation | BatchTailOperation | BatchChecksumOperation | BatchRemoveOperation
+    | BatchCompressOperation | BatchExtractOperation | BatchMoveOperation | BatchCopyOperation | BatchDownloadOperation,
+    Field(discriminator="command"),
+]
+
+
+class PostBatchRequest(BaseModel):
+    """Represents a request to run several filesystem operations as a single task."""
+    operations: list[BatchOperation] = Field(..., min_length=1, description="The operations to run, independently of each other")
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "operations": [
+                        {"command": "stat", "args": {"path": "/home/user/out1.dat"}},
+                        {"command": "chmod", "args": {"path": "/home/user/out1.dat", "mode": "640"}},
+                        {"command": "rm", "args": {"path": "/home/user/scratch"}},
+                    ]
+                }
+            ]
+        }
+    }
+
+
+class BatchOperationResult(BaseModel):
+    """Represents the outcome of one operation of a batch."""
+    status: TaskStatus = Field(..., description="`completed` or `failed`", example="completed")
+    result: dict|None = Field(default=None, description="The result the operation would have as its own task (the error message if it failed)")
+
+
+class PostBatchResponse(BaseModel):
+    """Represents the response for running a batch of operations."""
+    output: list[BatchOperationResult] = Field(..., description="The outcome of each operation, in the order of the request")
@@ -0,0 +1,188 @@
+"""
+Staging area for uploaded files.
+
+Uploads are parsed straight from the request stream: the file part of the `multipart/form-data` body is written
+chunk by chunk to a file in UPLOAD_STAGING_DIR while its size is checked against UPLOAD_SIZE_LIMIT and its SHA-256
+is computed, so memory use doesn't depend on the size of the file. The upload task only receives a `StagedFile`
+handle, and the staged file is removed once the task is done. Staged files left behind (e.g. by canceled tasks)
+are removed after STAGED_FILE_TTL.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import time
+import uuid
+
+from fastapi import HTTPException, Request, status
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from . import facility_adapter, models
+
+STAGED_FILE_TTL = 24 * 3600
+CLEANUP_INTERVAL = 600
+
+_STAGED_ID = re.compile(r"[0-9a-f]{32}")
+_last_cleanup = 0.0
+
+
+def staging_dir() -> str:
+    """Return the staging directory, creating it (private to the API) if needed."""
+    os.makedirs(facility_adapter.UPLOAD_STAGING_DIR, mode=0o700, exist_ok=True)
+    return facility_adapter.UPLOAD_STAGING_DIR
+
+
+def staged_path(staged: models.StagedFile) -> str:
+    """Return the path of a staged file."""
+    if not _STAGED_ID.fullmatch(staged.id):
+        raise ValueError(f"Invalid staged file id: {staged.id}")
+    return os.path.join(staging_dir(), staged.id)
+
+
+def discard(staged: models.StagedFile):
+    """Remove a staged file, if it's still there."""
+    try:
+        os.unlink(staged_path(staged))
+    except FileNotFoundError:
+        pass
+
+
+def cleanup(max_age: float = STAGED_FILE_TTL):
+    """Remove the staged files older than max_age seconds. Runs at most every CLEANUP_INTERVAL seconds."""
+    global _last_cleanup
+    now = time.time()
+    if now - _last_cleanup < CLEANUP_INTERVAL:
+        return
+    _last_cleanup = now
+    with os.scandir(staging_dir()) as entries:
+        for entry in entries:
+            try:
+                if _STAGED_ID.fullmatch(entry.name) and now - entry.stat(follow_symlinks=False).st_mtime > max_age:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+class _FilePart:
+    """multipart parser callbacks writing the data of one part to the staging file."""
+
+    def __init__(self, field: str, limit: int):
+        self.field = field
+        self.limit = limit
+        self.file = None
+        self.staged_id = uuid.uuid4().hex
+        self.filename = None
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.pending: list[bytes] = []
+        self.in_file_part = False
+        self.done = False
+        self._headers: dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        }
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, params = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if params.get(b"name", b"").decode("utf-8", "replace") == self.field and not self.done:
+            self.in_file_part = True
+            filename = params.get(b"filename")
+            self.filename = os.path.basename(filename.decode("utf-8", "replace")) if filename else None
+            self.file = open(os.path.join(staging_dir(), self.staged_id), "xb")
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if not self.in_file_part:
+            return
+        self.size += end - start
+        if self.size > self.limit:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"File to upload is larger than {self.limit} bytes.")
+        self.pending.append(data[start:end])
+
+    def _on_part_end(self):
+        if self.in_file_part:
+            self.in_file_part = False
+            self.done = True
+
+    def flush(self):
+        """Write (and hash) the data parsed since the last flush. Called in a worker thread."""
+        data = b"".join(self.pending)
+        self.pending.clear()
+        self.digest.update(data)
+        self.file.write(data)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+    def abort(self):
+        self.close()
+        try:
+            os.unlink(os.path.join(staging_dir(), self.staged_id))
+        except FileNotFoundError:
+            pass
+
+    def staged(self) -> models.StagedFile:
+        return models.StagedFile(id=self.staged_id, filename=self.filename, size=self.size, checksum=self.digest.hexdigest())
+
+
+async def stage_upload(request: Request, field: str = "file", limit: int = facility_adapter.UPLOAD_SIZE_LIMIT) -> models.StagedFile:
+    """
+    Spool the `field` file part of a `multipart/form-data` request body to the staging area.
+    Raises 413 as soon as the file is larger than limit, 415 for other content types and 422 without the file part.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="The file must be uploaded as `multipart/form-data`.")
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limit + 64 * 1024:
+        # the body can't hold a file within the limit (allowing for the multipart framing)
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"File to upload is larger than {limit} bytes.")
+
+    await asyncio.to_thread(cleanup)
+    part = _FilePart(field, limit)
+    parser = MultipartParser(boundary, part.callbacks())
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if part.pending:
+                await asyncio.to_thread(part.flush)
+        parser.finalize()
+        if part.pending:
+            await asyncio.to_thread(part.flush)
+    except MultipartParseError as exc:
+        part.abort()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid `multipart/form-data` body: {exc}") from exc
+    except BaseException:
+        part.abort()
+        raise
+    part.close()
+    if not part.done:
+        part.abort()
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Missing `{field}` file in the `multipart/form-data` body.")
+    return part.staged()
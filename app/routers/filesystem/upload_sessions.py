@@ -0,0 +1,326 @@
+"""
+Resumable uploads.
+
+A session lives in its own directory under the staging area (see `staging`):
+- `session.json`: the session parameters (owner, resource, target path, size, expected checksum),
+  whose modification time is refreshed by every chunk and gives the session's expiry,
+- `data`: the file, preallocated to its full size when the session is created,
+- `chunks/`: one empty marker file `<start>-<end>` per chunk written (and verified) completely,
+- `finalizing`: created (exclusively) by the finalize call that claims the session, so only one of several
+  concurrent calls verifies and moves the data.
+
+A chunk holds a shared `flock` on `data` while it writes and marks its range, and checks for `finalizing` once it
+has the lock; finalize takes an exclusive lock after creating `finalizing`, so it waits for the chunks in flight
+and no chunk can change the data after it was verified (the lock works across the API's worker processes).
+
+Chunks are written with `pwrite` straight at their offset, so they can arrive in any order and concurrently,
+and a chunk only counts as received once its marker exists: an interrupted chunk is simply sent again.
+A chunk sent again overwrites the data of its range, so finalizing requires the whole file's SHA-256 (given when the
+session is created, or when it's finalized): it verifies it and renames the data file into the staging area as a staged file
+(an atomic rename on the same filesystem), which the upload task then moves into place.
+Expired sessions are removed lazily, when sessions are created.
+"""
+import asyncio
+import datetime
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+
+from fastapi import HTTPException, Request, status
+
+from ...types.user import User
+from . import facility_adapter, models, staging
+
+CLEANUP_INTERVAL = 600
+# chunk data is buffered up to this size between writes
+WRITE_BUFFER_BYTES = 1024 * 1024
+
+_SESSION_ID = re.compile(r"[0-9a-f]{32}")
+_CHUNK = re.compile(r"(\d+)-(\d+)")
+_last_cleanup = 0.0
+
+
+def _sessions_dir() -> str:
+    path = os.path.join(staging.staging_dir(), "sessions")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+
+def _session_dir(session_id: str) -> str:
+    return os.path.join(_sessions_dir(), session_id)
+
+
+def _expires_at(meta_mtime: float) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(meta_mtime + facility_adapter.UPLOAD_SESSION_TTL, datetime.timezone.utc)
+
+
+def _load(session_id: str, user: User, resource_id: str) -> tuple[dict, float]:
+    """Return the parameters of a session of the user on the resource and the modification time of its metadata, or raise 404."""
+    if _SESSION_ID.fullmatch(session_id):
+        meta_path = os.path.join(_session_dir(session_id), "session.json")
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            mtime = os.stat(meta_path).st_mtime
+        except FileNotFoundError:
+            meta = None
+        if meta is not None and meta["user_id"] == user.id and meta["resource_id"] == resource_id and time.time() - mtime <= facility_adapter.UPLOAD_SESSION_TTL:
+            return meta, mtime
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Upload session not found: {session_id}")
+
+
+def _received(session_id: str) -> list[models.ByteRange]:
+    """Return the merged ranges of the chunks received so far."""
+    ranges = []
+    with os.scandir(os.path.join(_session_dir(session_id), "chunks")) as entries:
+        for entry in entries:
+            match = _CHUNK.fullmatch(entry.name)
+            if match:
+                ranges.append((int(match[1]), int(match[2])))
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [models.ByteRange(start=start, end=end) for start, end in merged]
+
+
+def _session(meta: dict, mtime: float) -> models.UploadSession:
+    received = _received(meta["id"])
+    complete = meta["size"] == 0 or (len(received) == 1 and received[0].start == 0 and received[0].end == meta["size"])
+    return models.UploadSession(
+        id=meta["id"],
+        resource_id=meta["resource_id"],
+        path=meta["path"],
+        size=meta["size"],
+        checksum=meta["checksum"],
+        received=received,
+        complete=complete,
+        expires_at=_expires_at(mtime),
+    )
+
+
+def cleanup():
+    """Remove the expired sessions. Runs at most every CLEANUP_INTERVAL seconds."""
+    global _last_cleanup
+    now = time.time()
+    if now - _last_cleanup < CLEANUP_INTERVAL:
+        return
+    _last_cleanup = now
+    with os.scandir(_sessions_dir()) as entries:
+        for entry in entries:
+            try:
+                expired = now - os.stat(os.path.join(entry.path, "session.json")).st_mtime > facility_adapter.UPLOAD_SESSION_TTL
+            except FileNotFoundError:
+                # a session being created, or left half-removed: judge by the directory itself
+                expired = now - entry.stat(follow_symlinks=False).st_mtime > facility_adapter.UPLOAD_SESSION_TTL
+            if expired:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def _create(user: User, resource_id: str, request_model: models.PostUploadSessionRequest) -> models.UploadSession:
+    cleanup()
+    session_id = uuid.uuid4().hex
+    path = _session_dir(session_id)
+    os.makedirs(os.path.join(path, "chunks"))
+    # the session directory is private: the file gets the usual mode of new files, like multipart uploads
+    fd = os.open(os.path.join(path, "data"), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        if request_model.size:
+            try:
+                # reserve the space up front, so the upload can't fail half-way for lack of space
+                os.posix_fallocate(fd, 0, request_model.size)
+            except (AttributeError, OSError):
+                os.ftruncate(fd, request_model.size)
+    except OSError as exc:
+        shutil.rmtree(path, ignore_errors=True)
+        raise HTTPException(status_code=status.HTTP_507_INSUFFICIENT_STORAGE, detail=f"Cannot allocate {request_model.size} bytes: {exc}") from exc
+    finally:
+        os.close(fd)
+    meta = {
+        "id": session_id,
+        "user_id": user.id,
+        "resource_id": resource_id,
+        "path": request_model.path,
+        "size": request_model.size,
+        "checksum": request_model.checksum.lower() if request_model.checksum else None,
+    }
+    meta_path = os.path.join(path, "session.json")
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return _session(meta, os.stat(meta_path).st_mtime)
+
+
+async def create(user: User, resource_id: str, request_model: models.PostUploadSessionRequest) -> models.UploadSession:
+    """Start a resumable upload."""
+    if request_model.size > facility_adapter.UPLOAD_SIZE_LIMIT:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"File to upload is larger than {facility_adapter.UPLOAD_SIZE_LIMIT} bytes.")
+    return await asyncio.to_thread(_create, user, resource_id, request_model)
+
+
+async def get(user: User, resource_id: str, session_id: str) -> models.UploadSession:
+    """Return a session with the ranges received so far."""
+    meta, mtime = await asyncio.to_thread(_load, session_id, user, resource_id)
+    return await asyncio.to_thread(_session, meta, mtime)
+
+
+async def write_chunk(user: User, resource_id: str, session_id: str, offset: int, request: Request, checksum: str | None = None) -> models.UploadSession:
+    """
+    Write the request body at offset in the session's file. The chunk is marked as received once it is written
+    completely and, if checksum (its SHA-256) is given, verified.
+    """
+    meta, _ = await asyncio.to_thread(_load, session_id, user, resource_id)
+    size = meta["size"]
+    path = _session_dir(session_id)
+    if offset > size:
+        raise HTTPException(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, detail=f"Offset {offset} is past the end of the file ({size} bytes).")
+    limit = min(size - offset, facility_adapter.UPLOAD_CHUNK_SIZE_LIMIT)
+
+    digest = hashlib.sha256()
+    written = 0
+    buffer = []
+    buffered = 0
+    def open_locked() -> int:
+        try:
+            fd = os.open(os.path.join(path, "data"), os.O_WRONLY)
+        except FileNotFoundError as exc:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Upload session not found: {session_id}") from exc
+        try:
+            # waits while the session is being verified; the data may have been moved by then
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            if os.path.exists(os.path.join(path, "finalizing")):
+                raise _finalizing(session_id)
+            if not os.path.exists(os.path.join(path, "session.json")):
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Upload session not found: {session_id}")
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd
+
+    fd = await asyncio.to_thread(open_locked)
+
+    def flush(data: bytes, at: int):
+        digest.update(data)
+        while data:
+            n = os.pwrite(fd, data, at)
+            data = data[n:]
+            at += n
+
+    try:
+        async for data in request.stream():
+            if written + buffered + len(data) > limit:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"The chunk goes past the end of the file or exceeds {facility_adapter.UPLOAD_CHUNK_SIZE_LIMIT} bytes.",
+                )
+            buffer.append(data)
+            buffered += len(data)
+            if buffered >= WRITE_BUFFER_BYTES:
+                await asyncio.to_thread(flush, b"".join(buffer), offset + written)
+                written += buffered
+                buffer, buffered = [], 0
+        if buffered:
+            await asyncio.to_thread(flush, b"".join(buffer), offset + written)
+            written += buffered
+
+        if checksum is not None and checksum.lower() != digest.hexdigest():
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Chunk checksum mismatch: the chunk at offset {offset} has SHA-256 {digest.hexdigest()}, send it again.",
+            )
+
+        def mark():
+            if written:
+                open(os.path.join(path, "chunks", f"{offset}-{offset + written}"), "xb").close()
+            # receiving a chunk extends the session
+            os.utime(os.path.join(path, "session.json"))
+            meta_mtime = os.stat(os.path.join(path, "session.json")).st_mtime
+            return _session(meta, meta_mtime)
+
+        try:
+            return await asyncio.to_thread(mark)
+        except FileExistsError:
+            # the same chunk was sent twice
+            pass
+    finally:
+        # releases the lock
+        os.close(fd)
+    return await get(user, resource_id, session_id)
+
+
+def _finalizing(session_id: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Upload session {session_id} is being finalized.")
+
+
+def _finalize(meta: dict, checksum: str | None) -> models.StagedFile:
+    path = _session_dir(meta["id"])
+    checksum = checksum.lower() if checksum else None
+    expected = meta["checksum"] or checksum
+    if expected is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="The SHA-256 checksum of the whole file is required to finalize an upload, since chunks may have been overwritten.",
+        )
+    if checksum is not None and checksum != expected:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"The checksum differs from the one given when the upload was started ({expected}).",
+        )
+    # claim the session: concurrent calls get a 409, and a call after it was finalized a 404
+    marker = os.path.join(path, "finalizing")
+    try:
+        os.close(os.open(marker, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600))
+    except FileExistsError as exc:
+        raise _finalizing(meta["id"]) from exc
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Upload session not found: {meta['id']}") from exc
+
+    data_path = os.path.join(path, "data")
+    try:
+        with open(data_path, "rb") as f:
+            # wait for the chunks being written (new ones see the marker): they are all marked and none can start
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            session = _session(meta, os.stat(os.path.join(path, "session.json")).st_mtime)
+            if not session.complete:
+                missing = 0
+                for received in session.received:
+                    if received.start > missing:
+                        break
+                    missing = received.end
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"The upload is incomplete: the data from offset {missing} is missing.")
+            digest = hashlib.sha256()
+            while block := f.read(WRITE_BUFFER_BYTES):
+                digest.update(block)
+            os.fsync(f.fileno())
+        if expected != digest.hexdigest():
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Checksum mismatch: the uploaded file has SHA-256 {digest.hexdigest()}. Resend the chunks or delete the upload.",
+            )
+    except BaseException:
+        # the session can be completed and finalized again
+        os.unlink(marker)
+        raise
+
+    staged = models.StagedFile(id=uuid.uuid4().hex, filename=os.path.basename(meta["path"]), size=meta["size"], checksum=digest.hexdigest())
+    os.rename(data_path, staging.staged_path(staged))
+    shutil.rmtree(path, ignore_errors=True)
+    return staged
+
+
+async def finalize(user: User, resource_id: str, session_id: str, checksum: str | None = None) -> tuple[dict, models.StagedFile]:
+    """Verify a complete upload and move it to the staging area. Returns the session parameters and the staged file."""
+    meta, _ = await asyncio.to_thread(_load, session_id, user, resource_id)
+    return meta, await asyncio.to_thread(_finalize, meta, checksum)
+
+
+async def delete(user: User, resource_id: str, session_id: str):
+    """Abort an upload and remove its data."""
+    await asyncio.to_thread(_load, session_id, user, resource_id)
+    await asyncio.to_thread(shutil.rmtree, _session_dir(session_id), True)
@@ -0,0 +1,422 @@
+"""
+Response rendering helpers.
+These serialize adapter output straight to JSON bytes with a cached pydantic TypeAdapter,
+instead of revalidating it against the response model and running it through jsonable_encoder.
+Objects that opt into fragment caching (see IRIBaseModel._json_cache) are serialized once per version
+and list responses are assembled from the cached fragments.
+List endpoints can also stream their items from an async iterator, as a JSON array or as NDJSON,
+and limit their items to a sparse fieldset (the `fields` query parameter).
+Clients can ask for MessagePack or CBOR instead of JSON (if the optional `msgpack` and `cbor2` packages are installed).
+"""
+import contextvars
+import functools
+import types
+import typing
+from collections.abc import AsyncIterator, Iterable
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import PydanticSerializationError
+
+from .. import config
+from ..apilogger import get_stream_logger
+from ..types.fragments import FragmentCache
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # pragma: no cover - optional dependency
+    cbor2 = None
+
+JSON_MEDIA_TYPE = "application/json"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+CBOR_MEDIA_TYPE = "application/cbor"
+
+# binary media type: encoder of JSON-compatible python data
+BINARY_ENCODERS = {}
+if msgpack is not None:
+    BINARY_ENCODERS[MSGPACK_MEDIA_TYPE] = msgpack.packb
+if cbor2 is not None:
+    BINARY_ENCODERS[CBOR_MEDIA_TYPE] = cbor2.dumps
+
+# other names clients use for the binary media types
+_BINARY_ALIASES = {"application/x-msgpack": MSGPACK_MEDIA_TYPE, "application/vnd.msgpack": MSGPACK_MEDIA_TYPE}
+
+# the binary media type negotiated for the current request, if any (set by IriRoute)
+BINARY_MEDIA_TYPE: contextvars.ContextVar[str | None] = contextvars.ContextVar("BINARY_MEDIA_TYPE", default=None)
+
+logger = get_stream_logger(__name__)
+
+# streamed items are buffered up to this size before being sent (the first item is always sent right away)
+STREAM_CHUNK_BYTES = 64 * 1024
+
+FIELDS_DESCRIPTION = (
+    "Only return these fields of each item, comma-separated or repeated (e.g. `fields=id,name`). "
+    "Use dots for the fields of nested objects (e.g. `status.state`)."
+)
+
+# extra OpenAPI responses of list endpoints that can stream NDJSON
+NDJSON_RESPONSES = {
+    200: {
+        "content": {
+            NDJSON_MEDIA_TYPE: {
+                "schema": {
+                    "type": "string",
+                    "description": "One JSON object per line. If the response fails after it started, its last line is an object with a single `error` member (a problem).",
+                }
+            }
+        }
+    }
+}
+
+FRAGMENTS = FragmentCache(config.JSON_FRAGMENT_CACHE_BYTES) if config.JSON_FRAGMENT_CACHE_BYTES > 0 else None
+
+
+@functools.lru_cache(maxsize=None)
+def type_adapter(response_type) -> TypeAdapter:
+    """Return the (cached) TypeAdapter for a response type. Building one compiles its serializer, so it's done once per type."""
+    return TypeAdapter(response_type)
+
+
+def _cacheable(response_type) -> bool:
+    return isinstance(response_type, type) and issubclass(response_type, BaseModel) and getattr(response_type, "_json_cache", False)
+
+
+def _fragment(item, item_type, options: dict) -> bytes:
+    """Return the JSON of one object, from the fragment cache when the object is versioned."""
+    def encode():
+        return type_adapter(item_type).dump_json(item, by_alias=True, warnings="error", **options)
+
+    if not isinstance(item, item_type) or not type(item)._json_cache:
+        return encode()
+    version = getattr(item, "last_modified", None)
+    if version is None:
+        return encode()
+    key = (item_type, type(item), item.id, options["exclude_none"], options["exclude_defaults"])
+    return FRAGMENTS.get(key, version, encode)
+
+
+def dump_json(
+    content,
+    response_type,
+    *,
+    exclude_none: bool = False,
+    exclude_unset: bool = False,
+    exclude_defaults: bool = False,
+    include=None,
+    exclude=None,
+) -> bytes:
+    """
+    Serialize content to JSON bytes as the given response type, with the same options FastAPI uses for response models.
+    Raises PydanticSerializationError if the content doesn't match the response type.
+    """
+    if typing.get_origin(response_type) is list and not isinstance(content, (list, tuple, BaseModel, dict, str, bytes)) and isinstance(content, Iterable):
+        content = list(content)
+
+    # exclude_unset depends on how each instance was built, not only on its version, so it bypasses the cache
+    if FRAGMENTS is not None and include is None and exclude is None and not exclude_unset:
+        options = {"exclude_none": exclude_none, "exclude_defaults": exclude_defaults}
+        if typing.get_origin(response_type) is list and isinstance(content, (list, tuple)):
+            item_type = typing.get_args(response_type)[0]
+            if _cacheable(item_type):
+                return b"[" + b",".join(_fragment(item, item_type, options) for item in content) + b"]"
+        elif _cacheable(response_type):
+            return _fragment(content, response_type, options)
+
+    return type_adapter(response_type).dump_json(
+        content,
+        by_alias=True,
+        exclude_none=exclude_none,
+        exclude_unset=exclude_unset,
+        exclude_defaults=exclude_defaults,
+        include=include,
+        exclude=exclude,
+        warnings="error",
+    )
+
+
+def render_json(content, response_type, *, status_code: int = 200, **options) -> Response | None:
+    """
+    Render trusted adapter output as a JSON response without revalidating it.
+    Returns None if the content doesn't match the response type, so the caller can fall back to FastAPI's regular (validating) path.
+    """
+    try:
+        body = dump_json(content, response_type, **options)
+    except PydanticSerializationError:
+        return None
+    return Response(content=body, status_code=status_code, media_type=JSON_MEDIA_TYPE)
+
+
+class Fieldset:
+    """The content of a response, limited to a sparse fieldset (see parse_fields)."""
+
+    __slots__ = ("content", "include")
+
+    def __init__(self, content, include: dict):
+        self.content = content
+        self.include = include
+
+
+def with_fields(content, include: dict | None):
+    """Return the content limited to the fieldset, or as is without one (or if it's an ItemStream, which carries its own)."""
+    return content if include is None or isinstance(content, ItemStream) else Fieldset(content, include)
+
+
+@functools.lru_cache(maxsize=None)
+def _output_fields(model: type[BaseModel]) -> dict[str, tuple[str, typing.Any]]:
+    # serialized name -> (field name, type) of every field the model outputs, computed fields included
+    fields = {}
+    for name, info in model.model_fields.items():
+        if not info.exclude:
+            fields[info.serialization_alias or info.alias or name] = (name, info.annotation)
+    for name, info in model.model_computed_fields.items():
+        fields[info.alias or name] = (name, info.return_type)
+    return fields
+
+
+def _nested_model(annotation) -> tuple[type[BaseModel] | None, bool]:
+    # the model held by a field (directly, optionally or in a list), and whether it's a list
+    is_list = False
+    while True:
+        origin = typing.get_origin(annotation)
+        if origin in (typing.Union, types.UnionType):
+            args = [a for a in typing.get_args(annotation) if a is not type(None)]
+            if len(args) != 1:
+                return None, False
+            annotation = args[0]
+        elif origin is list:
+            annotation = typing.get_args(annotation)[0]
+            is_list = True
+        else:
+            break
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, is_list
+    return None, False
+
+
+def _unknown_field(path: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=[{"type": "unknown_field", "loc": ["query", "fields"], "msg": f"Unknown field: {path}"}])
+
+
+def _add_field(include: dict, model: type[BaseModel], parts: list[str], path: str):
+    fields = _output_fields(model)
+    if parts[0] not in fields:
+        raise _unknown_field(path)
+    name, annotation = fields[parts[0]]
+    if len(parts) == 1:
+        include[name] = True
+        return
+    nested, is_list = _nested_model(annotation)
+    if nested is None:
+        raise _unknown_field(path)
+    if include.get(name) is True:
+        return  # the whole object is already selected
+    node = include.setdefault(name, {"__all__": {}} if is_list else {})
+    _add_field(node["__all__"] if is_list else node, nested, parts[1:], path)
+
+
+def parse_fields(fields: list[str] | None, item_type: type[BaseModel]) -> dict | None:
+    """
+    Parse the `fields` query parameter into a pydantic `include` filter for one item, or None without fields.
+    Raises a 422 HTTPException for fields the item type doesn't output.
+    Fields that aren't included are skipped by the serializer: computed fields among them are never computed.
+    """
+    if not fields:
+        return None
+    include = {}
+    for value in fields:
+        for path in value.split(","):
+            path = path.strip()
+            if path:
+                _add_field(include, item_type, path.split("."), path)
+    return include or None
+
+
+def render_fieldset(content: Fieldset, response_type, *, status_code: int = 200, **options) -> Response:
+    """Render the content limited to its fieldset as a JSON response."""
+    include = {"__all__": content.include} if typing.get_origin(response_type) is list else content.include
+    response = render_json(content.content, response_type, status_code=status_code, include=include, **options)
+    if response is None:
+        # not an instance of the response type (e.g. dicts): validate it like FastAPI's regular path would
+        validated = type_adapter(response_type).validate_python(content.content, from_attributes=True)
+        response = render_json(validated, response_type, status_code=status_code, include=include, **options)
+    return response
+
+
+def negotiate_binary(accept: str) -> str | None:
+    """
+    Return the binary media type to respond with, if the client prefers one (by q-value) over JSON.
+    A binary type listed with the same q-value as JSON is preferred, since the client named it explicitly.
+    """
+    if not BINARY_ENCODERS or "/" not in accept:
+        return None
+    accepted = {}
+    for part in accept.split(","):
+        media_type, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        media_type = media_type.strip().lower()
+        accepted[_BINARY_ALIASES.get(media_type, media_type)] = q
+    binary = [(accepted[media_type], media_type) for media_type in BINARY_ENCODERS if media_type in accepted]
+    if not binary:
+        return None
+    q, media_type = max(binary)
+    q_json = max(accepted.get(JSON_MEDIA_TYPE, 0.0), accepted.get("application/*", 0.0), accepted.get("*/*", 0.0))
+    return media_type if q > 0 and q >= q_json else None
+
+
+def encode_binary(data, media_type: str) -> bytes:
+    """Encode JSON-compatible python data with the encoder of a binary media type."""
+    return BINARY_ENCODERS[media_type](data)
+
+
+def render_binary(content, response_type, media_type: str, *, status_code: int = 200, **options) -> Response:
+    """
+    Render content as a binary (MessagePack/CBOR) response, through the same model serialization as the JSON path
+    (JSON-mode values, aliases and the route's exclude/include options), so both carry the same data.
+    """
+    adapter = type_adapter(response_type)
+    try:
+        data = adapter.dump_python(content, mode="json", by_alias=True, warnings="error", **options)
+    except PydanticSerializationError:
+        # not an instance of the response type (e.g. dicts): validate it like FastAPI's regular path would
+        data = adapter.dump_python(adapter.validate_python(content, from_attributes=True), mode="json", by_alias=True, **options)
+    return Response(content=encode_binary(data, media_type), status_code=status_code, media_type=media_type)
+
+
+def add_binary_media_types(openapi_schema: dict) -> dict:
+    """Document the binary media types next to the JSON (and problem+json) content of every response."""
+    for path in openapi_schema.get("paths", {}).values():
+        for operation in path.values():
+            for response in operation.get("responses", {}).values() if isinstance(operation, dict) else []:
+                content = response.get("content", {})
+                json_content = content.get(JSON_MEDIA_TYPE) or content.get("application/problem+json")
+                if json_content is not None:
+                    for media_type in BINARY_ENCODERS:
+                        content.setdefault(media_type, json_content)
+    return openapi_schema
+
+
+class ItemStream:
+    """
+    The items of a list response, produced by an async iterator and sent as soon as they are encoded.
+    `first` is the first item, when it was already fetched from the iterator (see `stream`).
+    """
+
+    __slots__ = ("items", "ndjson", "include", "first")
+
+    def __init__(self, items: AsyncIterator, ndjson: bool, include: dict | None = None, first=None):
+        self.items = items
+        self.ndjson = ndjson
+        self.include = include
+        self.first = _EMPTY if first is None else first
+
+    async def collect(self) -> list:
+        """Return all the items, for responses that can't be streamed."""
+        items = [] if self.first is _EMPTY else [self.first]
+        items += [item async for item in self.items]
+        return items
+
+
+def accepts_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def wants_stream(request: Request) -> bool:
+    """Whether a list endpoint should stream its items: the client asked for NDJSON, or STREAM_JSON_RESPONSES is enabled."""
+    return config.STREAM_JSON_RESPONSES or accepts_ndjson(request)
+
+
+_EMPTY = object()
+
+
+async def first_item(items: AsyncIterator):
+    """Return the first item of an async iterator, or None if it's empty."""
+    try:
+        return await anext(items)
+    except StopAsyncIteration:
+        return None
+
+
+async def stream(request: Request, items, allow_empty: bool = False, include: dict | None = None) -> ItemStream | None:
+    """
+    Return an ItemStream over an adapter's async iterator, optionally limited to a fieldset (see parse_fields).
+    The first item is fetched right away so that errors and empty results can still be reported with a status code:
+    without items, None is returned, unless allow_empty is set.
+    """
+    iterator = aiter(items)
+    first = await first_item(iterator)
+    if first is None and not allow_empty:
+        return None
+    return ItemStream(iterator, accepts_ndjson(request), include, first=first)
+
+
+def _encode_item(item, item_type, options: dict) -> bytes:
+    try:
+        return dump_json(item, item_type, **options)
+    except PydanticSerializationError:
+        # not an instance of the response type (e.g. a dict): validate it like FastAPI's regular path would
+        return dump_json(type_adapter(item_type).validate_python(item, from_attributes=True), item_type, **options)
+
+
+def _error_line() -> bytes:
+    return b'{"error":{"type":"about:blank","status":500,"title":"Internal Server Error","detail":"The response was interrupted by an error"}}\n'
+
+
+def stream_response(content: ItemStream, response_type, *, status_code: int = 200, **options) -> StreamingResponse:
+    """
+    Stream the items as a JSON array (or NDJSON), encoding each one with the options of dump_json.
+    The first item is encoded before the response starts, so that its errors still get a status code. Once the response
+    has started, an error ends NDJSON with an error line (see NDJSON_RESPONSES); a JSON array can't be completed, so
+    the connection is aborted instead of ending the truncated body like a complete one.
+    """
+    item_type = typing.get_args(response_type)[0] if typing.get_origin(response_type) is list else response_type
+    ndjson = content.ndjson
+    options["include"] = content.include
+    buffer = bytearray() if ndjson else bytearray(b"[")
+    if content.first is not _EMPTY:
+        buffer += _encode_item(content.first, item_type, options)
+        if ndjson:
+            buffer += b"\n"
+
+    async def body():
+        nonlocal buffer
+        first = content.first is _EMPTY
+        if not first:
+            yield bytes(buffer)
+            buffer.clear()
+        try:
+            async for item in content.items:
+                if not ndjson and not first:
+                    buffer += b","
+                buffer += _encode_item(item, item_type, options)
+                if ndjson:
+                    buffer += b"\n"
+                if first or len(buffer) >= STREAM_CHUNK_BYTES:
+                    yield bytes(buffer)
+                    buffer.clear()
+                first = False
+        except Exception:
+            if not ndjson:
+                raise
+            logger.exception("Streamed response interrupted")
+            yield bytes(buffer) + _error_line()
+            return
+        if not ndjson:
+            buffer += b"]"
+        if buffer:
+            yield bytes(buffer)
+
+    return StreamingResponse(body(), status_code=status_code, media_type=NDJSON_MEDIA_TYPE if ndjson else JSON_MEDIA_TYPE)
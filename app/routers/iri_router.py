@@ -1,13 +1,19 @@
 from abc import ABC, abstractmethod
+import functools
+import inspect
+import typing
 import os
 import logging
 import importlib
 import time
-import globus_sdk
 from fastapi import Request, Depends, HTTPException, APIRouter
+from fastapi.responses import Response
+from fastapi.routing import APIRoute
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
+from .. import config
 from ..types.user import User
+from . import iri_response
 
 bearer_scheme = HTTPBearer()
 
@@ -30,8 +36,109 @@ def get_client_ip(request: Request) -> str | None:
         return ip_addr
 
 
+class IriRoute(APIRoute):
+    """
+    Route that can stream list responses and skip response model revalidation for trusted adapter output.
+    Endpoints that return an `iri_response.ItemStream` have its items encoded and sent as they are produced,
+    and endpoints that return an `iri_response.Fieldset` have their content limited to the requested fields.
+    When FAST_JSON_RESPONSES is enabled, the endpoint's result is dumped once, straight to JSON bytes,
+    honoring the route's response_model_exclude_*/include settings, so the wire format stays the same.
+    Results that don't match the response model fall back to FastAPI's regular validating path.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if inspect.iscoroutinefunction(endpoint):
+            endpoint = self._rendering_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        if not iri_response.BINARY_ENCODERS:
+            return handler
+
+        async def negotiating_handler(request: Request) -> Response:
+            # the endpoint runs in this context, so the rendering wrapper sees the negotiated media type
+            token = iri_response.BINARY_MEDIA_TYPE.set(iri_response.negotiate_binary(request.headers.get("accept", "")))
+            try:
+                response = await handler(request)
+            finally:
+                iri_response.BINARY_MEDIA_TYPE.reset(token)
+            if "vary" not in response.headers:
+                response.headers["Vary"] = "Accept"
+            elif "accept" not in [v.strip().lower() for v in response.headers["vary"].split(",")]:
+                response.headers["Vary"] = f"{response.headers['vary']}, Accept"
+            return response
+
+        return negotiating_handler
+
+    def _rendering_endpoint(self, endpoint):
+        # functools.wraps keeps the signature and annotations visible to FastAPI's dependency analysis
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            content = await endpoint(*args, **kwargs)
+            binary_media_type = iri_response.BINARY_MEDIA_TYPE.get()
+            if binary_media_type and self.response_model is not None and not isinstance(content, Response):
+                return await self._render_binary(content, binary_media_type)
+            if isinstance(content, iri_response.ItemStream):
+                return iri_response.stream_response(
+                    content,
+                    self.response_model,
+                    status_code=self.status_code or 200,
+                    exclude_none=self.response_model_exclude_none,
+                    exclude_unset=self.response_model_exclude_unset,
+                    exclude_defaults=self.response_model_exclude_defaults,
+                )
+            if isinstance(content, iri_response.Fieldset):
+                return iri_response.render_fieldset(
+                    content,
+                    self.response_model,
+                    status_code=self.status_code or 200,
+                    exclude_none=self.response_model_exclude_none,
+                    exclude_unset=self.response_model_exclude_unset,
+                    exclude_defaults=self.response_model_exclude_defaults,
+                )
+            if not config.FAST_JSON_RESPONSES or isinstance(content, Response) or self.response_model is None:
+                return content
+            response = iri_response.render_json(
+                content,
+                self.response_model,
+                status_code=self.status_code or 200,
+                exclude_none=self.response_model_exclude_none,
+                exclude_unset=self.response_model_exclude_unset,
+                exclude_defaults=self.response_model_exclude_defaults,
+                include=self.response_model_include,
+                exclude=self.response_model_exclude,
+            )
+            return response if response is not None else content
+
+        return wrapper
+
+    async def _render_binary(self, content, media_type: str) -> Response:
+        include = self.response_model_include
+        if isinstance(content, iri_response.ItemStream):
+            include = content.include
+            content = await content.collect()
+        elif isinstance(content, iri_response.Fieldset):
+            include = content.include
+            content = content.content
+        if include is not None and include is not self.response_model_include and typing.get_origin(self.response_model) is list:
+            include = {"__all__": include}
+        return iri_response.render_binary(
+            content,
+            self.response_model,
+            media_type,
+            status_code=self.status_code or 200,
+            exclude_none=self.response_model_exclude_none,
+            exclude_unset=self.response_model_exclude_unset,
+            exclude_defaults=self.response_model_exclude_defaults,
+            include=include,
+            exclude=self.response_model_exclude,
+        )
+
+
 class IriRouter(APIRouter):
     def __init__(self, router_adapter=None, task_router_adapter=None, **kwargs):
+        kwargs.setdefault("route_class", IriRoute)
         super().__init__(**kwargs)
         router_name = self.get_router_name()
         self.adapter = IriRouter.create_adapter(router_name, router_adapter)
@@ -82,6 +189,9 @@ class IriRouter(APIRouter):
 
     async def get_globus_info(self, api_key: str) -> dict:
         """Returns the linked identities and the session info objects"""
+        # globus_sdk is only needed (and imported) once a token is introspected
+        import globus_sdk
+
         # Introspect the IRI API token using resource server credentials
         globus_client = globus_sdk.ConfidentialAppAuthClient(GLOBUS_RS_ID, GLOBUS_RS_SECRET)
         # grab identity_set_detail for linked identities and session_info to see how the user logged in
@@ -1,5 +1,6 @@
 import datetime
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
 
 from ...types.models import Capability
 from . import models as status_models
@@ -53,6 +54,14 @@ class FacilityAdapter(ABC):
     async def get_event(self: "FacilityAdapter", id_: str) -> status_models.Event:
         pass
 
+    async def iter_events(self: "FacilityAdapter", **kwargs) -> AsyncIterator[status_models.Event]:
+        """
+        Yield the events that `get_events` would return (it takes the same arguments), for streamed responses.
+        Override it to produce events incrementally (e.g. from a database cursor) instead of building the whole list.
+        """
+        for event in await self.get_events(**kwargs):
+            yield event
+
     @abstractmethod
     async def get_incidents(
         self: "FacilityAdapter",
@@ -74,3 +83,17 @@ class FacilityAdapter(ABC):
     @abstractmethod
     async def get_incident(self: "FacilityAdapter", id_: str) -> status_models.Incident:
         pass
+
+    async def iter_incidents(self: "FacilityAdapter", **kwargs) -> AsyncIterator[status_models.Incident]:
+        """Yield the incidents that `get_incidents` would return (it takes the same arguments), for streamed responses."""
+        for incident in await self.get_incidents(**kwargs):
+            yield incident
+
+    async def get_changes(self: "FacilityAdapter", since: str | None, limit: int) -> status_models.ChangeFeed:
+        """
+        Return the resources, events and incidents that were created, updated or deleted after the `since` watermark.
+        Without a watermark, return a snapshot of all objects and the watermark to continue from.
+        Raise `app.types.changelog.WatermarkError` if the watermark can't be honored (the client then has to resync).
+        This method is optional; adapters that don't keep a change log (see `app.types.changelog.ChangeLog`) can leave it unimplemented.
+        """
+        raise NotImplementedError
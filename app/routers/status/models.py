@@ -4,8 +4,8 @@ import enum
 
 from pydantic import Field, computed_field, field_validator
 
-from ... import config
-from ...types.base import NamedObject
+from ...types import links
+from ...types.base import IRIBaseModel, NamedObject
 
 
 class Status(enum.Enum):
@@ -29,9 +29,7 @@ class ResourceType(enum.Enum):
 
 class Resource(NamedObject):
     """Represents a resource in the system."""
-    def _self_path(self) -> str:
-        """Return the API path for this resource."""
-        return f"/status/resources/{self.id}"
+    _self_link = links.STATUS_RESOURCE
 
     site_id: str = Field(..., description="The site identifier this resource is located at", exclude=True, example="site-1")
     capability_ids: list[str] = Field(default_factory=list, exclude=True)
@@ -43,13 +41,13 @@ class Resource(NamedObject):
     @property
     def site_uri(self) -> str:
         """Return the site URI for this resource."""
-        return f"{config.API_URL_ROOT}{config.API_PREFIX}{config.API_URL}/facility/sites/{self.site_id}"
+        return links.FACILITY_SITE(self.site_id)
 
     @computed_field(description="The list of capabilities in this resource")
     @property
     def capability_uris(self) -> list[str]:
         """Return the list of capability URIs for this resource."""
-        return [f"{config.API_URL_ROOT}{config.API_PREFIX}{config.API_URL}/account/capabilities/{e}" for e in self.capability_ids]
+        return links.ACCOUNT_CAPABILITY.many(self.capability_ids)
 
     @classmethod
     def find(cls, items, name=None, description=None, modified_since=None, group=None, resource_type=None, current_status=None, capability=None, site_id=None) -> list:
@@ -71,9 +69,7 @@ class Resource(NamedObject):
 
 class Event(NamedObject):
     """Represents an event that occurred to a resource, which may be part of an incident."""
-    def _self_path(self) -> str:
-        """Return the API path for this event."""
-        return f"/status/events/{self.id}"
+    _self_link = links.STATUS_EVENT
 
     @field_validator("occurred_at", mode="before")
     @classmethod
@@ -89,13 +85,13 @@ class Event(NamedObject):
     @property
     def resource_uri(self) -> str:
         """Return the resource URI for this event."""
-        return f"{config.API_URL_ROOT}{config.API_PREFIX}{config.API_URL}/status/resources/{self.resource_id}"
+        return links.STATUS_RESOURCE(self.resource_id)
 
     @computed_field(description="The event's incident")
     @property
     def incident_uri(self) -> str | None:
         """Return the incident URI for this event."""
-        return f"{config.API_URL_ROOT}{config.API_PREFIX}{config.API_URL}/status/incidents/{self.incident_id}" if self.incident_id else None
+        return links.STATUS_INCIDENT(self.incident_id) if self.incident_id else None
 
     @classmethod
     def find(cls, items, incident_id=None, name=None, description=None, modified_since=None, resource_id=None, status=None, from_=None, to=None, time_=None) -> list:
@@ -141,9 +137,7 @@ class Resolution(enum.Enum):
 
 class Incident(NamedObject):
     """Represents an incident that may impact one or more resources."""
-    def _self_path(self) -> str:
-        """Return the API path for this incident."""
-        return f"/status/incidents/{self.id}"
+    _self_link = links.STATUS_INCIDENT
 
     @field_validator("start", "end", mode="before")
     @classmethod
@@ -162,13 +156,13 @@ class Incident(NamedObject):
     @property
     def event_uris(self) -> list[str]:
         """Return the list of event URIs for this incident."""
-        return [f"{config.API_URL_ROOT}{config.API_PREFIX}{config.API_URL}/status/events/{e}" for e in self.event_ids]
+        return links.STATUS_EVENT.many(self.event_ids)
 
     @computed_field(description="The list of resources that may be impacted by this incident")
     @property
     def resource_uris(self) -> list[str]:
         """Return the list of resource URIs for this incident."""
-        return [f"{config.API_URL_ROOT}{config.API_PREFIX}{config.API_URL}/status/resources/{r}" for r in self.resource_ids]
+        return links.STATUS_RESOURCE.many(self.resource_ids)
 
     @classmethod
     def find(cls, items, name=None, description=None, modified_since=None, status=None, type_=None, from_=None, to=None, time_=None, resource_id=None, resolution=None) -> list:
@@ -195,3 +189,32 @@ class Incident(NamedObject):
         if time_:
             items = [e for e in items if e.start <= time_ and (e.end is None or e.end > time_)]
         return items
+
+
+class ChangeKind(enum.Enum):
+    """The type of object a change refers to."""
+    resource = "resource"
+    event = "event"
+    incident = "incident"
+
+
+class ChangeType(enum.Enum):
+    """The kind of change that happened to an object."""
+    created = "created"
+    updated = "updated"
+    deleted = "deleted"
+
+
+class Change(IRIBaseModel):
+    """A single entry of the status change feed."""
+    kind: ChangeKind = Field(..., description="Type of the changed object", example="event")
+    id: str = Field(..., description="Identifier of the changed object", example="evt-1")
+    change_type: ChangeType = Field(..., description="Whether the object was created, updated or deleted", example="updated")
+    item: Resource | Event | Incident | None = Field(default=None, description="Current representation of the object. Omitted for deleted objects (tombstones).")
+
+
+class ChangeFeed(IRIBaseModel):
+    """A page of the status change feed."""
+    changes: list[Change] = Field(default_factory=list, description="Changes after the requested watermark, oldest first")
+    watermark: str = Field(..., description="Opaque token to pass as `since` on the next request", example="YjVkMGE0ZTE6MTIz")
+    has_more: bool = Field(default=False, description="Whether more changes are available right away with the returned watermark", example=False)
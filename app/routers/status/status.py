@@ -2,10 +2,11 @@ from typing import List
 
 from fastapi import Depends, HTTPException, Query, Request
 
+from ...types.changelog import WatermarkError
 from ...types.http import forbidExtraQueryParams
 from ...types.scalars import AllocationUnit, StrictDateTime
-from .. import iri_router
-from ..error_handlers import DEFAULT_RESPONSES
+from .. import iri_response, iri_router
+from ..error_handlers import DEFAULT_RESPONSES, Problem
 from ..iri_meta import iri_meta_dict
 from . import facility_adapter, models
 
@@ -36,11 +37,18 @@ async def get_resources(
     resource_type: models.ResourceType = Query(default=None),
     current_status: models.Status = Query(default=None),
     capability: List[AllocationUnit] = Query(default=None, min_length=1),
-    _forbid=Depends(forbidExtraQueryParams("name", "description", "group", "offset", "limit", "modified_since", "resource_type", "current_status", "capability", multiParams={"capability"})),
+    fields: List[str] = Query(default=None, description=iri_response.FIELDS_DESCRIPTION),
+    _forbid=Depends(
+        forbidExtraQueryParams(
+            "name", "description", "group", "offset", "limit", "modified_since", "resource_type", "current_status", "capability", "fields", multiParams={"capability", "fields"}
+        )
+    ),
 ) -> list[models.Resource]:
-    return await router.adapter.get_resources(
+    include = iri_response.parse_fields(fields, models.Resource)
+    resources = await router.adapter.get_resources(
         offset=offset, limit=limit, name=name, description=description, group=group, modified_since=modified_since, resource_type=resource_type, current_status=current_status, capability=capability
     )
+    return iri_response.with_fields(resources, include)
 
 
 @router.get(
@@ -64,8 +72,11 @@ async def get_resource(
 @router.get(
     "/incidents",
     summary="Get all incidents without their events",
-    description="Get a list of all incidents. Each incident will be returned without its events.  You can optionally filter the returned list by specifying attributes.",
-    responses=DEFAULT_RESPONSES,
+    description=(
+        "Get a list of all incidents. Each incident will be returned without its events.  You can optionally filter the returned list by specifying attributes. "
+        "Send `Accept: application/x-ndjson` to stream the incidents, one per line."
+    ),
+    responses={**DEFAULT_RESPONSES, **iri_response.NDJSON_RESPONSES},
     operation_id="getIncidents",
     openapi_extra=iri_meta_dict("production", "required")
 )
@@ -83,6 +94,7 @@ async def get_incidents(
     offset: int = Query(default=0, ge=0),
     limit: int = Query(default=100, ge=0, le=1000),
     resolution: models.Resolution = Query(default=None),
+    fields: List[str] = Query(default=None, description=iri_response.FIELDS_DESCRIPTION),
     _forbid=Depends(
         forbidExtraQueryParams(
             "name",
@@ -99,11 +111,13 @@ async def get_incidents(
             "resolution",
             "resource_uris",
             "event_uris",
-            multiParams={"resource_uris", "event_uris"},
+            "fields",
+            multiParams={"resource_uris", "event_uris", "fields"},
         )
     ),
 ) -> list[models.Incident]:
-    incidents = await router.adapter.get_incidents(
+    include = iri_response.parse_fields(fields, models.Incident)
+    filters = dict(
         offset=offset,
         limit=limit,
         name=name,
@@ -117,9 +131,13 @@ async def get_incidents(
         resource_id=resource_id,
         resolution=resolution,
     )
+    if iri_response.wants_stream(request):
+        incidents = await iri_response.stream(request, router.adapter.iter_incidents(**filters), include=include)
+    else:
+        incidents = await router.adapter.get_incidents(**filters)
     if not incidents:
         raise HTTPException(status_code=404, detail="No incidents found")
-    return incidents
+    return iri_response.with_fields(incidents, include)
 
 @router.get(
     "/incidents/{incident_id}",
@@ -139,8 +157,8 @@ async def get_incident(request: Request, incident_id: str) -> models.Incident:
 @router.get(
     "/events",
     summary="Get all events",
-    description="Get a list of all events.  You can optionally filter the returned list by specifying attribtes.",
-    responses=DEFAULT_RESPONSES,
+    description="Get a list of all events.  You can optionally filter the returned list by specifying attribtes. Send `Accept: application/x-ndjson` to stream the events, one per line.",
+    responses={**DEFAULT_RESPONSES, **iri_response.NDJSON_RESPONSES},
     operation_id="getEventsByIncident",
     openapi_extra=iri_meta_dict("production", "required")
 )
@@ -157,14 +175,20 @@ async def get_events(
     modified_since: StrictDateTime = Query(default=None),
     offset: int = Query(default=0, ge=0),
     limit: int = Query(default=100, ge=0, le=1000),
-    _forbid=Depends(forbidExtraQueryParams("incident_id", "resource_id", "name", "description", "status", "from", "to", "time", "modified_since", "offset", "limit")),
+    fields: List[str] = Query(default=None, description=iri_response.FIELDS_DESCRIPTION),
+    _forbid=Depends(forbidExtraQueryParams("incident_id", "resource_id", "name", "description", "status", "from", "to", "time", "modified_since", "offset", "limit", "fields", multiParams={"fields"})),
 ) -> list[models.Event]:
-    events = await router.adapter.get_events(
+    include = iri_response.parse_fields(fields, models.Event)
+    filters = dict(
         incident_id=incident_id, offset=offset, limit=limit, resource_id=resource_id, name=name, description=description, status=status, from_=from_, to=to, time_=time_, modified_since=modified_since
     )
+    if iri_response.wants_stream(request):
+        events = await iri_response.stream(request, router.adapter.iter_events(**filters), include=include)
+    else:
+        events = await router.adapter.get_events(**filters)
     if not events:
         raise HTTPException(status_code=404, detail="No events found")
-    return events
+    return iri_response.with_fields(events, include)
 
 
 @router.get(
@@ -180,3 +204,31 @@ async def get_event(request: Request, event_id: str) -> models.Event:
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     return item
+
+
+@router.get(
+    "/changes",
+    summary="Get the changes since a watermark",
+    description=(
+        "Get the resources, events and incidents that were created, updated or deleted since the given watermark, oldest first. "
+        "Deleted objects are returned as tombstones without an `item`. "
+        "Omit `since` to get a snapshot of all objects. Pass the returned `watermark` as `since` on the next call; "
+        "if `has_more` is true, more changes are available right away. "
+        "A 410 response means the watermark can no longer be honored and the client has to resync without `since`."
+    ),
+    responses={**DEFAULT_RESPONSES, 410: {"description": "Watermark expired, resync required", "model": Problem}},
+    operation_id="getStatusChanges",
+    openapi_extra=iri_meta_dict("development", "optional")
+)
+async def get_changes(
+    request: Request,
+    since: str | None = Query(default=None, min_length=1, description="Watermark returned by a previous call"),
+    limit: int = Query(default=100, ge=1, le=1000),
+    _forbid=Depends(forbidExtraQueryParams("since", "limit")),
+) -> models.ChangeFeed:
+    try:
+        return await router.adapter.get_changes(since=since, limit=limit)
+    except WatermarkError as exc:
+        raise HTTPException(status_code=410, detail=str(exc)) from exc
+    except NotImplementedError as exc:
+        raise HTTPException(status_code=501, detail="The change feed is not supported by this facility") from exc
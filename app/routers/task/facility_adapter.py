@@ -1,15 +1,22 @@
+import asyncio
+import contextvars
+import time
 import traceback
 from abc import abstractmethod
+from collections.abc import AsyncIterator, Callable
 from ...types.user import User
 from . import models as task_models
 from ..status import models as status_models
-from ..filesystem import models as filesystem_models, facility_adapter as filesystem_adapter
+from ..filesystem import models as filesystem_models, facility_adapter as filesystem_adapter, staging
 from ..iri_router import AuthenticatedAdapter, IriRouter
 
 from ...apilogger import get_stream_logger
 
 logger = get_stream_logger(__name__)
 
+# set by the task queue while it executes a task: called by adapters with (bytes_done, bytes_total) to report its progress
+progress_reporter: contextvars.ContextVar[Callable[[int, int | None], None] | None] = contextvars.ContextVar("progress_reporter", default=None)
+
 class FacilityAdapter(AuthenticatedAdapter):
     """
     Facility-specific code is handled by the implementation of this interface.
@@ -25,6 +32,11 @@ class FacilityAdapter(AuthenticatedAdapter):
     async def get_tasks(self: "FacilityAdapter", user: User) -> list[task_models.Task]:
         pass
 
+    async def iter_tasks(self: "FacilityAdapter", user: User) -> AsyncIterator[task_models.Task]:
+        """Yield the tasks that `get_tasks` would return, for streamed responses."""
+        for task in await self.get_tasks(user=user):
+            yield task
+
     @abstractmethod
     async def put_task(self: "FacilityAdapter", user: User, resource: status_models.Resource | None, task: task_models.TaskCommand) -> task_models.TaskSubmitResponse:
         pass
@@ -33,8 +45,30 @@ class FacilityAdapter(AuthenticatedAdapter):
     async def delete_task(self: "FacilityAdapter", user: User, task_id: str) -> None:
         pass
 
+    async def wait_task(self: "FacilityAdapter", user: User, task_id: str, timeout: float) -> task_models.Task | None:
+        """
+        Wait up to `timeout` seconds for a task to finish and return it, or return None if it's still pending or active.
+        This default polls `get_task`; adapters that can start a task at once, instead of when its turn comes, should override it.
+        """
+        deadline = time.monotonic() + timeout
+        delay = 0.01
+        while True:
+            task = await self.get_task(user=user, task_id=task_id)
+            if task is None or task.status not in (task_models.TaskStatus.pending, task_models.TaskStatus.active):
+                return task
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.1)
+
     @staticmethod
-    async def on_task(resource: status_models.Resource, user: User, task: task_models.TaskCommand) -> tuple[dict, task_models.TaskStatus]:
+    async def on_task(
+        resource: status_models.Resource,
+        user: User,
+        task: task_models.TaskCommand,
+        fs_adapter: filesystem_adapter.FacilityAdapter | None = None,
+    ) -> tuple[dict, task_models.TaskStatus]:
         # Handle a task from the facility message queue.
         # Returns: (result, status)
         def _extractNull(ind):
@@ -47,7 +81,8 @@ class FacilityAdapter(AuthenticatedAdapter):
             r = None
             logger.info(f"Received task: {task.router}:{task.command} with args: {task.args}")
             if task.router == "filesystem":
-                fs_adapter = IriRouter.create_adapter(task.router, filesystem_adapter.FacilityAdapter)
+                if fs_adapter is None:
+                    fs_adapter = IriRouter.create_adapter(task.router, filesystem_adapter.FacilityAdapter)
                 if task.command == "chmod":
                     data = _extractNull(task.args["request_model"])
                     request_model = filesystem_models.PutFileChmodRequest.model_validate(data)
@@ -98,8 +133,19 @@ class FacilityAdapter(AuthenticatedAdapter):
                     r = await fs_adapter.cp(resource, user, request_model)
                 elif task.command == "download":
                     r = await fs_adapter.download(resource, user, **task.args)
+                elif task.command == "batch":
+                    data = _extractNull(task.args["request_model"])
+                    request_model = filesystem_models.PostBatchRequest.model_validate(data)
+                    r = await FacilityAdapter.on_batch(resource, user, request_model, fs_adapter)
                 elif task.command == "upload":
-                    r = await fs_adapter.upload(resource, user, **task.args)
+                    args = dict(task.args)
+                    if args.get("staged") is not None:
+                        args["staged"] = filesystem_models.StagedFile.model_validate(_extractNull(args["staged"]))
+                    try:
+                        r = await fs_adapter.upload(resource, user, **args)
+                    finally:
+                        if args.get("staged") is not None:
+                            staging.discard(args["staged"])
             if r is not None:
                 return (r, task_models.TaskStatus.completed)
             else:
@@ -109,3 +155,32 @@ class FacilityAdapter(AuthenticatedAdapter):
             logger.warning(f"Error handling task {task.router}:{task.command} with args: {task.args}\nError: {exc}")
             logger.debug(f"Traceback:\n{traceback_str}")
             return ({"output": f"Error: {exc}"}, task_models.TaskStatus.failed)
+
+    @staticmethod
+    async def on_batch(
+        resource: status_models.Resource,
+        user: User,
+        request_model: filesystem_models.PostBatchRequest,
+        fs_adapter: filesystem_adapter.FacilityAdapter,
+    ) -> filesystem_models.PostBatchResponse:
+        # Run the operations of a batch like tasks of their own (sharing the filesystem adapter),
+        # at most BATCH_CONCURRENCY at a time. A failed operation doesn't stop the others.
+        semaphore = asyncio.Semaphore(filesystem_adapter.BATCH_CONCURRENCY)
+
+        async def run(operation: filesystem_models.BatchOperation) -> filesystem_models.BatchOperationResult:
+            if operation.command.value in _REQUEST_MODEL_COMMANDS:
+                args = {"request_model": operation.args}
+            else:
+                args = operation.args.model_dump(mode="json")
+            command = task_models.TaskCommand(router="filesystem", command=operation.command.value, args=args)
+            async with semaphore:
+                result, status = await FacilityAdapter.on_task(resource, user, command, fs_adapter=fs_adapter)
+            if hasattr(result, "model_dump"):
+                result = result.model_dump()
+            return filesystem_models.BatchOperationResult(status=status, result=result)
+
+        return filesystem_models.PostBatchResponse(output=await asyncio.gather(*(run(operation) for operation in request_model.operations)))
+
+
+# filesystem commands whose arguments are a request body (passed to on_task as `request_model`)
+_REQUEST_MODEL_COMMANDS = {"chmod", "chown", "mkdir", "symlink", "compress", "extract", "mv", "cp"}
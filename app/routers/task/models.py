@@ -2,27 +2,33 @@
 import enum
 from pydantic import BaseModel, Field, computed_field
 
-from ... import config
+from ...types import links
+
+
+class TaskStatus(str, enum.Enum):
+    """Represents the status of a task."""
+    pending = "pending"
+    active = "active"
+    completed = "completed"
+    failed = "failed"
+    canceled = "canceled"
 
 
 class TaskSubmitResponse(BaseModel):
     """Response model for submitting a task"""
     task_id: str = Field(..., description="Identifier of the submitted task", example="task-123")
 
-    @computed_field(description="The list of past events in this incident")
+    @computed_field(description="URI of this task")
     @property
     def task_uri(self) -> str:
         """Return the URI for this task."""
-        return f"{config.API_URL_ROOT}{config.API_PREFIX}{config.API_URL}/task/{self.task_id}"
+        return links.TASK(self.task_id)
 
 
-class TaskStatus(str, enum.Enum):
-    """Represents the status of a task."""
-    pending = "pending"
-    active = "active"
-    completed = "completed"
-    failed = "failed"
-    canceled = "canceled"
+class TaskFinishedResponse(TaskSubmitResponse):
+    """Response model for submitting a task that finished within the `wait` budget"""
+    status: TaskStatus = Field(..., description="Final status of the task", example="completed")
+    result: dict | None = Field(default=None, description="Result of the task")
 
 
 class TaskCommand(BaseModel):
@@ -32,9 +38,17 @@ class TaskCommand(BaseModel):
     args: dict = Field(..., description="Command arguments as key-value pairs", example={"path": "/home/user/file", "mode": "755"})
 
 
+class TaskProgress(BaseModel):
+    """Represents the progress of a long-running task."""
+    bytes_done: int = Field(..., description="Bytes processed so far", example=1073741824)
+    bytes_total: int | None = Field(default=None, description="Bytes to process, if known", example=4294967296)
+    bytes_per_second: int | None = Field(default=None, description="Average throughput since the task started", example=536870912)
+
+
 class Task(BaseModel):
     """Represents a task in the system."""
     id: str = Field(..., description="Unique identifier of the task", example="task-123")
     status: TaskStatus = Field(default=TaskStatus.pending, description="Current status of the task", example="pending")
     result: dict | None = Field(default=None, description="Result of the task execution, if available")
+    progress: TaskProgress|None = Field(default=None, description="Progress of the task, for the long-running operations that report it")
     command: TaskCommand|None = Field(default=None, description="Command associated with this task")
@@ -1,6 +1,6 @@
-from fastapi import Request, HTTPException, Depends
+from fastapi import Request, HTTPException, Depends, Query
 from ...types.user import User
-from .. import iri_router
+from .. import iri_response, iri_router
 from ..error_handlers import DEFAULT_RESPONSES
 from ..iri_meta import iri_meta_dict
 from . import models, facility_adapter
@@ -33,17 +33,21 @@ async def get_task(
 
 @router.get("",
             dependencies=[Depends(router.current_user)],
-            response_model_exclude_unset=True, responses=DEFAULT_RESPONSES,
+            response_model_exclude_unset=True, responses={**DEFAULT_RESPONSES, **iri_response.NDJSON_RESPONSES},
             operation_id="getTasks",
             openapi_extra=iri_meta_dict("production", "required"))
 @router.get("/", responses=DEFAULT_RESPONSES, operation_id="getTasksWithSlash", include_in_schema=False)
 
 async def get_tasks(
     request: Request,
-    user: User = Depends(router.current_user)
+    user: User = Depends(router.current_user),
+    fields: list[str] | None = Query(default=None, description=iri_response.FIELDS_DESCRIPTION),
 ) -> list[models.Task]:
-    """Get all tasks"""
-    return await router.adapter.get_tasks(user=user)
+    """Get all tasks. Send `Accept: application/x-ndjson` to stream the tasks, one per line."""
+    include = iri_response.parse_fields(fields, models.Task)
+    if iri_response.wants_stream(request):
+        return await iri_response.stream(request, router.adapter.iter_tasks(user=user), allow_empty=True, include=include)
+    return iri_response.with_fields(await router.adapter.get_tasks(user=user), include)
 
 @router.delete(
     "/{task_id:str}",
@@ -1,10 +1,11 @@
 """Default models used by multiple routers."""
 import datetime
 from collections.abc import Iterable
+from typing import ClassVar
 
 from pydantic import BaseModel, ConfigDict, Field, computed_field, field_validator, model_serializer
 
-from .. import config
+from . import links
 from .scalars import StrictDateTime
 
 
@@ -13,15 +14,27 @@ class IRIBaseModel(BaseModel):
 
     model_config = ConfigDict(extra="allow")
 
+    # whether the JSON of this type can be cached per (id, last_modified), see app.types.fragments
+    _json_cache: ClassVar[bool] = False
+
+    # names of the declared and computed fields, precomputed per class in __pydantic_init_subclass__
+    _public_fields: ClassVar[frozenset[str]] = frozenset()
+
+    @classmethod
+    def __pydantic_init_subclass__(cls, **kwargs):
+        super().__pydantic_init_subclass__(**kwargs)
+        cls._public_fields = frozenset(cls.model_fields) | frozenset(cls.model_computed_fields)
+
     @model_serializer(mode="wrap")
     def _hide_extra(self, handler, info):
         data = handler(self)
 
-        model_fields = set(self.model_fields or {})
-        computed_fields = set(self.model_computed_fields or {})
-        extra = getattr(self, "__pydantic_extra__", {}) or {}
+        extra = self.__pydantic_extra__
+        if not extra:
+            return data
+        public_fields = self._public_fields
         for k in extra:
-            if k not in model_fields and k not in computed_fields:
+            if k not in public_fields:
                 data.pop(k, None)
         return data
 
@@ -47,7 +60,15 @@ class NamedObject(IRIBaseModel):
 
     id: str = Field(..., description="The unique identifier for the object. Typically a UUID or URN.", example="urn:iri:object:1234")
 
+    # named objects are versioned by last_modified, so their JSON can be cached until it changes.
+    # Subclasses whose JSON depends on the caller must set this to False.
+    _json_cache: ClassVar[bool] = True
+
+    # link template of this object type, used to build self_uri from the id
+    _self_link: ClassVar[links.LinkTemplate | None] = None
+
     def _self_path(self) -> str:
+        # the path of this object, for types that don't have a _self_link
         raise NotImplementedError
 
     @field_validator("last_modified", mode="before")
@@ -59,7 +80,9 @@ class NamedObject(IRIBaseModel):
     @property
     def self_uri(self) -> str:
         """Computed self URI property."""
-        return f"{config.API_URL_ROOT}{config.API_PREFIX}{config.API_URL}{self._self_path()}"
+        if self._self_link is not None:
+            return self._self_link(self.id)
+        return f"{links.API_BASE}{self._self_path()}"
 
     name: str|None = Field(default=None, description="The long name of the object.", example="Perlmutter GPU")
     description: str|None = Field(default=None, description="Human-readable description of the object.", example="High-performance GPU compute resource")
@@ -0,0 +1,105 @@
+"""Change log with opaque watermarks, used to serve delta (change feed) endpoints."""
+import base64
+import binascii
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+
+
+class WatermarkError(ValueError):
+    """Raised when a watermark is malformed, was issued by another change log, or is older than the retained history."""
+
+
+class ChangeLog:
+    """
+    A compacted, bounded log of object changes.
+
+    Every create, update and delete is recorded under a monotonically increasing sequence number.
+    Only the latest change of each (kind, id) is kept, so reading the changes since a watermark
+    costs time proportional to the number of objects that changed, not to the size of the dataset.
+
+    Live objects are never evicted, so a client without a watermark always gets a full snapshot.
+    Tombstones (deletes) are kept up to `max_tombstones`; once older tombstones are evicted,
+    watermarks issued before them are rejected and the client has to resync from scratch.
+
+    Watermarks are opaque to clients: they encode the log epoch (unique per ChangeLog instance,
+    so a restarted server never misinterprets an old token) and a sequence number.
+    """
+
+    def __init__(self, max_tombstones: int = 100_000):
+        self.epoch = uuid.uuid4().hex[:16]
+        self.max_tombstones = max_tombstones
+        self._seq = 0
+        self._floor = 0  # watermarks below this sequence may have missed an evicted tombstone
+        self._entries: OrderedDict[tuple[str, str], tuple[int, str, Any]] = OrderedDict()
+        self._tombstones: OrderedDict[tuple[str, str], int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, id_: str, operation: str, item: Any = None) -> int:
+        """Record a change of the object identified by (kind, id_) and return its sequence number."""
+        key = (kind, id_)
+        with self._lock:
+            self._seq += 1
+            self._entries[key] = (self._seq, operation, item if operation != DELETED else None)
+            self._entries.move_to_end(key)
+            if operation == DELETED:
+                self._tombstones[key] = self._seq
+                self._tombstones.move_to_end(key)
+                while len(self._tombstones) > self.max_tombstones:
+                    old_key, old_seq = self._tombstones.popitem(last=False)
+                    self._entries.pop(old_key, None)
+                    self._floor = max(self._floor, old_seq)
+            else:
+                self._tombstones.pop(key, None)
+            return self._seq
+
+    def watermark(self, seq: int | None = None) -> str:
+        """Return the opaque watermark for the given sequence number (defaults to the latest change)."""
+        if seq is None:
+            with self._lock:
+                seq = self._seq
+        return self._encode(seq)
+
+    def _encode(self, seq: int) -> str:
+        return base64.urlsafe_b64encode(f"{self.epoch}:{seq}".encode()).decode().rstrip("=")
+
+    def _parse(self, watermark: str) -> int:
+        try:
+            padded = watermark + "=" * (-len(watermark) % 4)
+            epoch, seq = base64.urlsafe_b64decode(padded.encode()).decode().split(":")
+            seq = int(seq)
+        except (ValueError, binascii.Error, UnicodeDecodeError) as exc:
+            raise WatermarkError("Malformed watermark") from exc
+        if epoch != self.epoch or seq > self._seq:
+            raise WatermarkError("Watermark was not issued by this server or has been reset")
+        if seq < self._floor:
+            raise WatermarkError("Watermark is older than the retained change history")
+        return seq
+
+    def since(self, watermark: str | None, limit: int) -> tuple[list[tuple[str, str, str, Any]], str, bool]:
+        """
+        Return the changes after the given watermark, oldest first.
+        Returns: (changes, next_watermark, has_more) where each change is (kind, id, operation, item).
+        Without a watermark, a snapshot of all live objects is returned (tombstones are skipped).
+        """
+        with self._lock:
+            after = self._parse(watermark) if watermark else 0
+            newer = []
+            for key in reversed(self._entries):
+                seq, operation, item = self._entries[key]
+                if seq <= after:
+                    break
+                if watermark is None and operation == DELETED:
+                    continue
+                newer.append((seq, key, operation, item))
+            newer.reverse()
+
+            page = newer[:limit]
+            has_more = len(newer) > limit
+            next_seq = page[-1][0] if has_more else self._seq
+            return [(key[0], key[1], operation, item) for _, key, operation, item in page], self._encode(next_seq), has_more
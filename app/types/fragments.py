@@ -0,0 +1,64 @@
+"""Memory-bounded cache of pre-serialized JSON fragments, used to assemble responses from rarely-changing objects."""
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+
+
+class FragmentCache:
+    """
+    An LRU cache of encoded JSON fragments, bounded by the total size of the cached bytes.
+
+    Each object has a single slot, keyed by (type, id, serialization options), that stores the fragment
+    together with the object's version (typically its `last_modified`). A lookup with a different version
+    is a miss and replaces the fragment, so a changed object is re-serialized the first time it is served again
+    and stale fragments don't linger until they are evicted.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[Hashable, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Hashable, encode: Callable[[], bytes]) -> bytes:
+        """Return the fragment cached under key for this version, or encode and cache it."""
+        fragment = self.lookup(key, version)
+        if fragment is None:
+            fragment = encode()
+            self.store(key, version, fragment)
+        return fragment
+
+    def lookup(self, key: Hashable, version: Hashable) -> bytes | None:
+        """Return the fragment cached under key for this version, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def store(self, key: Hashable, version: Hashable, fragment: bytes):
+        """Cache a fragment under key, replacing any other version, and evict the least recently used ones past max_bytes."""
+        if len(fragment) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1])
+            self._entries[key] = (version, fragment)
+            self.size += len(fragment)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,42 @@
+"""Link templates for the URIs returned by the API, precomputed once at startup."""
+import functools
+
+from .. import config
+
+# {API_URL_ROOT}{API_PREFIX}{API_URL}, e.g. https://api.iri.nersc.gov/api/v1
+API_BASE = f"{config.API_URL_ROOT}{config.API_PREFIX}{config.API_URL}"
+
+
+class LinkTemplate:
+    """
+    URI template of the form `{API_BASE}{path}/{id}`.
+    The prefix is built once, so a link costs a single string concatenation.
+    Lists of links are memoized per tuple of ids (up to LINK_CACHE_SIZE lists per template),
+    so they are rebuilt only when the ids of the object change.
+    """
+
+    __slots__ = ("prefix", "_build_many")
+
+    def __init__(self, path: str, cache_size: int = config.LINK_CACHE_SIZE):
+        self.prefix = f"{API_BASE}{path}/"
+        self._build_many = functools.lru_cache(maxsize=cache_size)(self._build) if cache_size > 0 else self._build
+
+    def __call__(self, id_: str) -> str:
+        return f"{self.prefix}{id_}"
+
+    def _build(self, ids: tuple[str, ...]) -> tuple[str, ...]:
+        prefix = self.prefix
+        return tuple(f"{prefix}{id_}" for id_ in ids)
+
+    def many(self, ids) -> list[str]:
+        """Return the links for a list of ids."""
+        return list(self._build_many(tuple(ids)))
+
+
+STATUS_RESOURCE = LinkTemplate("/status/resources")
+STATUS_EVENT = LinkTemplate("/status/events")
+STATUS_INCIDENT = LinkTemplate("/status/incidents")
+FACILITY_SITE = LinkTemplate("/facility/sites")
+ACCOUNT_CAPABILITY = LinkTemplate("/account/capabilities")
+ACCOUNT_PROJECT = LinkTemplate("/account/projects")
+TASK = LinkTemplate("/task")
@@ -2,6 +2,7 @@
 
 from pydantic import Field
 
+from . import links
 from .base import NamedObject
 from .scalars import AllocationUnit, StrictDateTime
 
@@ -15,8 +16,7 @@ class Capability(NamedObject):
     The word "capability" is also known to users as something they need for a job to run. (eg. gpu)
     """
 
-    def _self_path(self) -> str:
-        return f"/account/capabilities/{self.id}"
+    _self_link = links.ACCOUNT_CAPABILITY
 
     last_modified: StrictDateTime|None = Field(default=None, description="ISO 8601 timestamp when this object was last modified.", example="2026-02-21T12:00:00Z")
 
@@ -0,0 +1,174 @@
+"""
+Compact records for storing many API objects in memory.
+
+A pydantic model instance carries a `__dict__`, a fields-set and an extras dict on top of its values.
+Adapters that keep large numbers of objects (events, incidents, allocations) can store them as records instead:
+slotted objects holding only the field values, with repeated strings (references to other objects' ids,
+names, ...) interned, lists stored as tuples (or as their single item) and UTC datetimes as timestamps, and convert
+them back to their models (without revalidation) only when they are returned.
+"""
+import datetime
+import sys
+import types
+import typing
+from typing import Any, ClassVar
+
+from pydantic import BaseModel
+
+from .scalars import StrictDateTime
+
+
+class Record:
+    """Base class of the record classes created by `record_class`."""
+
+    __slots__ = ("_fields_set",)
+
+    _model: ClassVar[type[BaseModel]]
+    _fields: ClassVar[tuple[str, ...]]
+    # field name: record class of a field holding a list of models
+    _nested: ClassVar[dict[str, type["Record"]]]
+    # names of the fields holding lists, and datetimes, which are stored encoded (see record_class)
+    _lists: ClassVar[frozenset[str]]
+    _datetimes: ClassVar[frozenset[str]]
+    # fields-sets are shared between records, since most records of a type set the same fields
+    _shared_fields_sets: ClassVar[dict[frozenset, frozenset]]
+
+    @classmethod
+    def from_model(cls, obj: BaseModel) -> "Record":
+        """Return the record of a model instance. Extra (undeclared) attributes are not kept."""
+        record = cls.__new__(cls)
+        # equal datetimes of an object (e.g. start and last_modified) share a timestamp, like they often share a datetime
+        timestamps = {}
+        for name in cls._fields:
+            value = getattr(obj, name)
+            if name in cls._lists:
+                setattr(record, f"_{name}", cls._compact_list(name, value))
+            elif name in cls._datetimes:
+                setattr(record, f"_{name}", _timestamp(value, timestamps))
+            else:
+                setattr(record, name, cls._compact(name, value))
+        fields_set = frozenset(obj.model_fields_set)
+        record._fields_set = cls._shared_fields_sets.setdefault(fields_set, fields_set)
+        return record
+
+    @classmethod
+    def _compact(cls, name: str, value: Any) -> Any:
+        # an object's own id is unique, and interning it would only add an entry to the interned strings table
+        if isinstance(value, str) and name != "id":
+            return sys.intern(value)
+        return value
+
+    @classmethod
+    def _compact_list(cls, name: str, value: Any) -> Any:
+        # Lists are stored as tuples, except that a single item is stored alone, without a container.
+        # Lists of ids are kept as they are: they normally hold the very id strings of the objects they refer to.
+        if not isinstance(value, list):
+            return value
+        nested = cls._nested.get(name)
+        if nested is not None:
+            value = [nested.from_model(v) for v in value]
+        if len(value) == 1 and value[0] is not None and not isinstance(value[0], tuple):
+            return value[0]
+        return tuple(value)
+
+    def to_model(self) -> BaseModel:
+        """Return the model instance of this record."""
+        values = {}
+        for name in self._fields:
+            if name in self._lists:
+                value = getattr(self, f"_{name}")
+                nested = self._nested.get(name)
+                if value is None:
+                    pass
+                elif not isinstance(value, tuple):
+                    value = [value.to_model() if nested is not None else value]
+                else:
+                    value = [v.to_model() for v in value] if nested is not None else list(value)
+            else:
+                value = getattr(self, name)
+            values[name] = value
+        return self._model.model_construct(_fields_set=set(self._fields_set), **values)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{name}={getattr(self, name)!r}' for name in self._fields)})"
+
+
+def _timestamp(value: Any, timestamps: dict) -> Any:
+    # only UTC datetimes are stored as timestamps, so that the datetimes of the models keep their time zone
+    if isinstance(value, datetime.datetime) and value.tzinfo is datetime.timezone.utc:
+        return timestamps.setdefault(value, value.timestamp())
+    return value
+
+
+def _list_property(slot: str) -> property:
+    def get(self):
+        value = getattr(self, slot)
+        return value if value is None or isinstance(value, tuple) else (value,)
+    return property(get)
+
+
+def _datetime_property(slot: str) -> property:
+    def get(self):
+        value = getattr(self, slot)
+        return datetime.datetime.fromtimestamp(value, datetime.timezone.utc) if isinstance(value, float) else value
+    return property(get)
+
+
+def _field_types(annotation) -> list:
+    # the types a field can hold, without None
+    if typing.get_origin(annotation) in (typing.Union, types.UnionType):
+        return [a for a in typing.get_args(annotation) if a is not type(None)]
+    return [annotation]
+
+
+_record_classes: dict[type[BaseModel], type[Record]] = {}
+
+
+def record_class(model: type[BaseModel]) -> type[Record]:
+    """
+    Return the record class of a model: a slotted class with one attribute per declared field.
+    Lists are stored as tuples, or as their item alone when they hold a single item, and lists of models hold records
+    of those models. UTC datetimes are stored as float timestamps, half the size of a datetime.
+    List and datetime attributes are properties decoding the stored value (to a tuple and a datetime), so records have
+    the same attributes as the model and the model's `find` helpers work on them too.
+    """
+    if model in _record_classes:
+        return _record_classes[model]
+    nested, lists, datetimes = {}, set(), set()
+    for name, info in model.model_fields.items():
+        for field_type in _field_types(info.annotation):
+            if typing.get_origin(field_type) is list:
+                lists.add(name)
+                args = typing.get_args(field_type)
+                if args and isinstance(args[0], type) and issubclass(args[0], BaseModel):
+                    nested[name] = record_class(args[0])
+            elif field_type in (datetime.datetime, StrictDateTime):
+                datetimes.add(name)
+    namespace = {
+        "__slots__": tuple(f"_{name}" if name in lists or name in datetimes else name for name in model.model_fields),
+        "_model": model,
+        "_fields": tuple(model.model_fields),
+        "_nested": nested,
+        "_lists": frozenset(lists),
+        "_datetimes": frozenset(datetimes),
+        "_shared_fields_sets": {},
+    }
+    namespace.update({name: _list_property(f"_{name}") for name in lists})
+    namespace.update({name: _datetime_property(f"_{name}") for name in datetimes})
+    cls = type(f"{model.__name__}Record", (Record,), namespace)
+    _record_classes[model] = cls
+    return cls
+
+
+def to_records(items, model: type[BaseModel] | None = None) -> list[Record]:
+    """Return the records of model instances (all of the same model, or of `model` if given)."""
+    items = list(items)
+    if not items:
+        return []
+    cls = record_class(model or type(items[0]))
+    return [cls.from_model(item) for item in items]
+
+
+def to_models(records) -> list[BaseModel]:
+    """Return the model instances of records."""
+    return [record.to_model() for record in records]
@@ -1,4 +1,7 @@
 import logging
+import os
+import subprocess
+import sys
 
 logging.basicConfig()
 logging.getLogger().setLevel(logging.INFO)
@@ -7,3 +10,10 @@ workers = 8
 worker_class = "uvicorn.workers.UvicornWorker"
 bind = "0.0.0.0:8000"
 timeout = 60
+
+
+def on_starting(server):
+    """Build the OpenAPI schema once in the master, so the workers load it instead of each building it."""
+    build = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tools", "build_openapi.py")
+    if subprocess.run([sys.executable, build], check=False).returncode != 0:
+        server.log.warning("Could not build the OpenAPI schema, the workers will build it on first use")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests of the change log behind GET /status/changes, run without a server (python test/test_changelog.py, or pytest).
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.types.changelog import ChangeLog, CREATED, DELETED, UPDATED, WatermarkError  # noqa: E402
+
+
+def test_watermark_round_trip():
+    log = ChangeLog()
+    log.record("resource", "a", CREATED, "A")
+    log.record("resource", "b", CREATED, "B")
+    changes, watermark, has_more = log.since(None, limit=1)
+    assert changes == [("resource", "a", CREATED, "A")] and has_more
+    changes, watermark, has_more = log.since(watermark, limit=1)
+    assert changes == [("resource", "b", CREATED, "B")] and not has_more
+    assert watermark == log.watermark()
+    # caught up: nothing new, and the same watermark again
+    assert log.since(watermark, limit=10) == ([], watermark, False)
+    log.record("resource", "a", UPDATED, "A2")
+    assert log.since(watermark, limit=10)[0] == [("resource", "a", UPDATED, "A2")]
+
+
+def test_tombstone_after_delete():
+    log = ChangeLog()
+    log.record("incident", "i1", CREATED, "I1")
+    watermark = log.watermark()
+    log.record("incident", "i1", DELETED)
+    assert log.since(watermark, limit=10)[0] == [("incident", "i1", DELETED, None)]
+    # a snapshot only has live objects
+    assert log.since(None, limit=10)[0] == []
+
+
+def test_watermark_older_than_floor():
+    log = ChangeLog(max_tombstones=1)
+    log.record("event", "e1", CREATED, "E1")
+    log.record("event", "e2", CREATED, "E2")
+    watermark = log.watermark()
+    log.record("event", "e1", DELETED)
+    assert log.since(watermark, limit=10)[0] == [("event", "e1", DELETED, None)]
+    # evicts the tombstone of e1: a client at `watermark` would never learn of its deletion
+    log.record("event", "e2", DELETED)
+    try:
+        log.since(watermark, limit=10)
+    except WatermarkError:
+        pass
+    else:
+        raise AssertionError("a watermark older than the evicted tombstones should be refused")
+    assert log.since(log.watermark(), limit=10) == ([], log.watermark(), False)
+
+
+def test_foreign_watermark():
+    for watermark in (ChangeLog().watermark(), "not a watermark"):
+        try:
+            ChangeLog().since(watermark, limit=10)
+        except WatermarkError:
+            pass
+        else:
+            raise AssertionError(f"{watermark!r} should be refused")
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: ok")
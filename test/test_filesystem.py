@@ -2,6 +2,7 @@
 """
 IRI Filesystem API smoke test via async tasks.
 """
+import hashlib
 import os
 import sys
 import time
@@ -204,6 +205,27 @@ print("=== UPLOAD FILE ===")
 task = submit("POST", f"/filesystem/upload/{RESOURCE_ID}?path={file_path}", files={"file": ("hello.txt", content.encode())})
 wait_task(task)
 
+print("\n" + "="*40)
+print("=== RESUMABLE UPLOAD ===")
+
+resumable_path = f"{base_dir}/hello_resumable.txt"
+data = content.encode()
+r = requests.post(f"{BASE_URL}/filesystem/uploads/{RESOURCE_ID}", json={"path": resumable_path, "size": len(data)}, headers=HEADERS, timeout=TIMEOUT)
+if not r.ok:
+    die(f"Upload session failed: {r.status_code} {r.text}")
+session_uri = f"{BASE_URL}/filesystem/uploads/{RESOURCE_ID}/{r.json()['id']}"
+# send the second half first
+for offset in (len(data) // 2, 0):
+    chunk = data[offset:] if offset else data[:len(data) // 2]
+    r = requests.put(session_uri, params={"offset": offset}, data=chunk, headers=HEADERS, timeout=TIMEOUT)
+    if not r.ok:
+        die(f"Upload chunk failed: {r.status_code} {r.text}")
+    print(f"   Received: {r.json()['received']}")
+r = requests.post(f"{session_uri}/finalize", json={"checksum": hashlib.sha256(data).hexdigest()}, headers=HEADERS, timeout=TIMEOUT)
+if not r.ok:
+    die(f"Finalize failed: {r.status_code} {r.text}")
+wait_task(r.json())
+
 print("\n" + "="*40)
 print("=== FILE TYPE ===")
 
@@ -289,6 +311,94 @@ print("=== DOWNLOAD FILE ===")
 task = submit("GET", f"/filesystem/download/{RESOURCE_ID}", params={"path": moved_path})
 wait_task(task)
 
+print("\n" + "="*40)
+print("=== STREAM FILE ===")
+
+r = requests.get(f"{BASE_URL}/filesystem/stream/{RESOURCE_ID}", params={"path": moved_path}, headers=HEADERS, timeout=TIMEOUT)
+if r.status_code == 501:
+    print("   Direct downloads are not supported by this facility")
+else:
+    if not r.ok or r.content != content.encode():
+        die(f"Stream download failed: {r.status_code} {r.text}")
+    r = requests.get(f"{BASE_URL}/filesystem/stream/{RESOURCE_ID}", params={"path": moved_path}, headers={**HEADERS, "Range": "bytes=0-4"}, timeout=TIMEOUT)
+    if r.status_code != 206 or r.content != content.encode()[:5]:
+        die(f"Range download failed: {r.status_code} {r.text}")
+    print(f"   Downloaded {len(content)} bytes, range: {r.content!r}")
+
+print("\n" + "="*40)
+print("=== WAIT ===")
+
+r = requests.get(f"{BASE_URL}/filesystem/stat/{RESOURCE_ID}", params={"path": base_dir, "wait": "true"}, headers=HEADERS, timeout=TIMEOUT)
+if not r.ok:
+    die(f"Stat with wait failed: {r.status_code} {r.text}")
+data = r.json()
+if data.get("status") is None:
+    print(f"   Task {data['task_id']} didn't finish within the wait budget")
+    wait_task(data)
+else:
+    print(f"   Task {data['task_id']} returned inline: {data['status']} {data.get('result')}")
+
+print("\n" + "="*40)
+print("=== BATCH ===")
+
+operations = [{"command": "stat", "args": {"path": p}} for p in [base_dir, archive_path, f"{base_dir}/missing"]]
+data = submit("POST", f"/filesystem/batch/{RESOURCE_ID}", json={"operations": operations})
+for operation, outcome in zip(operations, wait_task(data)["output"]):
+    print(f"   {operation['command']} {operation['args']['path']}: {outcome['status']}")
+
+# invalid arguments are rejected when the batch is submitted
+r = requests.post(f"{BASE_URL}/filesystem/batch/{RESOURCE_ID}", json={"operations": [{"command": "head", "args": {"path": base_dir}}]}, headers=HEADERS, timeout=TIMEOUT)
+if r.status_code != 400:
+    die(f"Batch with invalid arguments: expected 400, got {r.status_code} {r.text}")
+print("   Invalid arguments rejected")
+
+print("\n" + "="*40)
+print("=== WALK ===")
+
+r = requests.get(f"{BASE_URL}/filesystem/walk/{RESOURCE_ID}", params={"path": base_dir, "maxDepth": 2}, headers=HEADERS, timeout=TIMEOUT)
+if r.status_code == 501:
+    print("   Walks are not supported by this facility")
+else:
+    if not r.ok:
+        die(f"Walk failed: {r.status_code} {r.text}")
+    print(f"   {len(r.text.splitlines())} entries")
+
+print("\n" + "="*40)
+print("=== MANIFEST ===")
+
+r = requests.get(f"{BASE_URL}/filesystem/manifest/{RESOURCE_ID}", params={"path": base_dir}, headers=HEADERS, timeout=TIMEOUT)
+if r.status_code == 501:
+    print("   Manifests are not supported by this facility")
+else:
+    if not r.ok:
+        die(f"Manifest failed: {r.status_code} {r.text}")
+    lines = r.text.splitlines()
+    print(f"   {len(lines) - 1} entries, summary: {lines[-1]}")
+
+print("\n" + "="*40)
+print("=== STATUS CHANGE FEED ===")
+
+r = requests.get(f"{BASE_URL}/status/changes", params={"limit": 1000}, headers=HEADERS, timeout=TIMEOUT)
+if r.status_code == 501:
+    print("   The change feed is not supported by this facility")
+else:
+    if not r.ok:
+        die(f"Change feed failed: {r.status_code} {r.text}")
+    feed = r.json()
+    while feed["has_more"]:
+        r = requests.get(f"{BASE_URL}/status/changes", params={"since": feed["watermark"], "limit": 1000}, headers=HEADERS, timeout=TIMEOUT)
+        if not r.ok:
+            die(f"Change feed page failed: {r.status_code} {r.text}")
+        feed = r.json()
+    # nothing changed since the last watermark, which stays valid
+    r = requests.get(f"{BASE_URL}/status/changes", params={"since": feed["watermark"]}, headers=HEADERS, timeout=TIMEOUT)
+    if not r.ok or r.json()["watermark"] != feed["watermark"]:
+        die(f"Change feed round trip failed: {r.status_code} {r.text}")
+    print(f"   Caught up at watermark {feed['watermark']}, {len(r.json()['changes'])} newer changes")
+    r = requests.get(f"{BASE_URL}/status/changes", params={"since": "bm90LWlzc3VlZDox"}, headers=HEADERS, timeout=TIMEOUT)
+    if r.status_code != 410:
+        die(f"Unknown watermark should be refused with 410: {r.status_code} {r.text}")
+
 print("\n" + "="*40)
 print("=== CLEANUP ===")
 
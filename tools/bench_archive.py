@@ -0,0 +1,92 @@
+"""
+Measure the throughput of the in-process archive engine (app.routers.filesystem.local.archive) per codec and
+thread count, next to the `tar` command the demo adapter used to run, on a generated directory of half
+compressible, half random files. Each archive is extracted again and checked against the source.
+
+Usage: python tools/bench_archive.py [--size-mb 512] [--files 64] [--threads 1,2,4,8] [--repeat 2] [--dir /tmp]
+"""
+import argparse
+import filecmp
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.routers.filesystem.local import archive  # noqa: E402
+
+MIB = 1024 * 1024
+TAR_FLAGS = {"gzip": "z", "bzip2": "j", "xz": "J", "zstd": None, "none": ""}
+# codecs whose compression uses several threads
+THREADED = ("gzip", "zstd")
+
+
+def make_tree(directory: str, size: int, files: int) -> str:
+    root = os.path.join(directory, "data")
+    os.makedirs(root)
+    text = b"".join(b"%08d some fairly repetitive log line, status=ok value=%d\n" % (i, i % 97) for i in range(MIB // 48))[:MIB]
+    for i in range(files):
+        subdirectory = os.path.join(root, f"d{i % 8}")
+        os.makedirs(subdirectory, exist_ok=True)
+        with open(os.path.join(subdirectory, f"f{i}"), "wb") as f:
+            for block in range(size // files // MIB):
+                f.write(text if block % 2 else os.urandom(MIB))
+    return root
+
+
+def identical(left: str, right: str) -> bool:
+    comparison = filecmp.dircmp(left, right)
+    if comparison.left_only or comparison.right_only or comparison.funny_files:
+        return False
+    if filecmp.cmpfiles(left, right, comparison.common_files, shallow=False)[1]:
+        return False
+    return all(identical(os.path.join(left, sub), os.path.join(right, sub)) for sub in comparison.common_dirs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=512, help="total size of the generated files in MiB")
+    parser.add_argument("--files", type=int, default=64, help="number of generated files")
+    parser.add_argument("--threads", default="1,2,4,8", help="comma-separated thread counts for gzip and zstd")
+    parser.add_argument("--repeat", type=int, default=2, help="number of timed runs per measurement")
+    parser.add_argument("--dir", default=None, help="directory for the generated files (default: system temp)")
+    args = parser.parse_args()
+    thread_counts = [int(n) for n in args.threads.split(",")]
+    codecs = ["none", "gzip", "bzip2", "xz"] + (["zstd"] if archive.zstandard is not None else [])
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        source = make_tree(directory, args.size_mb * MIB, args.files)
+        size = sum(os.path.getsize(os.path.join(d, f)) for d, _, names in os.walk(source) for f in names)
+        target = os.path.join(directory, "archive")
+        print(f"{size / MIB:.0f} MiB in {args.files} files, {os.cpu_count()} CPUs (MB/s of uncompressed data)")
+        print(f"{'codec':<7} {'engine':<10} {'compress MB/s':>14} {'extract MB/s':>13} {'ratio':>6}  identical")
+        for codec in codecs:
+            runs = [(f"{n} thread{'s' if n > 1 else ''}", n) for n in (thread_counts if codec in THREADED else [1])]
+            if TAR_FLAGS[codec] is not None:
+                runs.append(("tar", None))
+            for label, threads in runs:
+                extracted = os.path.join(directory, "extracted")
+
+                def compress(threads=threads):
+                    if threads is None:
+                        subprocess.run(["tar", f"-c{TAR_FLAGS[codec]}f", target, "-C", directory, "data"], check=True)
+                    else:
+                        archive.compress(source, target, codec, threads=threads)
+
+                def extract():
+                    shutil.rmtree(extracted, ignore_errors=True)
+                    os.makedirs(extracted)
+                    archive.extract(target, extracted, codec)
+
+                t_compress = min(timeit.repeat(compress, number=1, repeat=args.repeat))
+                t_extract = min(timeit.repeat(extract, number=1, repeat=args.repeat))
+                ratio = size / os.path.getsize(target)
+                same = identical(source, os.path.join(extracted, "data"))
+                print(f"{codec:<7} {label:<10} {size / MIB / t_compress:>14.0f} {size / MIB / t_extract:>13.0f} {ratio:>6.2f}  {'yes' if same else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
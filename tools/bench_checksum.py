@@ -0,0 +1,71 @@
+"""
+Compare the native checksums (app.routers.filesystem.local.checksum) with the coreutils subprocesses
+the demo adapter used to run, on a large generated file: one algorithm at a time, all of them in a single
+pass, and a second request served from the digest cache. The digests are checked to be identical.
+
+Usage: python tools/bench_checksum.py [--size-gb 2] [--repeat 3] [--dir /tmp]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.routers.filesystem.local import checksum  # noqa: E402
+
+MIB = 1024 * 1024
+COREUTILS = {"sha256": "sha256sum", "sha512": "sha512sum", "sha1": "sha1sum", "md5": "md5sum", "blake2b": "b2sum"}
+
+
+def make_file(directory: str, size: int) -> str:
+    path = os.path.join(directory, "bench_checksum.bin")
+    block = os.urandom(MIB)
+    with open(path, "wb") as f:
+        for _ in range(size // MIB):
+            f.write(block)
+    # old enough to be cached
+    os.utime(path, (time.time() - 60, time.time() - 60))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-gb", type=float, default=2, help="size of the generated file in GiB")
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed runs per operation")
+    parser.add_argument("--dir", default=None, help="directory for the generated file and the cache (default: system temp)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        path = make_file(directory, int(args.size_gb * 1024 * MIB))
+        size = os.path.getsize(path)
+        print(f"file: {size / 1024 / MIB:.2f} GiB (page cache warm after the first run)")
+        print(f"{'algorithm':<12} {'subprocess MB/s':>16} {'native MB/s':>12}  identical")
+        for algorithm, command in COREUTILS.items():
+            def run_subprocess(command=command):
+                return subprocess.run([command, path], capture_output=True, check=True, text=True).stdout.split()[0]
+
+            def run_native(algorithm=algorithm):
+                return checksum.checksums(path, [algorithm], cache=None)[algorithm]
+
+            identical = run_native() == run_subprocess()
+            t_subprocess = min(timeit.repeat(run_subprocess, number=1, repeat=args.repeat))
+            t_native = min(timeit.repeat(run_native, number=1, repeat=args.repeat))
+            print(f"{algorithm:<12} {size / MIB / t_subprocess:>16.0f} {size / MIB / t_native:>12.0f}  {'yes' if identical else 'NO'}")
+
+        algorithms = list(checksum.ALGORITHMS)
+        t_sequential = sum(min(timeit.repeat(lambda a=a: checksum.checksums(path, [a], cache=None), number=1, repeat=args.repeat)) for a in algorithms)
+        t_single_pass = min(timeit.repeat(lambda: checksum.checksums(path, algorithms, cache=None), number=1, repeat=args.repeat))
+        print(f"all of {', '.join(algorithms)}: {t_sequential:.2f} s one by one, {t_single_pass:.2f} s in a single pass")
+
+        cache = checksum.DigestCache(os.path.join(directory, "cache.sqlite"), 1000)
+        checksum.checksums(path, algorithms, cache=cache)
+        t_cached = min(timeit.repeat(lambda: checksum.checksums(path, algorithms, cache=cache), number=1, repeat=args.repeat))
+        print(f"cached: {t_cached * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
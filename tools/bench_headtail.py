@@ -0,0 +1,72 @@
+"""
+Compare the native head/tail/view (app.routers.filesystem.local.content) with the coreutils subprocesses
+the demo adapter used to run, on a large generated text file. Both outputs are checked to be identical.
+
+Usage: python tools/bench_headtail.py [--size-gb 4] [--repeat 5] [--dir /tmp]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.routers.filesystem.local import content  # noqa: E402
+
+MIB = 1024 * 1024
+
+
+def make_file(directory: str, size: int) -> tuple[str, int]:
+    """Write a text file of about size bytes; return its path and line count."""
+    line = b"".join(f"{i:08d} ".encode() for i in range(12)) + b"\n"
+    block = line * (MIB // len(line))
+    path = os.path.join(directory, "bench_headtail.txt")
+    written = 0
+    with open(path, "wb") as f:
+        while written < size:
+            f.write(block)
+            written += len(block)
+    return path, written // len(line)
+
+
+def cases(path: str, size: int, lines: int) -> list[tuple[str, object, object]]:
+    """(name, native call, subprocess command) for each operation, on small outputs of the large file."""
+    return [
+        ("head -n 10", lambda: content.head(path, lines=10), ["head", "-n", "10", path]),
+        ("head -c 1MiB", lambda: content.head(path, file_bytes=MIB), ["head", "-c", str(MIB), path]),
+        ("tail -n 10", lambda: content.tail(path, lines=10), ["tail", "-n", "10", path]),
+        ("tail -n 10000", lambda: content.tail(path, lines=10000), ["tail", "-n", "10000", path]),
+        ("tail -c 1MiB", lambda: content.tail(path, file_bytes=MIB), ["tail", "-c", str(MIB), path]),
+        ("tail -n +(lines-10)", lambda: content.tail(path, lines=lines - 11, skip_heading=True), ["tail", "-n", f"+{lines - 10}", path]),
+        ("tail -c +(size-1MiB)", lambda: content.tail(path, file_bytes=size - MIB, skip_heading=True), ["tail", "-c", f"+{size - MIB + 1}", path]),
+        ("view 1MiB @ middle", lambda: content.view(path, MIB, size // 2), f"tail -c +{size // 2 + 1} {path} | head -c {MIB}"),
+        ("view 1MiB @ end", lambda: content.view(path, MIB, size - MIB), f"tail -c +{size - MIB + 1} {path} | head -c {MIB}"),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-gb", type=float, default=4, help="size of the generated file in GiB")
+    parser.add_argument("--repeat", type=int, default=5, help="number of timed runs per operation")
+    parser.add_argument("--dir", default=None, help="directory for the generated file (default: system temp)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        path, lines = make_file(directory, int(args.size_gb * 1024 * MIB))
+        size = os.path.getsize(path)
+        print(f"file: {size / 1024 / MIB:.2f} GiB, {lines} lines (page cache warm after the first run)")
+        print(f"{'operation':<22} {'subprocess ms':>14} {'native ms':>10} {'speedup':>8}  identical")
+        for name, native, command in cases(path, size, lines):
+            def run_subprocess(command=command):
+                return subprocess.run(command, shell=isinstance(command, str), capture_output=True, check=True).stdout
+
+            identical = native() == run_subprocess()
+            t_subprocess = min(timeit.repeat(run_subprocess, number=1, repeat=args.repeat)) * 1000
+            t_native = min(timeit.repeat(native, number=1, repeat=args.repeat)) * 1000
+            print(f"{name:<22} {t_subprocess:>14.2f} {t_native:>10.2f} {t_subprocess / t_native:>7.1f}x  {'yes' if identical else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Compare IRIBaseModel's extra-field hiding (per-class precomputed field names, early exit without extras)
+with the previous serializer, which rebuilt the field name sets of every model on every call.
+
+Usage: python tools/bench_hide_extra.py [--count 1000] [--repeat 20]
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import timeit
+
+from pydantic import model_serializer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+from app.routers.account.models import AllocationEntry, ProjectAllocation  # noqa: E402
+from app.routers.compute.models import Job, JobState, JobStatus  # noqa: E402
+from app.routers.status.models import Event, Incident, IncidentType, Resolution, Status  # noqa: E402
+
+
+class LegacyHideExtra:
+    """Mixin restoring the previous _hide_extra serializer."""
+
+    @model_serializer(mode="wrap")
+    def _hide_extra(self, handler, info):
+        data = handler(self)
+
+        model_fields = set(type(self).model_fields or {})
+        computed_fields = set(type(self).model_computed_fields or {})
+        extra = getattr(self, "__pydantic_extra__", {}) or {}
+        for k in extra:
+            if k not in model_fields and k not in computed_fields:
+                data.pop(k, None)
+        return data
+
+
+class LegacyEvent(LegacyHideExtra, Event):
+    pass
+
+
+class LegacyIncident(LegacyHideExtra, Incident):
+    pass
+
+
+class LegacyAllocationEntry(LegacyHideExtra, AllocationEntry):
+    pass
+
+
+class LegacyProjectAllocation(LegacyHideExtra, ProjectAllocation):
+    entries: list[LegacyAllocationEntry]
+
+
+class LegacyJobStatus(LegacyHideExtra, JobStatus):
+    pass
+
+
+class LegacyJob(LegacyHideExtra, Job):
+    status: LegacyJobStatus | None = None
+
+
+def make_objects(count: int, with_extra: bool) -> dict[str, tuple[list, list]]:
+    """Return {name: (objects, legacy_objects)} holding the same data."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    extra = {"facility_note": "internal"} if with_extra else {}
+
+    def both(cls, legacy_cls, make):
+        return [cls(**make(i)) for i in range(count)], [legacy_cls(**make(i)) for i in range(count)]
+
+    return {
+        "Event": both(Event, LegacyEvent, lambda i: dict(
+            id=f"ev-{i}", name=f"event {i}", last_modified=now, occurred_at=now, status=Status.up,
+            resource_id=f"res-{i % 10}", incident_id=f"inc-{i % 50}", **extra,
+        )),
+        "Incident": both(Incident, LegacyIncident, lambda i: dict(
+            id=f"inc-{i}", name=f"incident {i}", last_modified=now, status=Status.down, type=IncidentType.unplanned,
+            start=now, resolution=Resolution.pending, event_ids=[f"ev-{i}-{j}" for j in range(20)],
+            resource_ids=[f"res-{j}" for j in range(5)], **extra,
+        )),
+        "ProjectAllocation": (
+            [ProjectAllocation(id=f"pa-{i}", project_id="p1", capability_id="c1", entries=[AllocationEntry(allocation=100.0, usage=float(i), unit="node_hours", **extra)], **extra)
+             for i in range(count)],
+            [LegacyProjectAllocation(id=f"pa-{i}", project_id="p1", capability_id="c1", entries=[LegacyAllocationEntry(allocation=100.0, usage=float(i), unit="node_hours", **extra)], **extra)
+             for i in range(count)],
+        ),
+        "Job": (
+            [Job(id=f"job-{i}", status=JobStatus(state=JobState.ACTIVE, time=1.0, message="running", exit_code=0, **extra), **extra) for i in range(count)],
+            [LegacyJob(id=f"job-{i}", status=LegacyJobStatus(state=JobState.ACTIVE, time=1.0, message="running", exit_code=0, **extra), **extra) for i in range(count)],
+        ),
+    }
+
+
+def dump(objects) -> list[str]:
+    return [o.model_dump_json() for o in objects]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1000, help="number of objects per model")
+    parser.add_argument("--repeat", type=int, default=20, help="number of timed runs per serializer")
+    args = parser.parse_args()
+
+    print(f"{'model':<18} {'extras':>6} {'legacy ms':>10} {'current ms':>11} {'speedup':>8}  identical")
+    for with_extra in (False, True):
+        for name, (objects, legacy_objects) in make_objects(args.count, with_extra).items():
+            identical = [json.loads(s) for s in dump(objects)] == [json.loads(s) for s in dump(legacy_objects)]
+            t_legacy = min(timeit.repeat(lambda: dump(legacy_objects), number=1, repeat=args.repeat)) * 1000
+            t_current = min(timeit.repeat(lambda: dump(objects), number=1, repeat=args.repeat)) * 1000
+            print(f"{name:<18} {'yes' if with_extra else 'no':>6} {t_legacy:>10.2f} {t_current:>11.2f} {t_legacy / t_current:>7.1f}x  {'yes' if identical else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
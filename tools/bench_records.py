@@ -0,0 +1,96 @@
+"""
+Compare the memory used to store Event, Incident, ProjectAllocation and UserAllocation objects
+as pydantic models and as compact records (app.types.records), and the cost of converting records back to models.
+
+The ids an object refers to (an incident's event_ids, an event's resource_id, ...) are created up front,
+as they belong to the objects they refer to, which are stored anyway.
+
+Usage: python tools/bench_records.py [--count 1000000]
+"""
+import argparse
+import datetime
+import gc
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+from app.routers.account.models import AllocationEntry, ProjectAllocation, UserAllocation  # noqa: E402
+from app.routers.status.models import Event, Incident, IncidentType, Resolution, Status  # noqa: E402
+from app.types.records import record_class  # noqa: E402
+from app.types.scalars import AllocationUnit  # noqa: E402
+
+START = datetime.datetime(2025, 3, 1, tzinfo=datetime.timezone.utc)
+RESOURCE_IDS = [f"resource-{i:04d}" for i in range(20)]
+PROJECT_IDS = [f"project-{i:04d}" for i in range(100)]
+REFERENCED_IDS: list[str] = []  # ids of the events (or allocations) referenced by the objects of the current model
+
+
+def make(model, i: int):
+    """Return the i-th object of a model, with the kind of data (and repetition) the demo adapter has."""
+    t = START + datetime.timedelta(minutes=i)
+    resource_id = RESOURCE_IDS[i % len(RESOURCE_IDS)]
+    if model is Event:
+        return Event(
+            id=f"event-{i:012d}", name=f"{resource_id} is up", description=f"{resource_id} is up", occurred_at=t, status=Status.up,
+            resource_id=resource_id, incident_id=REFERENCED_IDS[i // 10], last_modified=START,
+        )
+    if model is Incident:
+        return Incident(
+            id=f"incident-{i:012d}", name=f"{resource_id} incident", description=f"{resource_id} incident", status=Status.down,
+            event_ids=REFERENCED_IDS[i * 10 : i * 10 + 10], resource_ids=[resource_id],
+            start=t, end=t, type=IncidentType.unplanned, resolution=Resolution.completed, last_modified=t,
+        )
+    entries = [AllocationEntry(allocation=1000.0, usage=float(i % 1000), unit=AllocationUnit.node_hours)]
+    if model is ProjectAllocation:
+        return ProjectAllocation(id=f"pa-{i:012d}", project_id=PROJECT_IDS[i % len(PROJECT_IDS)], capability_id="capability-cpu", entries=entries)
+    return UserAllocation(
+        id=f"ua-{i:012d}", project_id=PROJECT_IDS[i % len(PROJECT_IDS)], project_allocation_id=REFERENCED_IDS[i // 10], user_id=f"user-{i % 1000}", entries=entries
+    )
+
+
+def measure(build) -> tuple[int, list]:
+    """Return (allocated bytes, objects) of the objects built by build()."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, objects
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1_000_000, help="number of stored objects per model")
+    args = parser.parse_args()
+
+    print(f"{'model':<18} {'objects':>9} {'model B/obj':>12} {'record B/obj':>13} {'reduction':>10} {'to_model us':>12}")
+    total_models = total_records = 0
+    for model in (Event, Incident, ProjectAllocation, UserAllocation):
+        prefix = {Event: "incident", Incident: "event", UserAllocation: "pa"}.get(model, "unused")
+        REFERENCED_IDS[:] = [f"{prefix}-{i:012d}" for i in range(args.count * 10 if model is Incident else args.count // 10 + 1)]
+        # records are built one model at a time, so the models never all exist at once
+        cls = record_class(model)
+        records_bytes, records = measure(lambda: [cls.from_model(make(model, i)) for i in range(args.count)])
+        models_bytes, models = measure(lambda: [make(model, i) for i in range(args.count)])
+        assert records[-1].to_model().model_dump() == models[-1].model_dump()
+        del models
+        sample = records[: min(1000, args.count)]
+        t_convert = min(timeit.repeat(lambda: [r.to_model() for r in sample], number=1, repeat=5)) / len(sample) * 1e6
+        del records
+        total_models += models_bytes
+        total_records += records_bytes
+        print(
+            f"{model.__name__:<18} {args.count:>9} {models_bytes / args.count:>12.0f} {records_bytes / args.count:>13.0f} "
+            f"{models_bytes / records_bytes:>9.1f}x {t_convert:>12.2f}"
+        )
+    print(f"{'all':<18} {args.count * 4:>9} {total_models / args.count / 4:>12.0f} {total_records / args.count / 4:>13.0f} {total_models / total_records:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
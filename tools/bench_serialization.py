@@ -0,0 +1,101 @@
+"""
+Compare FastAPI's regular response path (revalidate against the response model, jsonable output, JSONResponse)
+with the direct TypeAdapter fast path used when FAST_JSON_RESPONSES is enabled,
+without and with (warm) the JSON fragment cache.
+
+Usage: python tools/bench_serialization.py [--count 1000] [--repeat 20]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+for _router in ["facility", "status", "account", "compute", "filesystem", "task"]:
+    os.environ.setdefault(f"IRI_API_ADAPTER_{_router}", "app.demo_adapter.DemoAdapter")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import APIRoute, serialize_response  # noqa: E402
+
+import app.main  # noqa: E402,F401  pylint: disable=unused-import
+from app.routers import iri_response  # noqa: E402
+from app.routers.status.status import router as status_router  # noqa: E402
+from app.routers.account.account import router as account_router  # noqa: E402
+
+
+def find_route(path: str) -> APIRoute:
+    routes = status_router.routes + account_router.routes
+    return next(r for r in routes if isinstance(r, APIRoute) and r.path.endswith(path) and "GET" in r.methods)
+
+
+LOOP = asyncio.new_event_loop()
+
+
+def regular_path(route: APIRoute, content) -> bytes:
+    serialized = LOOP.run_until_complete(
+        serialize_response(
+            field=route.response_field,
+            response_content=content,
+            include=route.response_model_include,
+            exclude=route.response_model_exclude,
+            exclude_unset=route.response_model_exclude_unset,
+            exclude_defaults=route.response_model_exclude_defaults,
+            exclude_none=route.response_model_exclude_none,
+        )
+    )
+    return JSONResponse(serialized).body
+
+
+def fast_path(route: APIRoute, content, cache=None) -> bytes:
+    iri_response.FRAGMENTS = cache
+    return iri_response.render_json(
+        content,
+        route.response_model,
+        exclude_none=route.response_model_exclude_none,
+        exclude_unset=route.response_model_exclude_unset,
+        exclude_defaults=route.response_model_exclude_defaults,
+        include=route.response_model_include,
+        exclude=route.response_model_exclude,
+    ).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1000, help="number of objects per list response")
+    parser.add_argument("--repeat", type=int, default=20, help="number of timed runs per path")
+    args = parser.parse_args()
+
+    cache = iri_response.FRAGMENTS
+    adapter = status_router.adapter
+    user = account_router.adapter.user if account_router.adapter else None
+    projects = asyncio.run(account_router.adapter.get_projects(user)) if user else []
+    allocations = [pa for p in projects for pa in asyncio.run(account_router.adapter.get_project_allocations(p, user))]
+    cases = [
+        ("/status/events", asyncio.run(adapter.get_events(offset=0, limit=args.count))),
+        ("/status/incidents", asyncio.run(adapter.get_incidents(offset=0, limit=args.count))),
+        ("/status/resources", asyncio.run(adapter.get_resources(offset=0, limit=args.count))),
+        ("/project_allocations", allocations),
+    ]
+
+    print(f"{'route':<24} {'objects':>8} {'regular ms':>11} {'fast ms':>9} {'cached ms':>10} {'speedup':>8}  identical")
+    for path, content in cases:
+        route = find_route(path)
+        regular = regular_path(route, content)
+        fast = fast_path(route, content)
+        cached = fast_path(route, content, cache)
+        if regular == fast == cached:
+            identical = "bytes"
+        else:
+            identical = "json" if json.loads(regular) == json.loads(fast) == json.loads(cached) else "NO"
+
+        t_regular = min(timeit.repeat(lambda: regular_path(route, content), number=1, repeat=args.repeat)) * 1000
+        t_fast = min(timeit.repeat(lambda: fast_path(route, content), number=1, repeat=args.repeat)) * 1000
+        t_cached = min(timeit.repeat(lambda: fast_path(route, content, cache), number=1, repeat=args.repeat)) * 1000
+        print(f"{path:<24} {len(content):>8} {t_regular:>11.2f} {t_fast:>9.2f} {t_cached:>10.2f} {t_regular / min(t_fast, t_cached):>7.1f}x  {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Generate the OpenAPI schema once, so the API workers serve it precomputed instead of each building it
+on the first /openapi.json or docs request.
+
+Run it with the same environment as the API (IRI_API_ADAPTER_*, API_URL_ROOT, IRI_API_PARAMS, ...):
+the workers only use the schema if it was built for their configuration and routes.
+
+Usage: python tools/build_openapi.py [--output app/openapi.json]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+from app import config, openapi_artifact  # noqa: E402
+from app.main import APP, SCHEMA_FINGERPRINT  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=config.OPENAPI_SCHEMA_FILE, help="schema file (default: OPENAPI_SCHEMA_FILE)")
+    args = parser.parse_args()
+
+    # always rebuild, even if a schema was loaded at startup
+    APP.openapi_schema = None
+    schema = APP.openapi()
+    openapi_artifact.write(args.output, schema, SCHEMA_FINGERPRINT)
+    print(f"Wrote the OpenAPI schema ({len(schema['paths'])} paths) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Report where the API's startup time goes: the startup phases timed by app.main (imports, routers and adapters,
+tracing, app, OpenAPI schema) and the import time per top-level package, measured with `python -X importtime`
+in a fresh interpreter so nothing is already imported.
+
+The environment is passed through, so set OPENTELEMETRY_ENABLED, IRI_API_ADAPTER_*, ... as in production.
+The demo adapter is used for the routers without an adapter.
+
+Usage: python tools/startup_report.py [--top 15]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+PROBE = "import json, time; t = time.perf_counter(); import app.main as m; print(json.dumps({'total': (time.perf_counter() - t) * 1000, 'phases': m.STARTUP_TIMINGS, 'schema': m.APP.openapi_schema is not None}))"
+
+
+def import_times(stderr: str) -> tuple[dict[str, float], set[str]]:
+    """Return the self import time in ms per top-level package, and the imported modules, from `-X importtime` output."""
+    totals = defaultdict(float)
+    modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        modules.add(name)
+        totals[name.split(".")[0]] += int(self_us) / 1000
+    return totals, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="number of packages to list")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    for router in ["facility", "status", "account", "compute", "filesystem", "task"]:
+        env.setdefault(f"IRI_API_ADAPTER_{router}", "app.demo_adapter.DemoAdapter")
+    env.setdefault("LOG_LEVEL", "ERROR")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE], env=env, cwd=ROOT, capture_output=True, text=True, check=False)
+    if result.returncode != 0:
+        sys.exit(result.stderr)
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    packages, modules = import_times(result.stderr)
+
+    print(f"import app.main: {report['total']:.0f} ms (with -X importtime overhead)")
+    for name, ms in report["phases"].items():
+        print(f"  {name:<22} {ms:>8.1f} ms")
+    print(f"OpenAPI schema: {'precomputed' if report['schema'] else 'built on first use (run tools/build_openapi.py)'}")
+    print()
+    print(f"{'package':<28} {'import ms':>10}")
+    for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<28} {ms:>10.1f}")
+    # optional dependencies that should only be imported when their feature is enabled
+    for name in ("opentelemetry.sdk", "globus_sdk"):
+        print(f"{name} imported: {'yes' if name in modules else 'no'}")
+
+
+if __name__ == "__main__":
+    main()